@@ -0,0 +1,418 @@
+import argparse
+import collections
+import concurrent.futures
+import dataclasses
+import glob
+import json
+import moves
+import os
+import solution_cache
+import solution_optimizer
+import solver
+import state
+import sys
+import time
+from typing import Iterable, List, Optional, TextIO, Tuple
+
+# Keys added to the `moves.encode_solution` records written when streaming.
+_ID_KEY = "Id"
+_STATUS_KEY = "Status"
+_ERROR_KEY = "Error"
+# When streaming, at most this many records per worker are read ahead of the ones being written.
+_STREAM_RECORDS_PER_WORKER = 2
+# Added to a solution file's path for the file recording how the search ended when there's no
+# solution to write, so that later runs don't solve the board again.
+_STATUS_SUFFIX = ".status"
+
+
+@dataclasses.dataclass
+class BoardResult:
+    """The outcome of solving one board file."""
+    name: str
+    # None if the board has no solution.
+    solution_length: Optional[int]
+    nodes_expanded: int
+    seconds: float
+    cached: bool = False
+    # How the search ended (see `solver.search`), if the board wasn't cached.
+    status: Optional[str] = None
+    # Detailed statistics about the search, if the board wasn't cached.
+    stats: Optional[solver.SolverStats] = None
+    # Why the board couldn't be solved, if it couldn't be read or the solver failed.
+    error: Optional[str] = None
+
+
+def _is_newer(path: str, board_path: str) -> bool:
+    return os.path.exists(path) and os.path.getmtime(path) > os.path.getmtime(board_path)
+
+def _read_status(solution_path: str) -> Optional[str]:
+    """Return the status recorded for a board with no solution, if there is one."""
+    try:
+        with open(solution_path + _STATUS_SUFFIX, "r") as infile:
+            return json.load(infile).get(_STATUS_KEY)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def _write_outcome(solution_path: str, solution: Optional[List[moves.Move]], status: str):
+    """Write the solution file, or a status file if there's no solution, removing the other."""
+    status_path = solution_path + _STATUS_SUFFIX
+    if solution is not None:
+        moves.write_solution_to_file(solution, solution_path)
+        stale_path = status_path
+    else:
+        with open(status_path, "w") as outfile:
+            json.dump({_STATUS_KEY: status}, outfile)
+        stale_path = solution_path
+    if os.path.exists(stale_path):
+        os.remove(stale_path)
+
+def _is_up_to_date(board_path: str, solution_path: str, retry_timeouts: bool = False) -> bool:
+    """Return whether an earlier run newer than the board solved it or recorded why it couldn't.
+
+    Boards whose search ran out of budget are solved again if `retry_timeouts` is set.
+    """
+    if _is_newer(solution_path, board_path):
+        return True
+    if not _is_newer(solution_path + _STATUS_SUFFIX, board_path):
+        return False
+    status = _read_status(solution_path)
+    return status is not None and not (retry_timeouts and status == solver.STATUS_TIMEOUT)
+
+def _solve_file(
+        board_path: str,
+        solution_path: str,
+        strategy: str,
+        time_limit: Optional[float] = None,
+        node_limit: Optional[int] = None,
+        profile: bool = False,
+        optimize: bool = False
+        ) -> Tuple[BoardResult, Optional[List[Tuple[int, int]]], bool]:
+    """Solve one board file in a worker process.
+
+    Returns the result, the solution as (src, dest) pairs, and whether the search was complete.
+    """
+    puzzle = state.load_from_file(board_path)
+    start = time.perf_counter()
+    search_result = solver.search(
+        puzzle.board,
+        strategy=strategy,
+        time_limit=time_limit,
+        node_limit=node_limit,
+        profile=profile)
+    solution = search_result.solution
+    if optimize and solution is not None:
+        solution = solution_optimizer.optimize(puzzle.board, solution)
+    seconds = time.perf_counter() - start
+    _write_outcome(solution_path, solution, search_result.status)
+    result = BoardResult(
+        name=os.path.basename(board_path),
+        solution_length=None if solution is None else len(solution),
+        nodes_expanded=search_result.stats.nodes_expanded,
+        seconds=seconds,
+        status=search_result.status,
+        stats=search_result.stats)
+    pairs = None if solution is None else [(move.src, move.dest) for move in solution]
+    return result, pairs, search_result.complete
+
+def _solve_from_cache(
+        cache: solution_cache.SolutionCache,
+        board_path: str,
+        solution_path: str,
+        strategy: str) -> Optional[BoardResult]:
+    start = time.perf_counter()
+    found, solution = cache.lookup(state.load_from_file(board_path).board, strategy)
+    if not found:
+        return None
+    # Only complete searches are cached, so a board cached without a solution has none.
+    _write_outcome(solution_path, solution, solver.STATUS_EXHAUSTED)
+    return BoardResult(
+        name=os.path.basename(board_path),
+        solution_length=None if solution is None else len(solution),
+        nodes_expanded=0,
+        seconds=time.perf_counter() - start,
+        cached=True)
+
+def _error_result(board_path: str, error: Exception) -> BoardResult:
+    return BoardResult(
+        name=os.path.basename(board_path),
+        solution_length=None,
+        nodes_expanded=0,
+        seconds=0.0,
+        error=str(error))
+
+def format_result(result: BoardResult) -> str:
+    if result.error is not None:
+        return f"{result.name}: error: {result.error}"
+    if result.solution_length is None and result.status == solver.STATUS_TIMEOUT:
+        outcome = "no solution found"
+    elif result.solution_length is None:
+        outcome = "no solution"
+    else:
+        outcome = f"{result.solution_length} moves"
+    if result.status is not None:
+        outcome += f" ({result.status})"
+    if result.cached:
+        return f"{result.name}: {outcome} (cached), {result.seconds:.3f}s"
+    return (f"{result.name}: {outcome}, {result.nodes_expanded} nodes expanded, " +
+        f"{result.seconds:.3f}s")
+
+def format_result_json(result: BoardResult) -> str:
+    """Format a result as a single line of JSON."""
+    fields = dataclasses.asdict(result)
+    fields["stats"] = None if result.stats is None else result.stats.to_dict()
+    return json.dumps(fields)
+
+def solve_directory(
+        board_dir: str,
+        out_dir: str,
+        strategy: str = solver.STRATEGY_DFS,
+        jobs: Optional[int] = None,
+        output: TextIO = sys.stdout,
+        cache: Optional[solution_cache.SolutionCache] = None,
+        time_limit: Optional[float] = None,
+        node_limit: Optional[int] = None,
+        json_output: bool = False,
+        profile: bool = False,
+        optimize: bool = False,
+        retry_timeouts: bool = False) -> List[BoardResult]:
+    """Solve every board file in `board_dir`, writing solutions to `out_dir`.
+
+    Solution files have the same names as their boards. Boards without a solution get a file
+    recording the search's status instead, named after the board with ".status" added. Boards
+    whose solution or status file is newer than the board are skipped, except for those whose
+    search ran out of budget if `retry_timeouts` is set. Boards are solved across a pool of `jobs`
+    processes (one per CPU by default), and a summary line is written to `output` as each one
+    finishes. Boards that can't be read or solved are reported on their summary line, and the rest
+    of the batch carries on. If a `cache` is given, boards are looked up in it before solving and
+    new solutions are added to it.
+    `time_limit` and `node_limit` are per-board budgets for the solver (see `solver.search`).
+
+    If `json_output` is set, the summary lines are JSON objects instead (see
+    `format_result_json`). If `profile` is set, the stats include the time spent in each phase of
+    the search. If `optimize` is set, solutions are shortened where possible (see
+    `solution_optimizer.optimize`) before they are written.
+    """
+    format_line = format_result_json if json_output else format_result
+    os.makedirs(out_dir, exist_ok=True)
+    pending = []
+    for board_path in sorted(glob.glob(os.path.join(board_dir, "*.json"))):
+        solution_path = os.path.join(out_dir, os.path.basename(board_path))
+        if _is_up_to_date(board_path, solution_path, retry_timeouts):
+            name = os.path.basename(board_path)
+            status = None if _is_newer(solution_path, board_path) else _read_status(solution_path)
+            if json_output:
+                record = {"name": name, "up_to_date": True}
+                if status is not None:
+                    record["status"] = status
+                print(json.dumps(record), file=output)
+            elif status is not None:
+                print(f"{name}: up to date ({status})", file=output)
+            else:
+                print(f"{name}: up to date", file=output)
+        else:
+            pending.append((board_path, solution_path))
+
+    results = []
+    if cache is not None:
+        uncached = []
+        for board_path, solution_path in pending:
+            try:
+                result = _solve_from_cache(cache, board_path, solution_path, strategy)
+            except (OSError, ValueError) as error:
+                result = _error_result(board_path, error)
+            if result is None:
+                uncached.append((board_path, solution_path))
+            else:
+                print(format_line(result), file=output, flush=True)
+                results.append(result)
+        pending = uncached
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        futures = {
+            executor.submit(
+                _solve_file,
+                board_path,
+                solution_path,
+                strategy,
+                time_limit,
+                node_limit,
+                profile,
+                optimize
+            ): board_path
+            for board_path, solution_path in pending}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                result, solution, complete = future.result()
+            except Exception as error:
+                # One bad board shouldn't stop the rest of the batch.
+                result = _error_result(futures[future], error)
+                print(format_line(result), file=output, flush=True)
+                results.append(result)
+                continue
+            if cache is not None and complete:
+                cache.store(
+                    state.load_from_file(futures[future]).board,
+                    None if solution is None else [moves.Move(*move) for move in solution],
+                    strategy)
+            print(format_line(result), file=output, flush=True)
+            results.append(result)
+    return results
+
+def _solve_record(
+        index: int,
+        line: str,
+        strategy: str,
+        time_limit: Optional[float],
+        node_limit: Optional[int],
+        tag: bool,
+        optimize: bool) -> str:
+    """Solve one streamed puzzle in a worker process, returning the line of JSON to write."""
+    record = {}
+    if tag:
+        try:
+            decoded = json.loads(line)
+        except ValueError:
+            decoded = None
+        record[_ID_KEY] = decoded.get(_ID_KEY, index) if isinstance(decoded, dict) else index
+    try:
+        puzzle = state.decode(line)
+    except ValueError as error:
+        record[_ERROR_KEY] = str(error)
+        return json.dumps(record)
+    try:
+        result = solver.search(
+            puzzle.board, strategy=strategy, time_limit=time_limit, node_limit=node_limit)
+        solution = result.solution
+        if optimize and solution is not None:
+            solution = solution_optimizer.optimize(puzzle.board, solution)
+    except Exception as error:
+        # One bad puzzle shouldn't stop the rest of the stream.
+        record[_ERROR_KEY] = f"Could not solve puzzle: {error}"
+        return json.dumps(record)
+    if solution is not None:
+        record.update(json.loads(moves.encode_solution(solution)))
+    record[_STATUS_KEY] = result.status
+    return json.dumps(record)
+
+def solve_stream(
+        lines: Iterable[str],
+        output: TextIO = sys.stdout,
+        strategy: str = solver.STRATEGY_DFS,
+        jobs: Optional[int] = None,
+        tag: bool = False,
+        time_limit: Optional[float] = None,
+        node_limit: Optional[int] = None,
+        optimize: bool = False):
+    """Solve a stream of puzzles, one `state.encode` JSON record per line, writing one line of
+    JSON to `output` for each.
+
+    Each output record is a `moves.encode_solution` record (with no solution if none was found)
+    plus the search status, or an error message if the puzzle couldn't be read or solved. Without
+    `tag`, records are written in the order the puzzles were read; with it, they are written as
+    soon as they are solved and tagged with the puzzle's "Id" key (or its position in the stream,
+    counting from 0, if it has none). Blank lines are skipped.
+
+    Puzzles are solved across a pool of `jobs` processes (one per CPU by default), and only a few
+    are read ahead per process, so memory use doesn't grow with the length of the stream and a
+    slow solve stops the input being read until it catches up. `optimize` is as for
+    `solve_directory`.
+    """
+    workers = jobs if jobs is not None else os.cpu_count() or 1
+    max_in_flight = workers * _STREAM_RECORDS_PER_WORKER
+
+    def write(future: concurrent.futures.Future):
+        print(future.result(), file=output, flush=True)
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+        in_flight = collections.deque()
+        records = (line for line in lines if line.strip())
+        for index, line in enumerate(records):
+            if len(in_flight) >= max_in_flight:
+                if tag:
+                    done, _ = concurrent.futures.wait(
+                        in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        in_flight.remove(future)
+                        write(future)
+                else:
+                    write(in_flight.popleft())
+            in_flight.append(executor.submit(
+                _solve_record, index, line, strategy, time_limit, node_limit, tag, optimize))
+        if tag:
+            for future in concurrent.futures.as_completed(in_flight):
+                write(future)
+        else:
+            for future in in_flight:
+                write(future)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Solve test tube puzzles without the UI.")
+    parser.add_argument(
+        "--batch", default=None, help="directory of puzzle files to solve")
+    parser.add_argument(
+        "--out", default=None, help="directory to write solution files to")
+    parser.add_argument(
+        "--stream", nargs="?", const="-", default=None,
+        help="solve one JSON puzzle per line of this file (or stdin), printing one solution per " +
+        "line instead of using --batch and --out")
+    parser.add_argument(
+        "--tag", action="store_true",
+        help="when streaming, print solutions as they are found, tagged with the puzzle's id")
+    parser.add_argument(
+        "--strategy", choices=solver.STRATEGIES, default=solver.STRATEGY_DFS,
+        help="search algorithm to use")
+    parser.add_argument(
+        "--jobs", type=int, default=None,
+        help="number of boards to solve in parallel (defaults to the number of CPUs)")
+    parser.add_argument(
+        "--cache", default=None, help="directory of a solution cache to use")
+    parser.add_argument(
+        "--time-limit", type=float, default=None,
+        help="seconds to spend on each board before settling for the best solution so far")
+    parser.add_argument(
+        "--node-limit", type=int, default=None,
+        help="states to expand for each board before settling for the best solution so far")
+    parser.add_argument(
+        "--retry-timeouts", action="store_true",
+        help="solve boards again whose earlier search ran out of budget before finding a solution")
+    parser.add_argument(
+        "--json", action="store_true", help="print a JSON object with statistics for each board")
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="time each phase of the search (slows solving down)")
+    parser.add_argument(
+        "--optimize", action="store_true",
+        help="shorten each solution found, where possible, before writing it")
+    args = parser.parse_args(argv)
+    if args.stream is not None:
+        for flag, given in [
+                ("--batch", args.batch is not None), ("--out", args.out is not None),
+                ("--cache", args.cache is not None), ("--json", args.json),
+                ("--profile", args.profile), ("--retry-timeouts", args.retry_timeouts)]:
+            if given:
+                parser.error(f"{flag} can't be used with --stream")
+        if args.stream == "-":
+            solve_stream(sys.stdin, sys.stdout, args.strategy, args.jobs, args.tag,
+                args.time_limit, args.node_limit, args.optimize)
+        else:
+            with open(args.stream, "r") as infile:
+                solve_stream(infile, sys.stdout, args.strategy, args.jobs, args.tag,
+                    args.time_limit, args.node_limit, args.optimize)
+        return
+    if args.batch is None or args.out is None:
+        parser.error("either --stream or both --batch and --out are required")
+    cache = None if args.cache is None else solution_cache.SolutionCache(args.cache)
+    try:
+        solve_directory(
+            args.batch, args.out, args.strategy, args.jobs, cache=cache,
+            time_limit=args.time_limit, node_limit=args.node_limit, json_output=args.json,
+            profile=args.profile, optimize=args.optimize, retry_timeouts=args.retry_timeouts)
+    finally:
+        if cache is not None:
+            if not args.json:
+                print(f"Cache hit rate: {cache.hit_rate:.0%}")
+            cache.close()
+
+
+if __name__ == '__main__':
+    main()
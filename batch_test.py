@@ -0,0 +1,257 @@
+import batch
+import contextlib
+import io
+import json
+import moves
+import os
+import shutil
+import solution_cache
+import solver
+import state
+import tempfile
+import unittest
+from testing_helpers import check_solution
+from unittest import mock
+
+
+_BOARD_PATH = "boards/level10.json"
+
+
+class SolveDirectoryTest(unittest.TestCase):
+    def setUp(self):
+        self._tempdir = tempfile.mkdtemp()
+        self._board_dir = os.path.join(self._tempdir, "boards")
+        self._out_dir = os.path.join(self._tempdir, "solutions")
+        os.mkdir(self._board_dir)
+        shutil.copy(_BOARD_PATH, self._board_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self._tempdir)
+
+    def test_writes_solutions(self):
+        output = io.StringIO()
+        results = batch.solve_directory(self._board_dir, self._out_dir, jobs=1, output=output)
+
+        self.assertEqual(1, len(results))
+        self.assertIn("level10.json: ", output.getvalue())
+        solution = moves.load_solution_from_file(os.path.join(self._out_dir, "level10.json"))
+        self.assertEqual(results[0].solution_length, len(solution))
+        board = state.load_from_file(_BOARD_PATH).board
+        check_solution(self, board, solution)
+
+    def test_skips_up_to_date_solutions(self):
+        batch.solve_directory(self._board_dir, self._out_dir, jobs=1, output=io.StringIO())
+        output = io.StringIO()
+        results = batch.solve_directory(self._board_dir, self._out_dir, jobs=1, output=output)
+        self.assertEqual([], results)
+        self.assertEqual("level10.json: up to date\n", output.getvalue())
+
+    def test_uses_solution_cache(self):
+        cache = solution_cache.SolutionCache(os.path.join(self._tempdir, "cache"))
+        try:
+            first = batch.solve_directory(
+                self._board_dir, self._out_dir, jobs=1, output=io.StringIO(), cache=cache)
+            shutil.rmtree(self._out_dir)
+            output = io.StringIO()
+            second = batch.solve_directory(
+                self._board_dir, self._out_dir, jobs=1, output=output, cache=cache)
+        finally:
+            cache.close()
+
+        self.assertFalse(first[0].cached)
+        self.assertTrue(second[0].cached)
+        self.assertEqual(first[0].solution_length, second[0].solution_length)
+        self.assertIn("(cached)", output.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self._out_dir, "level10.json")))
+
+    def test_reports_bad_boards_and_carries_on(self):
+        with open(os.path.join(self._board_dir, "broken.json"), "w") as outfile:
+            outfile.write("not json")
+        for cache_dir in [None, os.path.join(self._tempdir, "cache")]:
+            with self.subTest(cache=cache_dir is not None):
+                shutil.rmtree(self._out_dir, ignore_errors=True)
+                cache = None if cache_dir is None else solution_cache.SolutionCache(cache_dir)
+                output = io.StringIO()
+                try:
+                    results = batch.solve_directory(
+                        self._board_dir, self._out_dir, jobs=1, output=output, cache=cache)
+                finally:
+                    if cache is not None:
+                        cache.close()
+                errors = {result.name: result.error for result in results}
+                self.assertEqual({"broken.json", "level10.json"}, set(errors))
+                self.assertIsNone(errors["level10.json"])
+                self.assertIn("broken.json: error: ", output.getvalue())
+                self.assertTrue(os.path.exists(os.path.join(self._out_dir, "level10.json")))
+
+    def test_records_boards_without_solutions(self):
+        shutil.copy("boards/random.json", self._board_dir)
+        batch.solve_directory(self._board_dir, self._out_dir, jobs=1, output=io.StringIO())
+        status_path = os.path.join(self._out_dir, "random.json.status")
+        self.assertFalse(os.path.exists(os.path.join(self._out_dir, "random.json")))
+        with open(status_path) as infile:
+            self.assertEqual({"Status": solver.STATUS_EXHAUSTED}, json.load(infile))
+
+        output = io.StringIO()
+        results = batch.solve_directory(self._board_dir, self._out_dir, jobs=1, output=output)
+        self.assertEqual([], results)
+        self.assertEqual(
+            "level10.json: up to date\nrandom.json: up to date (exhausted)\n", output.getvalue())
+
+    def test_retries_timeouts_on_request(self):
+        batch.solve_directory(
+            self._board_dir, self._out_dir, solver.STRATEGY_BFS, jobs=1, output=io.StringIO(),
+            node_limit=10)
+        results = batch.solve_directory(
+            self._board_dir, self._out_dir, solver.STRATEGY_BFS, jobs=1, output=io.StringIO())
+        self.assertEqual([], results)
+
+        results = batch.solve_directory(
+            self._board_dir, self._out_dir, solver.STRATEGY_BFS, jobs=1, output=io.StringIO(),
+            retry_timeouts=True)
+        self.assertEqual(solver.STATUS_OPTIMAL, results[0].status)
+        self.assertTrue(os.path.exists(os.path.join(self._out_dir, "level10.json")))
+        self.assertFalse(os.path.exists(os.path.join(self._out_dir, "level10.json.status")))
+
+    def test_json_output(self):
+        output = io.StringIO()
+        batch.solve_directory(
+            self._board_dir, self._out_dir, jobs=1, output=output, json_output=True, profile=True)
+        record = json.loads(output.getvalue())
+        self.assertEqual("level10.json", record["name"])
+        self.assertGreater(record["stats"]["nodes_expanded"], 0)
+        self.assertEqual(set(solver.PHASES), set(record["stats"]["phase_seconds"]))
+
+        output = io.StringIO()
+        batch.solve_directory(
+            self._board_dir, self._out_dir, jobs=1, output=output, json_output=True)
+        self.assertEqual(
+            {"name": "level10.json", "up_to_date": True}, json.loads(output.getvalue()))
+
+    def test_budget_limited_solutions_are_not_cached(self):
+        cache = solution_cache.SolutionCache(os.path.join(self._tempdir, "cache"))
+        try:
+            results = batch.solve_directory(
+                self._board_dir, self._out_dir, solver.STRATEGY_BFS, jobs=1,
+                output=io.StringIO(), cache=cache, node_limit=10)
+            self.assertEqual(0, len(cache))
+        finally:
+            cache.close()
+        self.assertEqual(solver.STATUS_TIMEOUT, results[0].status)
+
+
+class SolveStreamTest(unittest.TestCase):
+    def setUp(self):
+        self._puzzles = [state.load_from_file(f"boards/{name}.json") for name in
+            ["level6", "level10"]]
+        self._lines = [state.encode(puzzle) + "\n" for puzzle in self._puzzles]
+
+    def test_ordered(self):
+        output = io.StringIO()
+        batch.solve_stream(self._lines * 3, output, jobs=1)
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(6, len(records))
+        for puzzle, record in zip(self._puzzles * 3, records):
+            self.assertNotIn("Id", record)
+            self.assertEqual(solver.STATUS_FEASIBLE, record["Status"])
+            check_solution(self, puzzle.board, moves.decode_solution(json.dumps(record)))
+
+    def test_tagged(self):
+        tagged = json.loads(self._lines[1])
+        tagged["Id"] = "level10"
+        output = io.StringIO()
+        batch.solve_stream(
+            [self._lines[0], "\n", json.dumps(tagged)], output, solver.STRATEGY_BFS, jobs=2,
+            tag=True)
+        records = {
+            record["Id"]: record
+            for record in map(json.loads, output.getvalue().splitlines())}
+        self.assertEqual({0, "level10"}, set(records))
+        for puzzle, record in zip(self._puzzles, [records[0], records["level10"]]):
+            check_solution(self, puzzle.board, moves.decode_solution(json.dumps(record)))
+        self.assertEqual(solver.STATUS_OPTIMAL, records["level10"]["Status"])
+
+    def test_reads_ahead_a_bounded_number_of_records(self):
+        output = io.StringIO()
+        def lines():
+            for index in range(10):
+                written = len(output.getvalue().splitlines())
+                self.assertGreaterEqual(written, index - 2)
+                yield self._lines[0]
+        batch.solve_stream(lines(), output, jobs=1)
+        self.assertEqual(10, len(output.getvalue().splitlines()))
+
+    def test_optimize(self):
+        output = io.StringIO()
+        batch.solve_stream(self._lines[:1], output, jobs=1)
+        optimized_output = io.StringIO()
+        batch.solve_stream(self._lines[:1], optimized_output, jobs=1, optimize=True)
+        record = json.loads(output.getvalue())
+        optimized = json.loads(optimized_output.getvalue())
+        check_solution(self, self._puzzles[0].board, moves.decode_solution(json.dumps(optimized)))
+        self.assertLess(len(optimized["Solution"]), len(record["Solution"]))
+
+    def test_invalid_records(self):
+        output = io.StringIO()
+        batch.solve_stream(["not json\n", '{"Tubes": 3}\n'], output, jobs=1, tag=True)
+        records = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual([0, 1], [record["Id"] for record in records])
+        self.assertTrue(all("Error" in record for record in records))
+
+    def test_solver_errors(self):
+        with mock.patch.object(solver, "search", side_effect=RuntimeError("out of tubes")):
+            record = json.loads(batch._solve_record(
+                3, self._lines[0], solver.STRATEGY_DFS, None, None, True, False))
+        self.assertEqual({"Id": 3, "Error": "Could not solve puzzle: out of tubes"}, record)
+
+    def test_rejects_directory_flags(self):
+        for flags in [["--cache", "cache"], ["--json"], ["--profile"], ["--batch", "boards"]]:
+            with self.subTest(flags=flags):
+                with contextlib.redirect_stderr(io.StringIO()) as stderr:
+                    with self.assertRaises(SystemExit):
+                        batch.main(["--stream", "puzzles.jsonl"] + flags)
+                self.assertIn(f"{flags[0]} can't be used with --stream", stderr.getvalue())
+
+    def test_no_solution(self):
+        puzzle = state.SavedPuzzle(
+            state.TubeBoard(tubes=[
+                state.TubeState(state=[1, 2]), state.TubeState(state=[2, 1])]), ["red", "blue"])
+        output = io.StringIO()
+        batch.solve_stream([state.encode(puzzle)], output, jobs=1)
+        self.assertEqual({"Status": solver.STATUS_EXHAUSTED}, json.loads(output.getvalue()))
+
+
+class FormatResultTest(unittest.TestCase):
+    def test_solved(self):
+        result = batch.BoardResult("level.json", 12, 345, 0.5)
+        self.assertEqual(
+            "level.json: 12 moves, 345 nodes expanded, 0.500s", batch.format_result(result))
+
+    def test_no_solution(self):
+        result = batch.BoardResult("level.json", None, 7, 0.25)
+        self.assertEqual(
+            "level.json: no solution, 7 nodes expanded, 0.250s", batch.format_result(result))
+
+    def test_status(self):
+        result = batch.BoardResult("level.json", 12, 345, 0.5, status=solver.STATUS_OPTIMAL)
+        self.assertEqual(
+            "level.json: 12 moves (optimal), 345 nodes expanded, 0.500s",
+            batch.format_result(result))
+
+    def test_timeout(self):
+        result = batch.BoardResult("level.json", None, 100, 0.5, status=solver.STATUS_TIMEOUT)
+        self.assertEqual(
+            "level.json: no solution found (timeout), 100 nodes expanded, 0.500s",
+            batch.format_result(result))
+
+    def test_error(self):
+        result = batch.BoardResult("level.json", None, 0, 0.0, error="it isn't JSON")
+        self.assertEqual("level.json: error: it isn't JSON", batch.format_result(result))
+
+    def test_cached(self):
+        result = batch.BoardResult("level.json", 12, 0, 0.001, cached=True)
+        self.assertEqual("level.json: 12 moves (cached), 0.001s", batch.format_result(result))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,168 @@
+import argparse
+import generator
+import json
+import moves
+import platform
+import random
+import solver
+import state
+import sys
+import timeit
+from typing import Callable, Dict, List, Optional
+
+# How many times each benchmark is timed. The fastest run is kept, as the others are slowed down by
+# whatever else the machine was doing.
+_DEFAULT_REPEAT = 5
+# How much slower than its baseline a benchmark can get before it counts as a regression.
+_DEFAULT_THRESHOLD = 0.2
+# Microbenchmarks loop until a run takes at least this long, so timer resolution doesn't matter.
+_MIN_RUN_SECONDS = 0.2
+
+_SAVED_BOARDS = ["level6", "level10", "level135"]
+# Sizes (in colours) of the larger generated boards that full solves are timed on.
+_GENERATED_SIZES = [10, 20]
+
+
+def _load_board(name: str) -> state.TubeBoard:
+    return state.load_from_file(f"boards/{name}.json").board
+
+def _make_benchmarks() -> Dict[str, Callable[[], None]]:
+    """Return the benchmarks, keyed on name.
+
+    Each one is a function that does the work being timed; any setup happens here, outside it.
+    """
+    board = _load_board("level135")
+    move = moves.get_possible_moves(board)[0]
+    benchmarks = {
+        "moves.get_possible_moves": lambda: moves.get_possible_moves(board),
+        "moves.apply_move": lambda: moves.apply_move(board, move),
+        "state.get_canonical_sorted_form": lambda: state.get_canonical_sorted_form(board),
+        "TubeBoard.__hash__": lambda: hash(board),
+    }
+
+    # The packed forms the solvers actually work on.
+    packed = state.pack(board)
+    packed_move = moves.get_possible_packed_moves(packed.tubes)[0]
+    mutable_tubes = [bytearray(tube) for tube in packed.tubes]
+    sorted_tubes = sorted(packed.tubes)
+    poured = moves.apply_packed_move(packed, packed_move)
+    removed = [packed.tubes[packed_move.src], packed.tubes[packed_move.dest]]
+    added = [poured.tubes[packed_move.src], poured.tubes[packed_move.dest]]
+
+    def pour_and_undo():
+        depth = moves.pour_in_place(mutable_tubes, packed_move)
+        moves.undo_pour_in_place(mutable_tubes, packed_move, depth)
+
+    def update_and_restore_sorted_tubes():
+        state.update_sorted_tubes(sorted_tubes, removed, added)
+        state.update_sorted_tubes(sorted_tubes, added, removed)
+
+    benchmarks.update({
+        "moves.get_possible_packed_moves": lambda: moves.get_possible_packed_moves(packed.tubes),
+        "moves.get_pruned_packed_moves": lambda: moves.get_pruned_packed_moves(packed.tubes),
+        "moves.apply_packed_move": lambda: moves.apply_packed_move(packed, packed_move),
+        "moves.pour_in_place+undo": pour_and_undo,
+        "state.get_canonical_key": lambda: state.get_canonical_key(packed.tubes),
+        "state.update_sorted_tubes": update_and_restore_sorted_tubes,
+    })
+
+    solve_boards = {name: _load_board(name) for name in _SAVED_BOARDS}
+    for num_colours in _GENERATED_SIZES:
+        solve_boards[f"generated{num_colours}"] = generator.generate_board(
+            num_colours + 2, rng=random.Random(num_colours))
+    for name, solve_board in solve_boards.items():
+        benchmarks[f"solve/{name}"] = lambda solve_board=solve_board: solver.solve(solve_board)
+    for name in ["level6", "level10"]:
+        benchmarks[f"solve_shortest/{name}"] = (
+            lambda solve_board=solve_boards[name]: solver.solve(
+                solve_board, strategy=solver.STRATEGY_ASTAR))
+    for strategy in [solver.STRATEGY_BFS, solver.STRATEGY_BIDIRECTIONAL]:
+        benchmarks[f"solve_shortest/level135/{strategy}"] = (
+            lambda strategy=strategy: solver.solve(solve_boards["level135"], strategy=strategy))
+    return benchmarks
+
+def _time(function: Callable[[], None], repeat: int) -> float:
+    """Return the fastest time per call out of `repeat` runs."""
+    timer = timeit.Timer(function)
+    number = 1
+    while True:
+        seconds = timer.timeit(number)
+        if seconds >= _MIN_RUN_SECONDS:
+            break
+        number *= 10
+    times = [seconds] + timer.repeat(repeat=repeat - 1, number=number)
+    return min(times) / number
+
+def run_benchmarks(
+        name_filter: Optional[str] = None,
+        repeat: int = _DEFAULT_REPEAT) -> Dict[str, float]:
+    """Run the benchmarks whose names contain `name_filter`, returning seconds per call by name."""
+    if repeat < 1:
+        raise ValueError(f"Invalid repeat count {repeat}: it must be positive.")
+    return {
+        name: _time(function, repeat)
+        for name, function in _make_benchmarks().items()
+        if name_filter is None or name_filter in name}
+
+def find_regressions(
+        baseline: Dict[str, float],
+        results: Dict[str, float],
+        threshold: float = _DEFAULT_THRESHOLD) -> List[str]:
+    """Return the names of benchmarks more than `threshold` (a fraction) slower than the baseline.
+
+    Benchmarks missing from either side are ignored.
+    """
+    return [
+        name for name, seconds in results.items()
+        if name in baseline and seconds > baseline[name] * (1 + threshold)]
+
+def write_baseline(results: Dict[str, float], filepath: str):
+    with open(filepath, 'w') as outfile:
+        json.dump({
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "benchmarks": results,
+        }, outfile, indent=2, sort_keys=True)
+
+def load_baseline(filepath: str) -> Dict[str, float]:
+    with open(filepath, 'r') as infile:
+        return json.load(infile)["benchmarks"]
+
+def format_comparison(
+        baseline: Dict[str, float], results: Dict[str, float], regressions: List[str]) -> str:
+    lines = []
+    for name, seconds in results.items():
+        line = f"{name}: {seconds * 1e6:.1f}us"
+        if name in baseline:
+            line += f" ({seconds / baseline[name] - 1:+.0%} vs baseline)"
+        if name in regressions:
+            line += " REGRESSION"
+        lines.append(line)
+    return "\n".join(lines)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Time the solver's hot paths.")
+    parser.add_argument("--save", default=None, help="write the results to this baseline file")
+    parser.add_argument(
+        "--compare", default=None, help="compare the results against this baseline file")
+    parser.add_argument(
+        "--threshold", type=float, default=_DEFAULT_THRESHOLD,
+        help="fraction slower than the baseline that counts as a regression")
+    parser.add_argument(
+        "--filter", default=None, help="only run benchmarks whose names contain this")
+    parser.add_argument(
+        "--repeat", type=int, default=_DEFAULT_REPEAT, help="how many times to time each one")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.filter, args.repeat)
+    baseline = {} if args.compare is None else load_baseline(args.compare)
+    regressions = find_regressions(baseline, results, args.threshold)
+    print(format_comparison(baseline, results, regressions))
+    if args.save is not None:
+        write_baseline(results, args.save)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
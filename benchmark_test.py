@@ -0,0 +1,52 @@
+import benchmark
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class FindRegressionsTest(unittest.TestCase):
+    def test_flags_slowdowns_beyond_threshold(self):
+        baseline = {"fast": 1.0, "slow": 1.0, "same": 1.0}
+        results = {"fast": 0.5, "slow": 1.5, "same": 1.1, "new": 9.0}
+        self.assertEqual(["slow"], benchmark.find_regressions(baseline, results, threshold=0.2))
+
+    def test_threshold(self):
+        self.assertEqual([], benchmark.find_regressions({"a": 1.0}, {"a": 1.5}, threshold=0.6))
+
+
+class BaselineTest(unittest.TestCase):
+    def setUp(self):
+        self._tempdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self._tempdir)
+
+    def test_round_trip(self):
+        filepath = os.path.join(self._tempdir, "baseline.json")
+        benchmark.write_baseline({"a": 1.5, "b": 0.25}, filepath)
+        self.assertEqual({"a": 1.5, "b": 0.25}, benchmark.load_baseline(filepath))
+
+
+class RunBenchmarksTest(unittest.TestCase):
+    def test_filter(self):
+        results = benchmark.run_benchmarks("TubeBoard.__hash__", repeat=1)
+        self.assertEqual(["TubeBoard.__hash__"], list(results))
+        self.assertGreater(results["TubeBoard.__hash__"], 0)
+
+    def test_packed_hot_paths(self):
+        results = benchmark.run_benchmarks("packed_moves", repeat=1)
+        self.assertEqual(
+            {"moves.get_possible_packed_moves", "moves.get_pruned_packed_moves"}, set(results))
+        for name in ["moves.pour_in_place+undo", "state.update_sorted_tubes"]:
+            with self.subTest(name=name):
+                self.assertGreater(benchmark.run_benchmarks(name, repeat=1)[name], 0)
+
+    def test_invalid_repeat(self):
+        with self.assertRaises(ValueError) as ve:
+            benchmark.run_benchmarks(repeat=0)
+        self.assertIn("it must be positive", str(ve.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
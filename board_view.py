@@ -97,7 +97,9 @@ class TubeBoardView(tk.Frame):
     
     def _add_tube(self, initial_state: List[int], update_controller: bool=True):
         index = len(self._tubes)
-        tube = tube_view.TubeView(self._tubes_container, self._model, index, width=100, initial_state=initial_state)
+        tube = tube_view.TubeView(
+            self._tubes_container, self._model, index, depth=len(initial_state), width=100,
+            initial_state=initial_state)
         tube.set_controller(self._controller)
         self._tubes.append(tube)
         tube.pack(fill=tk.Y, side=tk.LEFT, expand=True, padx=20, pady=10)
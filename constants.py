@@ -1,3 +1,4 @@
+# Defaults for new puzzles in the editor. Boards carry their own number of tubes and depth.
 NUM_TUBES: int = 10
 TUBE_DEPTH: int = 4
 NUM_ROWS: int = 2
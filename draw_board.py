@@ -14,7 +14,9 @@ _TUBE_VSPACING_TO_HEIGHT: float = 0.3
 # The ratio of padding around the board to the size of the board
 _BOARD_PADDING_RATIO_TO_SIZE = 0.2
 
-_NUM_ROWS = constants.NUM_ROWS
+# Boards are split over at least this many rows, and more if they have lots of tubes.
+_MIN_ROWS = constants.NUM_ROWS
+_MAX_TUBES_PER_ROW = 8
 
 _STARTING_SIZE = (500, 400)
 
@@ -27,14 +29,16 @@ class GameBoardView():
         self._board = board
         self._colours = colours
 
-        self._tubes_per_row: int = int((len(board.tubes) + _NUM_ROWS - 1) / _NUM_ROWS)
-        self._tube_depth: int = len(board.tubes[0].state)
+        self._num_rows: int = max(
+            _MIN_ROWS, (len(board.tubes) + _MAX_TUBES_PER_ROW - 1) // _MAX_TUBES_PER_ROW)
+        self._tubes_per_row: int = int((len(board.tubes) + self._num_rows - 1) / self._num_rows)
+        self._tube_depth: int = board.depth
 
         # Calculate the relative width and height of the board.
         # Units are effectively tube widths.
         # e.g. width is num tubes + (num padding * padding as fraction of tube width)
         self._relative_width: float = float(self._tubes_per_row) + (self._tubes_per_row - 1) * _TUBE_HSPACING_TO_WIDTH
-        self._relative_height: float = float(_NUM_ROWS * self._tube_depth) + (_NUM_ROWS - 1) * self._tube_depth * _TUBE_VSPACING_TO_HEIGHT
+        self._relative_height: float = float(self._num_rows * self._tube_depth) + (self._num_rows - 1) * self._tube_depth * _TUBE_VSPACING_TO_HEIGHT
     
     def draw_tube(self,
             surface: pygame.Surface,
@@ -113,7 +117,7 @@ class GameBoardView():
         tube_index = 0
         arrow_start = None
         arrow_end = None
-        for row in range(_NUM_ROWS):
+        for row in range(self._num_rows):
             for tube in range(self._tubes_per_row):
                 # Handle the case where the number of tubes doesn't evenly divide into rows.
                 if tube_index >= len(self._board.tubes):
@@ -0,0 +1,162 @@
+import moves
+import state
+from typing import List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:
+    # Searches fall back to generating moves one board at a time in pure Python.
+    np = None
+
+# Whether the vectorised functions below can be used.
+AVAILABLE = np is not None
+
+# Marks boards in a frontier that weren't reached by a move, so have no last move to avoid undoing.
+NO_MOVE = -1
+
+
+def to_array(boards: Sequence[state.PackedBoard]) -> "np.ndarray":
+    """Stack packed boards, which must all have the same shape, into an (N, tubes, depth) array."""
+    num_tubes = len(boards[0].tubes) if boards else 0
+    depth = len(boards[0].tubes[0]) if num_tubes else 0
+    data = b"".join(board.to_bytes() for board in boards)
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(boards), num_tubes, depth)
+
+def get_top_of_tube_info(cells: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray", "np.ndarray"]:
+    """Vectorised `moves._packed_top_of_tube_info` over an (N, tubes, depth) array.
+
+    Returns (N, tubes) arrays of the top colour, the depth of the top colour and the free space
+    above it. Empty tubes have a top colour and depth of 0.
+    """
+    size = cells.shape[2]
+    filled = cells != 0
+    space = np.where(filled.any(axis=2), filled.argmax(axis=2), size)
+    top = np.minimum(space, size - 1)[..., None]
+    colour = np.take_along_axis(cells, top, axis=2)[..., 0] * (space < size)
+    # The top run ends at the first cell below the free space that isn't the top colour.
+    positions = np.arange(size)
+    in_run = (cells == colour[..., None]) | (positions < space[..., None])
+    run_end = np.where(in_run.all(axis=2), size, in_run.argmin(axis=2))
+    return colour, (run_end - space) * (colour != 0), space
+
+def get_legal_moves(
+        cells: "np.ndarray",
+        last_src: Optional["np.ndarray"] = None,
+        last_dest: Optional["np.ndarray"] = None,
+        prune: bool = False) -> "np.ndarray":
+    """Return an (N, tubes, tubes) array saying which moves are legal in each board.
+
+    Entry `[n, src, dest]` is set if `Move(src, dest)` is in `moves.get_possible_packed_moves` for
+    board `n`, or in `moves.get_pruned_packed_moves` (given the last move in `last_src` and
+    `last_dest`, or `NO_MOVE`) if `prune` is set.
+    """
+    colour, depth, space = get_top_of_tube_info(cells)
+    num_boards, num_tubes, size = cells.shape
+    src_colour = colour[:, :, None]
+    dest_colour = colour[:, None, :]
+    empty = colour == 0
+    onto_colour = (dest_colour == src_colour) & (space[:, None, :] >= depth[:, :, None])
+    onto_empty = empty[:, None, :]
+    if prune:
+        # Only the first empty tube is a destination, and only for tubes with mixed colours.
+        first_empty = empty & (np.cumsum(empty, axis=1) == 1)
+        mixed = depth + space != size
+        onto_empty = first_empty[:, None, :] & mixed[:, :, None]
+    legal = (src_colour != 0) & (onto_colour | onto_empty)
+    legal &= ~np.eye(num_tubes, dtype=bool)
+    if prune and last_src is not None:
+        boards = np.flatnonzero(last_src != NO_MOVE)
+        legal[boards, last_dest[boards], last_src[boards]] = False
+    return legal
+
+def get_moves(legal: "np.ndarray") -> List[List[moves.Move]]:
+    """Convert the output of `get_legal_moves` into a list of moves for each board."""
+    result = [[] for _ in range(legal.shape[0])]
+    for board, src, dest in zip(*np.nonzero(legal)):
+        result[board].append(moves.Move(int(src), int(dest)))
+    return result
+
+def apply_moves(
+        cells: "np.ndarray",
+        boards: "np.ndarray",
+        src: "np.ndarray",
+        dest: "np.ndarray") -> "np.ndarray":
+    """Apply move `(src[i], dest[i])` to board `boards[i]` for each i, returning the new boards.
+
+    The moves must be legal.
+    """
+    colour, depth, space = get_top_of_tube_info(cells[boards])
+    rows = np.arange(len(boards))
+    children = cells[boards]
+    poured_depth = depth[rows, src][:, None]
+    positions = np.arange(cells.shape[2])
+    src_space = space[rows, src][:, None]
+    src_tubes = children[rows, src]
+    src_tubes[(positions >= src_space) & (positions < src_space + poured_depth)] = 0
+    children[rows, src] = src_tubes
+    dest_space = space[rows, dest][:, None]
+    dest_tubes = children[rows, dest]
+    poured = (positions >= dest_space - poured_depth) & (positions < dest_space)
+    dest_tubes[poured] = np.broadcast_to(colour[rows, src][:, None], poured.shape)[poured]
+    children[rows, dest] = dest_tubes
+    return children
+
+def get_canonical_keys(cells: "np.ndarray") -> "np.ndarray":
+    """Return each board's `state.get_canonical_key`, as an array of fixed-size byte strings."""
+    num_boards, num_tubes, size = cells.shape
+    tubes = np.ascontiguousarray(cells).view(np.dtype((np.void, size))).reshape(
+        num_boards, num_tubes)
+    return np.sort(tubes, axis=1).view(np.dtype((np.void, num_tubes * size))).reshape(num_boards)
+
+def is_solved(cells: "np.ndarray") -> "np.ndarray":
+    """Return which boards have every tube full of one colour or empty."""
+    return (cells == cells[:, :, :1]).all(axis=(1, 2))
+
+def solve_bfs(
+        board: state.PackedBoard, control, prune: bool = True) -> Tuple[dict, Optional[bytes]]:
+    """Breadth-first search for a shortest solution, expanding a whole layer of boards at once.
+
+    Each layer is held as one (N, tubes, depth) array: its moves are found, its children built and
+    their canonical keys computed in a few vectorised steps, and children are deduplicated with
+    `np.unique` before being checked against the states already seen. `control` is the solver's
+    search control, which is told about each state expanded.
+
+    Returns the parent pointers of every state reached, keyed on canonical key as in
+    `solver._solve_bfs`, and the key of a solved state (or None if there isn't one).
+    """
+    start_key = state.get_canonical_key(board.tubes)
+    parents = {start_key: (None, None)}
+    cells = to_array([board])
+    keys = [start_key]
+    last_src = last_dest = np.full(1, NO_MOVE)
+    depth = 0
+    while len(cells):
+        solved = np.flatnonzero(is_solved(cells))
+        if len(solved):
+            return parents, keys[solved[0]]
+        legal = get_legal_moves(cells, last_src, last_dest, prune)
+        for branches in legal.sum(axis=(1, 2)).tolist():
+            control.expand(depth, branches)
+        boards, src, dest = np.nonzero(legal)
+        children = apply_moves(cells, boards, src, dest)
+        child_keys = get_canonical_keys(children)
+        _, first = np.unique(child_keys, return_index=True)
+        # Kept in the order they were generated, like the pure Python search.
+        first.sort()
+        control.duplicates += len(boards) - len(first)
+        kept = []
+        next_keys = []
+        for index in first.tolist():
+            key = child_keys[index].tobytes()
+            if key in parents:
+                control.duplicates += 1
+                continue
+            parents[key] = (keys[boards[index]], moves.Move(int(src[index]), int(dest[index])))
+            kept.append(index)
+            next_keys.append(key)
+        cells = children[kept]
+        keys = next_keys
+        last_src = src[kept]
+        last_dest = dest[kept]
+        depth += 1
+    return parents, None
@@ -0,0 +1,104 @@
+import frontier
+import generator
+import glob
+import moves
+import solver
+import state
+import unittest
+from testing_helpers import check_solution
+from unittest import mock
+
+
+def _get_boards():
+    boards = [state.pack(state.load_from_file(path).board) for path in sorted(glob.glob(
+        "boards/level*.json"))]
+    for depth in [2, 4, 6]:
+        boards.extend(
+            state.pack(board)
+            for board in generator.generate_boards(10, seed=depth, num_tubes=7, depth=depth))
+    return boards
+
+
+@unittest.skipUnless(frontier.AVAILABLE, "NumPy isn't installed")
+class FrontierTest(unittest.TestCase):
+    def setUp(self):
+        self._boards = _get_boards()
+
+    def _same_shape_groups(self):
+        groups = {}
+        for board in self._boards:
+            groups.setdefault((len(board.tubes), len(board.tubes[0])), []).append(board)
+        return list(groups.values())
+
+    def test_top_of_tube_info(self):
+        for boards in self._same_shape_groups():
+            colour, depth, space = frontier.get_top_of_tube_info(frontier.to_array(boards))
+            for index, board in enumerate(boards):
+                for tube_index, tube in enumerate(board.tubes):
+                    self.assertEqual(
+                        moves._packed_top_of_tube_info(tube),
+                        (colour[index, tube_index], depth[index, tube_index],
+                            space[index, tube_index]))
+
+    def test_same_moves_as_python(self):
+        for boards in self._same_shape_groups():
+            cells = frontier.to_array(boards)
+            for board, board_moves in zip(boards, frontier.get_moves(
+                    frontier.get_legal_moves(cells))):
+                with self.subTest(board=board):
+                    self.assertCountEqual(
+                        moves.get_possible_packed_moves(board.tubes), board_moves)
+
+    def test_same_pruned_moves_as_python(self):
+        for boards in self._same_shape_groups():
+            cells = frontier.to_array(boards)
+            last_moves = [moves.get_possible_packed_moves(board.tubes)[0] for board in boards]
+            last_src = frontier.np.array([move.src for move in last_moves])
+            last_dest = frontier.np.array([move.dest for move in last_moves])
+            last_src[0] = last_dest[0] = frontier.NO_MOVE
+            legal = frontier.get_legal_moves(cells, last_src, last_dest, prune=True)
+            for index, (board, board_moves) in enumerate(zip(boards, frontier.get_moves(legal))):
+                with self.subTest(board=board):
+                    self.assertCountEqual(
+                        moves.get_pruned_packed_moves(
+                            board.tubes, last_moves[index] if index else None),
+                        board_moves)
+
+    def test_apply_moves(self):
+        for boards in self._same_shape_groups():
+            cells = frontier.to_array(boards)
+            indices, src, dest = frontier.np.nonzero(frontier.get_legal_moves(cells))
+            children = frontier.apply_moves(cells, indices, src, dest)
+            keys = frontier.get_canonical_keys(children)
+            for child, key, index, move in zip(children, keys, indices, zip(src, dest)):
+                expected = moves.apply_packed_move(boards[index], moves.Move(*move))
+                self.assertEqual(expected.to_bytes(), child.tobytes())
+                self.assertEqual(state.get_canonical_key(expected.tubes), key.tobytes())
+
+    def test_is_solved(self):
+        for boards in self._same_shape_groups():
+            self.assertEqual(
+                [state.is_packed_solved(board.tubes) for board in boards],
+                frontier.is_solved(frontier.to_array(boards)).tolist())
+
+    def test_bfs_matches_python(self):
+        for path in ["boards/level6.json", "boards/level10.json"]:
+            board = state.load_from_file(path).board
+            with self.subTest(board=path):
+                solution = solver.solve(board, strategy=solver.STRATEGY_BFS)
+                with mock.patch.object(frontier, "AVAILABLE", False):
+                    python_solution = solver.solve(board, strategy=solver.STRATEGY_BFS)
+                self.assertEqual(len(python_solution), len(solution))
+                check_solution(self, board, solution)
+
+    def test_bfs_no_solution(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 1, 2]),
+            state.TubeState(state=[0, 1, 2]),
+            state.TubeState(state=[0, 1, 2])
+        ])
+        self.assertIsNone(solver.solve(board, strategy=solver.STRATEGY_BFS))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import argparse
+import colorsys
+import constants
+import itertools
+import moves
+import random
+import state
+import sys
+from typing import Iterator, List, Optional
+
+# Boards are scrambled with this many reverse moves per cell unless told otherwise.
+_DEFAULT_SCRAMBLE_MOVES_PER_CELL = 2
+# Scrambles that happen to end up solved are extended by up to this many extra moves.
+_MAX_EXTRA_SCRAMBLE_MOVES = 100
+
+FORMAT_JSON = "json"
+FORMAT_BINARY = "binary"
+
+
+def _get_solved_board(
+        num_tubes: int, depth: int, num_colours: int, num_empty: int) -> state.PackedBoard:
+    """Return a solved board where the full tubes cycle through the colours."""
+    if num_colours < 1 or depth < 1 or num_empty < 0:
+        raise ValueError("Invalid board shape: there must be at least one colour, the depth " +
+            "must be positive and the number of empty tubes can't be negative.")
+    if num_tubes - num_empty < num_colours:
+        raise ValueError(f"Invalid board shape: {num_colours} colours don't fit in " +
+            f"{num_tubes} tubes with {num_empty} of them empty.")
+    if num_colours > 0xff:
+        raise ValueError("Invalid board shape: there can be at most 255 colours.")
+    full_tubes = [
+        bytes((index % num_colours + 1,)) * depth for index in range(num_tubes - num_empty)]
+    return state.PackedBoard(tuple(full_tubes + [bytes(depth)] * num_empty))
+
+def _scramble(
+        board: state.PackedBoard, num_moves: int, rng: random.Random) -> state.PackedBoard:
+    """Play up to `num_moves` random moves backwards from the board.
+
+    Moves which would immediately undo the previous one are avoided.
+    """
+    previous = None
+    for _ in range(num_moves):
+        reverse_moves = moves.get_possible_reverse_packed_moves(board.tubes)
+        if previous is not None:
+            undo = moves.Move(previous.dest, previous.src)
+            reverse_moves = (
+                [entry for entry in reverse_moves if entry[0] != undo] or reverse_moves)
+        if not reverse_moves:
+            break
+        previous, poured = rng.choice(reverse_moves)
+        board = moves.apply_reverse_packed_move(board, previous, poured)
+    return board
+
+def generate_board(
+        num_tubes: int = constants.NUM_TUBES,
+        depth: int = constants.TUBE_DEPTH,
+        num_colours: Optional[int] = None,
+        num_empty: int = 2,
+        scramble_moves: Optional[int] = None,
+        rng: Optional[random.Random] = None) -> state.TubeBoard:
+    """Generate an unsolved board which is guaranteed to be solvable.
+
+    The board is built by playing `scramble_moves` random moves backwards from a solved board, so
+    playing them forwards again solves it. The solved board has `num_empty` empty tubes, and the
+    rest are full of one of `num_colours` colours each (by default, one colour per full tube).
+    """
+    if num_colours is None:
+        num_colours = num_tubes - num_empty
+    if rng is None:
+        rng = random.Random()
+    if scramble_moves is None:
+        scramble_moves = num_tubes * depth * _DEFAULT_SCRAMBLE_MOVES_PER_CELL
+    board = _scramble(_get_solved_board(num_tubes, depth, num_colours, num_empty),
+        scramble_moves, rng)
+    for _ in range(_MAX_EXTRA_SCRAMBLE_MOVES):
+        if not state.is_packed_solved(board.tubes):
+            break
+        board = _scramble(board, 1, rng)
+    return state.unpack(board)
+
+def generate_boards(
+        count: Optional[int] = None,
+        seed: int = 0,
+        **kwargs) -> Iterator[state.TubeBoard]:
+    """Lazily generate `count` boards (or an endless stream if it's None).
+
+    The boards only depend on the seed and the other arguments, which are passed on to
+    `generate_board`.
+    """
+    rng = random.Random(seed)
+    indices = itertools.count() if count is None else range(count)
+    for _ in indices:
+        yield generate_board(rng=rng, **kwargs)
+
+def get_colours(num_colours: int) -> List[str]:
+    """Return evenly spread colours to show a generated board with."""
+    colours = []
+    for index in range(num_colours):
+        red, green, blue = colorsys.hsv_to_rgb(index / num_colours, 0.7, 0.9)
+        colours.append(f"#{int(red * 255):02x}{int(green * 255):02x}{int(blue * 255):02x}")
+    return colours
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate solvable test tube puzzles.")
+    parser.add_argument("--count", type=int, default=None,
+        help="number of boards to generate (endless by default)")
+    parser.add_argument("--tubes", type=int, default=constants.NUM_TUBES, help="tubes per board")
+    parser.add_argument("--depth", type=int, default=constants.TUBE_DEPTH, help="tube depth")
+    parser.add_argument("--colours", type=int, default=None,
+        help="number of colours (defaults to one per non-empty tube)")
+    parser.add_argument("--empty", type=int, default=2, help="empty tubes in the solved board")
+    parser.add_argument("--scramble", type=int, default=None,
+        help="number of random reverse moves used to scramble each board")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--format", choices=[FORMAT_JSON, FORMAT_BINARY], default=FORMAT_JSON,
+        help="one state.encode JSON puzzle per line, or state.encode_binary boards back to back")
+    args = parser.parse_args(argv)
+
+    boards = generate_boards(
+        args.count,
+        args.seed,
+        num_tubes=args.tubes,
+        depth=args.depth,
+        num_colours=args.colours,
+        num_empty=args.empty,
+        scramble_moves=args.scramble)
+    num_colours = args.tubes - args.empty if args.colours is None else args.colours
+    colours = get_colours(num_colours)
+    try:
+        for board in boards:
+            if args.format == FORMAT_BINARY:
+                sys.stdout.buffer.write(state.encode_binary(board))
+            else:
+                sys.stdout.write(state.encode(state.SavedPuzzle(board, colours)) + "\n")
+    except BrokenPipeError:
+        # The reader has seen enough boards.
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+import collections
+import generator
+import random
+import solver
+import state
+import unittest
+import utils
+
+
+class GenerateBoardTest(unittest.TestCase):
+    def test_solvable(self):
+        for board in generator.generate_boards(20, seed=3, num_tubes=7):
+            with self.subTest(board=board):
+                self.assertFalse(solver.is_solved(board))
+                solution = solver.solve(board)
+                self.assertIsNotNone(solution)
+
+    def test_shape(self):
+        board = generator.generate_board(
+            num_tubes=9, depth=6, num_colours=3, num_empty=3, rng=random.Random(1))
+        self.assertEqual(9, len(board.tubes))
+        self.assertTrue(all(len(tube.state) == 6 for tube in board.tubes))
+        counts = collections.Counter(cell for tube in board.tubes for cell in tube.state)
+        self.assertEqual({0: 18, 1: 12, 2: 12, 3: 12}, counts)
+
+    def test_seeded(self):
+        self.assertEqual(
+            list(generator.generate_boards(5, seed=7)), list(generator.generate_boards(5, seed=7)))
+        self.assertNotEqual(
+            list(generator.generate_boards(5, seed=7)), list(generator.generate_boards(5, seed=8)))
+
+    def test_endless_stream(self):
+        boards = generator.generate_boards(seed=1, num_tubes=5)
+        self.assertEqual(3, len([next(boards) for _ in range(3)]))
+
+    def test_utils_random_state(self):
+        board = utils.create_random_state()
+        self.assertFalse(solver.is_solved(board))
+        self.assertIsNotNone(solver.solve(board))
+
+    def test_too_many_colours(self):
+        with self.assertRaises(ValueError) as ve:
+            generator.generate_board(num_tubes=4, num_colours=3, num_empty=2)
+        self.assertIn("3 colours don't fit in 4 tubes", str(ve.exception))
+
+    def test_colours(self):
+        colours = generator.get_colours(5)
+        self.assertEqual(5, len(set(colours)))
+        self.assertTrue(all(colour.startswith("#") and len(colour) == 7 for colour in colours))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+from collections import defaultdict
+from typing import Sequence
+
+
+# Lower bounds on the number of moves needed to solve a packed board. Each of them can drop by at
+# most one per move and is zero for solved boards, so they are admissible and consistent, and can
+# be used for shortest-solution searches.
+
+
+def segment_breaks(tubes: Sequence[bytes]) -> int:
+    """Count the places within tubes where one colour sits directly on top of another.
+
+    A move only ever takes the top run off its source tube and pours it onto the same colour (or
+    into an empty tube), so it can remove at most one break.
+    """
+    breaks = 0
+    for tube in tubes:
+        previous = 0
+        for elem in tube:
+            if previous and elem != previous:
+                breaks += 1
+            previous = elem
+    return breaks
+
+def spread_colours(tubes: Sequence[bytes]) -> int:
+    """Count how many more tubes each colour is spread across than it will fill when solved.
+
+    A move can only take a colour out of one tube, so this drops by at most one per move.
+    """
+    counts = defaultdict(int)
+    tubes_containing = defaultdict(int)
+    for tube in tubes:
+        for colour in set(tube):
+            if colour:
+                tubes_containing[colour] += 1
+                counts[colour] += tube.count(colour)
+    excess = 0
+    depth = len(tubes[0]) if tubes else 0
+    for colour, num_tubes in tubes_containing.items():
+        needed = (counts[colour] + depth - 1) // depth
+        excess += max(0, num_tubes - needed)
+    return excess
+
+def lower_bound(tubes: Sequence[bytes]) -> int:
+    """The best admissible estimate of the number of moves left."""
+    return max(segment_breaks(tubes), spread_colours(tubes))
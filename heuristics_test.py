@@ -0,0 +1,47 @@
+import heuristics
+import moves
+import state
+import unittest
+
+
+def _pack(*tubes):
+    return state.pack(state.TubeBoard(
+        tubes=[state.TubeState(state=list(tube)) for tube in tubes])).tubes
+
+
+class HeuristicsTest(unittest.TestCase):
+    def test_solved_board_is_zero(self):
+        tubes = _pack([0, 0, 0, 0], [1, 1, 1, 1], [2, 2, 2, 2])
+        self.assertEqual(0, heuristics.segment_breaks(tubes))
+        self.assertEqual(0, heuristics.spread_colours(tubes))
+        self.assertEqual(0, heuristics.lower_bound(tubes))
+
+    def test_segment_breaks(self):
+        tubes = _pack([0, 1, 2, 2], [1, 2, 1, 2], [0, 0, 0, 0])
+        self.assertEqual(4, heuristics.segment_breaks(tubes))
+
+    def test_spread_colours(self):
+        tubes = _pack([0, 0, 1, 1], [0, 0, 1, 1], [2, 2, 2, 2])
+        self.assertEqual(1, heuristics.spread_colours(tubes))
+
+    def test_colours_filling_several_tubes_are_not_spread(self):
+        tubes = _pack([1, 1, 1, 1], [1, 1, 1, 1], [0, 0, 0, 0])
+        self.assertEqual(0, heuristics.spread_colours(tubes))
+
+    def test_drops_by_at_most_one_per_move(self):
+        board = state.pack(state.load_from_file("boards/level6.json").board)
+        frontier = [board]
+        for _ in range(3):
+            next_frontier = []
+            for current in frontier:
+                for move in moves.get_possible_packed_moves(current.tubes):
+                    child = moves.apply_packed_move(current, move)
+                    self.assertLessEqual(
+                        heuristics.lower_bound(current.tubes) - heuristics.lower_bound(child.tubes),
+                        1)
+                    next_frontier.append(child)
+            frontier = next_frontier
+
+
+if __name__ == '__main__':
+    unittest.main()
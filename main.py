@@ -1,11 +1,18 @@
+import os
 import tkinter as tk
 from tkinter import filedialog
 
 import constants
+import solution_cache
 import ui_controller
 import ui_model
 import view
 
+# Solutions are cached here so that solving the same puzzle again is instant.
+_SOLUTION_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".test_tube_solver", "cache")
+# The most solutions to keep in the cache.
+_SOLUTION_CACHE_SIZE = 10000
+
 
 def show_save_menu(controller: ui_controller.UiController):
     chosen_path = filedialog.asksaveasfilename()
@@ -36,7 +43,8 @@ def main():
     main_window = view.MainWindow(window, model)
     main_window.pack(fill=tk.BOTH, expand=True)
     
-    controller = ui_controller.UiController(model, main_window)
+    cache = solution_cache.SolutionCache(_SOLUTION_CACHE_DIR, max_entries=_SOLUTION_CACHE_SIZE)
+    controller = ui_controller.UiController(model, main_window, cache)
     main_window.set_controller(controller)
 
     menu = tk.Menu(window)
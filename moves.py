@@ -1,10 +1,11 @@
-from collections import defaultdict
+from collections import Counter, defaultdict
 import copy
 import dataclasses
+import functools
 import json
 from itertools import combinations
 import state
-from typing import List, Tuple
+from typing import List, MutableSequence, Optional, Sequence, Tuple
 
 
 _SOLUTION_KEY = "Solution"
@@ -49,7 +50,7 @@ def _calculate_top_of_tube_info(tube: state.TubeState, index: int = 0) -> _TopOf
             break
     
     if startIndex == -1:
-        return _TopOfTube(0, 0, 4, index)
+        return _TopOfTube(0, 0, len(tube.state), index)
     
     depth = 1
     for i in range(startIndex + 1, len(tube.state)):
@@ -87,12 +88,12 @@ def get_possible_moves(board: state.TubeBoard) -> List[Move]:
 
     # Handly empty tubes - every tube can pour into an empty tube.
     for empty_index in _get_empty_tube_indices(board):
-        moves = moves + [
+        moves.extend(
                 Move(src=i, dest=empty_index) for i in range(len(board.tubes))
                 # But, we shouldn't pour from empty tubes into empty tubes or
                 # we'll end up infinitely recursing.
                 if i != empty_index and not _is_empty(board.tubes[i])
-            ]
+            )
     
     return moves
 
@@ -125,6 +126,248 @@ def apply_move(board: state.TubeBoard, move: Move) -> state.TubeBoard:
 
     return new_board
 
+# How many tubes `_packed_top_of_tube_info` remembers. Searches keep meeting the same few tubes, so
+# looking them up is faster than scanning them, whatever their depth.
+_TOP_OF_TUBE_CACHE_SIZE = 1 << 16
+
+def _packed_top_of_tube_info(tube: bytes) -> Tuple[int, int, int]:
+    """Packed equivalent of `_calculate_top_of_tube_info`.
+
+    Returns a (top colour, depth, available space) tuple. `bytearray` tubes, which searches
+    change in place, are scanned every time rather than copied to look them up.
+    """
+    if type(tube) is bytes:
+        return _cached_top_of_tube(tube)
+    return _scan_top_of_tube(tube)
+
+@functools.lru_cache(maxsize=_TOP_OF_TUBE_CACHE_SIZE)
+def _cached_top_of_tube(tube: bytes) -> Tuple[int, int, int]:
+    return _scan_top_of_tube(tube)
+
+def _scan_top_of_tube(tube: bytes) -> Tuple[int, int, int]:
+    size = len(tube)
+    space = size - len(tube.lstrip(b"\x00"))
+    if space == size:
+        return 0, 0, size
+
+    colour = tube[space]
+    end = space + 1
+    while end < size and tube[end] == colour:
+        end += 1
+    return colour, end - space, space
+
+def get_possible_packed_moves(tubes: Sequence[bytes]) -> List[Move]:
+    """Find all the possible moves given the tubes of a packed board.
+
+    This returns the same moves in the same order as `get_possible_moves`. The tubes can be
+    either `bytes` or `bytearray` objects.
+    """
+    colours_to_tubes = defaultdict(list)
+    empty_indices = []
+    for i, tube in enumerate(tubes):
+        colour, depth, space = _packed_top_of_tube_info(tube)
+        if colour == 0:
+            empty_indices.append(i)
+        else:
+            colours_to_tubes[colour].append((i, depth, space))
+
+    moves = []
+
+    for tubes_here in colours_to_tubes.values():
+        if len(tubes_here) < 2:
+            continue
+        for source, source_depth, _ in tubes_here:
+            for dest, _, dest_space in tubes_here:
+                if source != dest and dest_space >= source_depth:
+                    moves.append(Move(source, dest))
+
+    if empty_indices:
+        empty_set = set(empty_indices)
+        non_empty = [i for i in range(len(tubes)) if i not in empty_set]
+        for empty_index in empty_indices:
+            moves.extend(Move(src=i, dest=empty_index) for i in non_empty)
+
+    return moves
+
+def get_pruned_packed_moves(tubes: Sequence[bytes], last_move: Optional[Move] = None) -> List[Move]:
+    """Find the moves in a packed board that could make progress towards a solution.
+
+    This is a subset of `get_possible_packed_moves` which leaves out moves that can't help:
+    - All empty tubes are interchangeable, so only the first one is used as a destination.
+    - Pouring a single-colour tube into an empty tube just swaps the two tubes around.
+    - Reversing `last_move` either restores the previous board or has the same result as a single
+      move from it, so it is never needed.
+
+    Moves that complete a tube come first, as they are the most likely to lead to a solution.
+    """
+    colours_to_tubes = defaultdict(list)
+    first_empty = None
+    mixed_tubes = []
+    for i, tube in enumerate(tubes):
+        colour, depth, space = _packed_top_of_tube_info(tube)
+        if colour == 0:
+            if first_empty is None:
+                first_empty = i
+            continue
+        colours_to_tubes[colour].append((i, depth, space))
+        if depth + space != len(tube):
+            mixed_tubes.append(i)
+
+    completing = []
+    others = []
+    for tubes_here in colours_to_tubes.values():
+        if len(tubes_here) < 2:
+            continue
+        for source, source_depth, _ in tubes_here:
+            for dest, dest_depth, dest_space in tubes_here:
+                if source == dest or dest_space < source_depth:
+                    continue
+                # The destination is complete if it only contained this colour and is now full.
+                if dest_space == source_depth and dest_depth + dest_space == len(tubes[dest]):
+                    completing.append(Move(source, dest))
+                else:
+                    others.append(Move(source, dest))
+
+    if first_empty is not None:
+        others.extend(Move(source, first_empty) for source in mixed_tubes)
+
+    moves = completing + others
+    if last_move is not None:
+        reverse = Move(last_move.dest, last_move.src)
+        moves = [move for move in moves if move != reverse]
+    return moves
+
+def get_forced_packed_move(tubes: Sequence[bytes]) -> Optional[Move]:
+    """Find a move in a packed board that is safe to make without considering any others.
+
+    A move is forced if it pours into a tube holding nothing but one colour, and every other cell
+    of that colour (apart from those in tubes it already fills) sits on top of a tube, with just
+    enough of them to fill it. Pouring all of them in finishes that colour without burying
+    anything, so it never stops the board being solved or makes its solution longer. Returns None
+    if there is no such move.
+    """
+    tops = [_packed_top_of_tube_info(tube) for tube in tubes]
+    counts = None
+    for dest, (colour, depth, space) in enumerate(tops):
+        size = len(tubes[dest])
+        if colour == 0 or space == 0 or depth + space != size:
+            continue
+        sources = [
+            (src, src_depth) for src, (src_colour, src_depth, _) in enumerate(tops)
+            if src_colour == colour and src != dest and src_depth != size]
+        if sum(src_depth for _, src_depth in sources) != space:
+            continue
+        if counts is None:
+            counts = Counter(b"".join(tubes))
+        full_tubes = sum(
+            1 for top_colour, top_depth, _ in tops if top_colour == colour and top_depth == size)
+        if counts[colour] == (full_tubes + 1) * size:
+            return Move(sources[0][0], dest)
+    return None
+
+def get_forced_moves(board: state.TubeBoard) -> List[Move]:
+    """Return the forced moves (see `get_forced_packed_move`) that can be made one after another
+    from the board, in order."""
+    tubes = [bytearray(tube) for tube in state.pack(board).tubes]
+    forced = []
+    move = get_forced_packed_move(tubes)
+    while move is not None:
+        forced.append(move)
+        pour_in_place(tubes, move)
+        move = get_forced_packed_move(tubes)
+    return forced
+
+def apply_packed_move(board: state.PackedBoard, move: Move) -> state.PackedBoard:
+    """Apply a move to a packed board and return a new packed board with the result.
+
+    Only the source and destination tubes are rebuilt; the others are shared with `board`. Like
+    `apply_move`, this raises a ValueError if the move is illegal.
+    """
+    tubes = board.tubes
+    if move.src == move.dest:
+        raise ValueError(f"Error applying move {move}: source and destination of a move cannot " +
+            "be equal.")
+    if move.src < 0 or move.src >= len(tubes):
+        raise ValueError(f"Error applying move {move}: source is out of range.")
+    if move.dest < 0 or move.dest >= len(tubes):
+        raise ValueError(f"Error applying move {move}: destination is out of range.")
+
+    src_tube = tubes[move.src]
+    dest_tube = tubes[move.dest]
+    colour, depth, src_space = _packed_top_of_tube_info(src_tube)
+    _, _, dest_space = _packed_top_of_tube_info(dest_tube)
+
+    if dest_space < depth:
+        raise ValueError(f"Error applying move {move}: trying to move liquid of depth " +
+        f"{depth} into tube with only {dest_space} free.")
+
+    new_tubes = list(tubes)
+    new_tubes[move.src] = bytes(src_space + depth) + src_tube[src_space + depth:]
+    new_tubes[move.dest] = (
+        bytes(dest_space - depth) + bytes((colour,)) * depth + dest_tube[dest_space:])
+    return state.PackedBoard(tuple(new_tubes))
+
+def get_possible_reverse_packed_moves(tubes: Sequence[bytes]) -> List[Tuple[Move, int]]:
+    """Find all the moves that could have led to the given packed tubes.
+
+    Each result is a (move, depth) pair: applying `move` to the board obtained by pouring `depth`
+    cells back from `move.dest` to `move.src` (see `apply_reverse_packed_move`) gives these tubes,
+    and `move` is one `get_possible_packed_moves` would generate for that earlier board.
+    """
+    tops = [_packed_top_of_tube_info(tube) for tube in tubes]
+    reverse_moves = []
+    for dest, (colour, run_depth, dest_space) in enumerate(tops):
+        if colour == 0:
+            continue
+        # The poured cells can only be the whole run if the destination was empty beforehand;
+        # otherwise a different colour would have been on top of it.
+        max_depth = run_depth if dest_space + run_depth == len(tubes[dest]) else run_depth - 1
+        for src, (src_colour, _, src_space) in enumerate(tops):
+            # If the source's top matched, it would have poured a deeper run than this.
+            if src == dest or src_colour == colour:
+                continue
+            for depth in range(1, min(max_depth, src_space) + 1):
+                reverse_moves.append((Move(src, dest), depth))
+    return reverse_moves
+
+def apply_reverse_packed_move(
+        board: state.PackedBoard, move: Move, depth: int) -> state.PackedBoard:
+    """Undo a move of `depth` cells, pouring them back from `move.dest` to `move.src`."""
+    tubes = board.tubes
+    src_tube = tubes[move.src]
+    dest_tube = tubes[move.dest]
+    _, _, src_space = _packed_top_of_tube_info(src_tube)
+    colour, _, dest_space = _packed_top_of_tube_info(dest_tube)
+
+    new_tubes = list(tubes)
+    new_tubes[move.dest] = bytes(dest_space + depth) + dest_tube[dest_space + depth:]
+    new_tubes[move.src] = (
+        bytes(src_space - depth) + bytes((colour,)) * depth + src_tube[src_space:])
+    return state.PackedBoard(tuple(new_tubes))
+
+def pour_in_place(tubes: MutableSequence[bytearray], move: Move) -> int:
+    """Apply a legal move to mutable packed tubes in place and return the depth poured.
+
+    Unlike `apply_packed_move`, this doesn't validate the move, so it should only be used with
+    moves from `get_possible_packed_moves`. The returned depth is needed to undo the move.
+    """
+    src_tube = tubes[move.src]
+    dest_tube = tubes[move.dest]
+    colour, depth, src_space = _packed_top_of_tube_info(src_tube)
+    _, _, dest_space = _packed_top_of_tube_info(dest_tube)
+    src_tube[src_space:src_space + depth] = bytes(depth)
+    dest_tube[dest_space - depth:dest_space] = bytes((colour,)) * depth
+    return depth
+
+def undo_pour_in_place(tubes: MutableSequence[bytearray], move: Move, depth: int):
+    """Undo a move previously applied with `pour_in_place`."""
+    src_tube = tubes[move.src]
+    dest_tube = tubes[move.dest]
+    _, _, src_space = _packed_top_of_tube_info(src_tube)
+    colour, _, dest_space = _packed_top_of_tube_info(dest_tube)
+    dest_tube[dest_space:dest_space + depth] = bytes(depth)
+    src_tube[src_space - depth:src_space] = bytes((colour,)) * depth
+
 
 def encode_solution(solution: List[Move]) -> str:
     flattened = {_SOLUTION_KEY: [(move.src, move.dest) for move in solution]}
@@ -153,5 +396,5 @@ def write_solution_to_file(solution: List[Move], filepath: str):
 
 def load_solution_from_file(filepath: str) -> List[Move]:
     with open(filepath, "r") as infile:
-        content = "".join(infile.readlines())
+        content = infile.read()
         return decode_solution(content)
@@ -16,6 +16,12 @@ class TestTopOfTubeInfo(unittest.TestCase):
             moves._TopOfTube(0, 0, 4, 0),
             moves._calculate_top_of_tube_info(tube))
 
+    def test_deeper_empty_tube(self):
+        tube = state.TubeState(state=[0, 0, 0, 0, 0, 0])
+        self.assertEqual(
+            moves._TopOfTube(0, 0, 6, 0),
+            moves._calculate_top_of_tube_info(tube))
+
     def test_single_element(self):
         tube = state.TubeState(state=[0, 0, 4, 1, 1, 3, 4, 2])
         self.assertEqual(
@@ -172,6 +178,192 @@ class TestApplyMove(unittest.TestCase):
         moves.apply_move(board, moves.Move(1, 0))
         self.assertEqual(want_original_board, board)
 
+    def test_move_into_deep_empty_tube(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 0, 1, 1, 2]),
+            state.TubeState(state=[0, 0, 0, 0, 0, 0])
+        ])
+        want_board = state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 0, 0, 0, 2]),
+            state.TubeState(state=[0, 0, 0, 0, 1, 1])
+        ])
+        got_board = moves.apply_move(board, moves.Move(0, 1))
+        self.assertEqual(want_board, got_board)
+        self.assertEqual(
+            moves.apply_packed_move(state.pack(board), moves.Move(0, 1)), state.pack(want_board))
+
+
+class TestPackedMoves(unittest.TestCase):
+    _BOARDS = [
+        state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 1, 2]),
+            state.TubeState(state=[0, 0, 2, 2]),
+            state.TubeState(state=[0, 0, 0, 2])
+        ]),
+        state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 1, 2, 2]),
+            state.TubeState(state=[1, 1, 2, 2]),
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[0, 0, 0, 0])
+        ]),
+        state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 3, 4]),
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[0, 3, 3, 1]),
+            state.TubeState(state=[0, 0, 1, 4])
+        ]),
+    ]
+
+    def test_top_of_tube_info(self):
+        self.assertEqual((0, 0, 4), moves._packed_top_of_tube_info(bytes([0, 0, 0, 0])))
+        self.assertEqual((1, 3, 2), moves._packed_top_of_tube_info(bytes([0, 0, 1, 1, 1, 3])))
+        self.assertEqual((2, 1, 5), moves._packed_top_of_tube_info(bytearray([0] * 5 + [2, 1])))
+        self.assertEqual((2, 1, 5), moves._packed_top_of_tube_info(bytes([0] * 5 + [2, 1])))
+
+    def test_same_moves_as_unpacked(self):
+        for board in self._BOARDS:
+            self.assertEqual(
+                moves.get_possible_moves(board),
+                moves.get_possible_packed_moves(state.pack(board).tubes))
+
+    def test_same_result_as_unpacked(self):
+        for board in self._BOARDS:
+            for move in moves.get_possible_moves(board):
+                self.assertEqual(
+                    moves.apply_move(board, move),
+                    state.unpack(moves.apply_packed_move(state.pack(board), move)))
+
+    def test_untouched_tubes_are_shared(self):
+        board = state.pack(self._BOARDS[2])
+        new_board = moves.apply_packed_move(board, moves.Move(0, 1))
+        self.assertIs(board.tubes[2], new_board.tubes[2])
+        self.assertIs(board.tubes[3], new_board.tubes[3])
+
+    def test_pour_and_undo_in_place(self):
+        for board in self._BOARDS:
+            packed = state.pack(board)
+            for move in moves.get_possible_packed_moves(packed.tubes):
+                tubes = [bytearray(tube) for tube in packed.tubes]
+                depth = moves.pour_in_place(tubes, move)
+                self.assertEqual(
+                    list(moves.apply_packed_move(packed, move).tubes), tubes)
+                moves.undo_pour_in_place(tubes, move, depth)
+                self.assertEqual(list(packed.tubes), tubes)
+
+    def test_reverse_moves_undo_forward_moves(self):
+        for board in self._BOARDS:
+            packed = state.pack(board)
+            for move in moves.get_possible_packed_moves(packed.tubes):
+                child = moves.apply_packed_move(packed, move)
+                depth = moves._packed_top_of_tube_info(packed.tubes[move.src])[1]
+                self.assertIn((move, depth), moves.get_possible_reverse_packed_moves(child.tubes))
+                self.assertEqual(packed, moves.apply_reverse_packed_move(child, move, depth))
+
+    def test_reverse_moves_lead_to_legal_forward_moves(self):
+        for board in self._BOARDS:
+            packed = state.pack(board)
+            for move, depth in moves.get_possible_reverse_packed_moves(packed.tubes):
+                parent = moves.apply_reverse_packed_move(packed, move, depth)
+                self.assertIn(move, moves.get_possible_packed_moves(parent.tubes))
+                self.assertEqual(packed, moves.apply_packed_move(parent, move))
+
+    def test_illegal_move_not_enough_space(self):
+        board = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 1, 2]),
+            state.TubeState(state=[1, 1, 1, 2])
+        ]))
+        with self.assertRaises(ValueError) as ve:
+            moves.apply_packed_move(board, moves.Move(1, 0))
+        self.assertIn(
+            "trying to move liquid of depth 3 into tube with only 2 free",
+            str(ve.exception))
+
+
+class TestPrunedMoves(unittest.TestCase):
+    def test_only_first_empty_tube_is_a_destination(self):
+        tubes = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 1, 2, 2]),
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[2, 2, 1, 1]),
+            state.TubeState(state=[0, 0, 0, 0])
+        ])).tubes
+        self.assertEqual(
+            [moves.Move(0, 1), moves.Move(2, 1)], moves.get_pruned_packed_moves(tubes))
+
+    def test_single_colour_tube_not_poured_into_empty(self):
+        tubes = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 1, 1]),
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[2, 2, 2, 1])
+        ])).tubes
+        self.assertEqual([moves.Move(2, 1)], moves.get_pruned_packed_moves(tubes))
+
+    def test_reverse_of_last_move_is_skipped(self):
+        tubes = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 1, 2]),
+            state.TubeState(state=[0, 0, 1, 3])
+        ])).tubes
+        self.assertEqual(
+            [moves.Move(0, 1), moves.Move(1, 0)], moves.get_pruned_packed_moves(tubes))
+        self.assertEqual(
+            [moves.Move(1, 0)],
+            moves.get_pruned_packed_moves(tubes, last_move=moves.Move(1, 0)))
+
+    def test_completing_moves_come_first(self):
+        tubes = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 1, 2]),
+            state.TubeState(state=[0, 0, 1, 3]),
+            state.TubeState(state=[0, 1, 1, 1])
+        ])).tubes
+        self.assertEqual(moves.Move(0, 2), moves.get_pruned_packed_moves(tubes)[0])
+
+    def test_subset_of_possible_moves(self):
+        for board in TestPackedMoves._BOARDS:
+            tubes = state.pack(board).tubes
+            possible = moves.get_possible_packed_moves(tubes)
+            for move in moves.get_pruned_packed_moves(tubes):
+                self.assertIn(move, possible)
+
+
+class TestForcedMoves(unittest.TestCase):
+    def test_completes_tube_from_tops(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 1, 1]),
+            state.TubeState(state=[0, 1, 2, 2]),
+            state.TubeState(state=[0, 1, 2, 2]),
+            state.TubeState(state=[0, 0, 0, 0])
+        ])
+        self.assertEqual(moves.Move(1, 0), moves.get_forced_packed_move(state.pack(board).tubes))
+        self.assertEqual([moves.Move(1, 0), moves.Move(2, 0), moves.Move(2, 1)],
+            moves.get_forced_moves(board))
+
+    def test_not_forced_if_colour_is_buried(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 1, 1, 1]),
+            state.TubeState(state=[0, 2, 1, 2]),
+            state.TubeState(state=[0, 0, 2, 2]),
+            state.TubeState(state=[0, 0, 0, 0])
+        ])
+        self.assertIsNone(moves.get_forced_packed_move(state.pack(board).tubes))
+
+    def test_not_forced_if_too_much_colour_on_top(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 1, 1]),
+            state.TubeState(state=[0, 0, 1, 1]),
+            state.TubeState(state=[0, 0, 1, 1]),
+            state.TubeState(state=[0, 0, 1, 1])
+        ])
+        self.assertEqual([], moves.get_forced_moves(board))
+
+    def test_ignores_full_tubes(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 1]),
+            state.TubeState(state=[0, 1]),
+            state.TubeState(state=[1, 2]),
+            state.TubeState(state=[0, 2])
+        ])
+        self.assertEqual([moves.Move(2, 1), moves.Move(3, 2)], moves.get_forced_moves(board))
+
 
 class TestSerialisation(unittest.TestCase):
     def test_empty_serialisation(self):
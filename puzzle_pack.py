@@ -0,0 +1,236 @@
+import argparse
+import dataclasses
+import glob
+import json
+import mmap
+import moves
+import os
+import state
+import struct
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional
+
+# A puzzle pack holds many puzzles and their solutions in one binary file:
+#   * A header: magic bytes, format version, number of puzzles and the offset of the index.
+#   * Each puzzle's cells (one byte each, tube by tube), solution moves (a pair of little-endian
+#     16-bit tube indices each) and metadata (its name and colours, as UTF-8 JSON), back to back.
+#   * An index with one fixed-size entry per puzzle, locating its data. It comes last so that packs
+#     can be written in a single pass.
+_MAGIC = b"TTPK"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHIQ")
+# Cells offset, number of tubes, depth, flags, solution offset, solution length (in moves),
+# metadata offset and metadata length (in bytes).
+_INDEX_ENTRY = struct.Struct("<QHBBQIQI")
+_MOVE = struct.Struct("<HH")
+_HAS_SOLUTION = 0x1
+
+_NAME_KEY = "Name"
+_COLOURS_KEY = "Colours"
+
+
+@dataclasses.dataclass
+class PackedPuzzle:
+    """A named puzzle and its solution, if it has one, as stored in a puzzle pack."""
+    name: str
+    puzzle: state.SavedPuzzle
+    solution: Optional[List[moves.Move]] = None
+
+
+def _write_puzzle(outfile: BinaryIO, entry: PackedPuzzle) -> bytes:
+    """Write a puzzle's data at the current position, returning its index entry."""
+    board = entry.puzzle.board
+    if board.depth > 0xff or len(board.tubes) > 0xffff:
+        raise ValueError(f"Could not write '{entry.name}' with {len(board.tubes)} tubes of " +
+            f"depth {board.depth}: packs can hold at most 65535 tubes of depth at most 255.")
+    cells = state.pack(board).to_bytes()
+    cells_offset = outfile.tell()
+    outfile.write(cells)
+
+    solution_offset = outfile.tell()
+    flags = 0
+    solution_length = 0
+    if entry.solution is not None:
+        flags |= _HAS_SOLUTION
+        solution_length = len(entry.solution)
+        try:
+            outfile.write(b"".join(_MOVE.pack(move.src, move.dest) for move in entry.solution))
+        except struct.error:
+            raise ValueError(f"Could not write the solution of '{entry.name}': tube indices " +
+                "must be in the range 0-65535.")
+
+    metadata = json.dumps({_NAME_KEY: entry.name, _COLOURS_KEY: entry.puzzle.colours}).encode()
+    metadata_offset = outfile.tell()
+    outfile.write(metadata)
+    return _INDEX_ENTRY.pack(
+        cells_offset, len(board.tubes), board.depth, flags, solution_offset, solution_length,
+        metadata_offset, len(metadata))
+
+def write_pack(puzzles: Iterable[PackedPuzzle], filepath: str):
+    """Write puzzles to a puzzle pack file, reading them one at a time."""
+    with open(filepath, "wb") as outfile:
+        outfile.write(bytes(_HEADER.size))
+        index = [_write_puzzle(outfile, entry) for entry in puzzles]
+        index_offset = outfile.tell()
+        outfile.write(b"".join(index))
+        outfile.seek(0)
+        outfile.write(_HEADER.pack(_MAGIC, _VERSION, 0, len(index), index_offset))
+
+
+class PuzzlePack:
+    """Reads a puzzle pack file through a memory map.
+
+    Nothing is parsed up front, so opening even a huge pack is instant, and the cells of each board
+    can be read straight out of the map without copying (see `cells`). Use it as a context manager,
+    or call `close` when done.
+    """
+    def __init__(self, filepath: str):
+        with open(filepath, "rb") as infile:
+            # Checked before mapping the file, since empty files can't be mapped.
+            if os.fstat(infile.fileno()).st_size < _HEADER.size:
+                raise ValueError(f"Could not read puzzle pack '{filepath}': it is too short.")
+            self._map = mmap.mmap(infile.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        try:
+            self._read_header(filepath)
+        except ValueError:
+            self.close()
+            raise
+        self._names: Optional[Dict[str, int]] = None
+
+    def _read_header(self, filepath: str):
+        magic, version, _, count, index_offset = _HEADER.unpack_from(self._map)
+        if magic != _MAGIC:
+            raise ValueError(f"Could not read puzzle pack '{filepath}': it isn't a puzzle pack.")
+        if version != _VERSION:
+            raise ValueError(f"Could not read puzzle pack '{filepath}': version {version} isn't " +
+                f"supported (only version {_VERSION} is).")
+        if index_offset + count * _INDEX_ENTRY.size > len(self._map):
+            raise ValueError(f"Could not read puzzle pack '{filepath}': it is truncated.")
+        self._count = count
+        self._index_offset = index_offset
+
+    def __enter__(self) -> "PuzzlePack":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        """Close the pack.
+
+        Views returned by `cells` stay valid after closing: the memory map is only unmapped once
+        the last of them is released or garbage collected.
+        """
+        self._view.release()
+        try:
+            self._map.close()
+        except BufferError:
+            # Views are still held, and they keep their own reference to the map.
+            pass
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _entry(self, index: int):
+        if not 0 <= index < self._count:
+            raise IndexError(f"Puzzle index {index} is out of range: the pack holds " +
+                f"{self._count} puzzles.")
+        return _INDEX_ENTRY.unpack_from(
+            self._map, self._index_offset + index * _INDEX_ENTRY.size)
+
+    def cells(self, index: int) -> memoryview:
+        """Return a zero-copy view of a board's cells, one byte each, tube by tube."""
+        cells_offset, num_tubes, depth, *_ = self._entry(index)
+        return self._view[cells_offset:cells_offset + num_tubes * depth]
+
+    def depth(self, index: int) -> int:
+        return self._entry(index)[2]
+
+    def packed_board(self, index: int) -> state.PackedBoard:
+        return state.PackedBoard.from_bytes(self.cells(index), self.depth(index))
+
+    def board(self, index: int) -> state.TubeBoard:
+        return state.unpack(self.packed_board(index))
+
+    def solution(self, index: int) -> Optional[List[moves.Move]]:
+        _, _, _, flags, solution_offset, solution_length, _, _ = self._entry(index)
+        if not flags & _HAS_SOLUTION:
+            return None
+        return [
+            moves.Move(src, dest)
+            for src, dest in _MOVE.iter_unpack(
+                self._view[solution_offset:solution_offset + solution_length * _MOVE.size])]
+
+    def _metadata(self, index: int) -> dict:
+        metadata_offset, metadata_length = self._entry(index)[6:]
+        return json.loads(bytes(self._view[metadata_offset:metadata_offset + metadata_length]))
+
+    def name(self, index: int) -> str:
+        return self._metadata(index)[_NAME_KEY]
+
+    def find(self, name: str) -> int:
+        """Return the index of the puzzle with the given name, or raise a KeyError."""
+        if self._names is None:
+            self._names = {self.name(index): index for index in range(self._count)}
+        return self._names[name]
+
+    def puzzle(self, index: int) -> PackedPuzzle:
+        metadata = self._metadata(index)
+        return PackedPuzzle(
+            metadata[_NAME_KEY],
+            state.SavedPuzzle(self.board(index), metadata[_COLOURS_KEY]),
+            self.solution(index))
+
+    def __iter__(self) -> Iterator[PackedPuzzle]:
+        for index in range(self._count):
+            yield self.puzzle(index)
+
+
+def _read_directories(board_dir: str, solution_dir: Optional[str]) -> Iterator[PackedPuzzle]:
+    for board_path in sorted(glob.glob(os.path.join(board_dir, "*.json"))):
+        name = os.path.basename(board_path)
+        solution = None
+        if solution_dir is not None:
+            solution_path = os.path.join(solution_dir, name)
+            if os.path.exists(solution_path):
+                solution = moves.load_solution_from_file(solution_path)
+        yield PackedPuzzle(name, state.load_from_file(board_path), solution)
+
+def pack_directories(board_dir: str, solution_dir: Optional[str], filepath: str):
+    """Pack the JSON puzzle files in `board_dir`, with any solution files of the same name in
+    `solution_dir`, into a puzzle pack."""
+    write_pack(_read_directories(board_dir, solution_dir), filepath)
+
+def unpack_to_directories(filepath: str, board_dir: str, solution_dir: str):
+    """Write each puzzle in a pack to a JSON file in `board_dir`, and its solution (if it has one)
+    to a file of the same name in `solution_dir`."""
+    os.makedirs(board_dir, exist_ok=True)
+    os.makedirs(solution_dir, exist_ok=True)
+    with PuzzlePack(filepath) as pack:
+        for entry in pack:
+            state.write_to_file(entry.puzzle, os.path.join(board_dir, entry.name))
+            if entry.solution is not None:
+                moves.write_solution_to_file(entry.solution, os.path.join(solution_dir, entry.name))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(
+        description="Convert between puzzle packs and directories of JSON puzzle files.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    pack_parser = subparsers.add_parser("pack", help="pack JSON files into a puzzle pack")
+    unpack_parser = subparsers.add_parser("unpack", help="unpack a puzzle pack into JSON files")
+    for subparser in [pack_parser, unpack_parser]:
+        subparser.add_argument("pack", help="puzzle pack file")
+        subparser.add_argument("--boards", default="boards", help="directory of puzzle files")
+        subparser.add_argument(
+            "--solutions", default="solutions", help="directory of solution files")
+    args = parser.parse_args(argv)
+
+    if args.command == "pack":
+        pack_directories(args.boards, args.solutions, args.pack)
+    else:
+        unpack_to_directories(args.pack, args.boards, args.solutions)
+
+
+if __name__ == '__main__':
+    main()
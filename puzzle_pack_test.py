@@ -0,0 +1,120 @@
+import moves
+import os
+import puzzle_pack
+import shutil
+import state
+import tempfile
+import unittest
+from testing_helpers import make_board
+
+
+_PUZZLES = [
+    puzzle_pack.PackedPuzzle(
+        "small.json",
+        state.SavedPuzzle(make_board([1, 2], [2, 1], [0, 0]), ["#ff0000", "#00ff00"]),
+        [moves.Move(0, 2), moves.Move(1, 0), moves.Move(1, 2)]),
+    puzzle_pack.PackedPuzzle(
+        "unsolved.json",
+        state.SavedPuzzle(make_board([1, 1, 1, 2, 2, 2], [2, 2, 2, 1, 1, 1]), ["red", "blue"])),
+    puzzle_pack.PackedPuzzle(
+        "empty.json", state.SavedPuzzle(make_board([0, 0, 0], [0, 0, 0]), []), []),
+]
+
+
+class PuzzlePackTest(unittest.TestCase):
+    def setUp(self):
+        self._tempdir = tempfile.mkdtemp()
+        self._path = os.path.join(self._tempdir, "puzzles.pack")
+
+    def tearDown(self):
+        shutil.rmtree(self._tempdir)
+
+    def test_round_trip(self):
+        puzzle_pack.write_pack(_PUZZLES, self._path)
+        with puzzle_pack.PuzzlePack(self._path) as pack:
+            self.assertEqual(len(_PUZZLES), len(pack))
+            self.assertEqual(_PUZZLES, list(pack))
+
+    def test_random_access(self):
+        puzzle_pack.write_pack(iter(_PUZZLES), self._path)
+        with puzzle_pack.PuzzlePack(self._path) as pack:
+            self.assertEqual(bytes([1, 2, 2, 1, 0, 0]), pack.cells(0))
+            self.assertEqual(state.pack(_PUZZLES[1].puzzle.board), pack.packed_board(1))
+            self.assertEqual(_PUZZLES[0].puzzle.board, pack.board(0))
+            self.assertIsNone(pack.solution(1))
+            self.assertEqual([], pack.solution(2))
+            self.assertEqual("unsolved.json", pack.name(1))
+            self.assertEqual(2, pack.find("empty.json"))
+            with self.assertRaises(IndexError):
+                pack.board(3)
+            with self.assertRaises(KeyError):
+                pack.find("missing.json")
+
+    def test_cells_are_views(self):
+        puzzle_pack.write_pack(_PUZZLES, self._path)
+        with puzzle_pack.PuzzlePack(self._path) as pack:
+            cells = pack.cells(1)
+            self.assertIsInstance(cells, memoryview)
+            self.assertTrue(cells.readonly)
+        # Views outlive the pack they came from.
+        self.assertEqual(state.pack(_PUZZLES[1].puzzle.board).to_bytes(), cells.tobytes())
+        cells.release()
+
+    def test_empty_pack(self):
+        puzzle_pack.write_pack([], self._path)
+        with puzzle_pack.PuzzlePack(self._path) as pack:
+            self.assertEqual(0, len(pack))
+            self.assertEqual([], list(pack))
+
+    def test_rejects_other_files(self):
+        with open(self._path, "wb") as outfile:
+            outfile.write(b"not a puzzle pack at all")
+        with self.assertRaisesRegex(ValueError, "isn't a puzzle pack"):
+            puzzle_pack.PuzzlePack(self._path)
+
+    def test_rejects_boards_too_big_to_index(self):
+        deep = puzzle_pack.PackedPuzzle(
+            "deep.json", state.SavedPuzzle(make_board([1] * 256), ["red"]))
+        with self.assertRaisesRegex(ValueError, "'deep.json' with 1 tubes of depth 256"):
+            puzzle_pack.write_pack([deep], self._path)
+
+    def test_rejects_empty_files(self):
+        open(self._path, "wb").close()
+        with self.assertRaisesRegex(ValueError, "too short"):
+            puzzle_pack.PuzzlePack(self._path)
+
+    def test_rejects_other_versions(self):
+        puzzle_pack.write_pack(_PUZZLES, self._path)
+        with open(self._path, "r+b") as outfile:
+            outfile.seek(4)
+            outfile.write(b"\x02\x00")
+        with self.assertRaisesRegex(ValueError, "version 2"):
+            puzzle_pack.PuzzlePack(self._path)
+
+    def test_rejects_truncated_files(self):
+        puzzle_pack.write_pack(_PUZZLES, self._path)
+        with open(self._path, "r+b") as outfile:
+            outfile.truncate(os.path.getsize(self._path) - 1)
+        with self.assertRaisesRegex(ValueError, "truncated"):
+            puzzle_pack.PuzzlePack(self._path)
+
+    def test_converts_directories(self):
+        pack_path = os.path.join(self._tempdir, "levels.pack")
+        puzzle_pack.pack_directories("boards", "solutions", pack_path)
+        board_dir = os.path.join(self._tempdir, "boards")
+        solution_dir = os.path.join(self._tempdir, "solutions")
+        puzzle_pack.unpack_to_directories(pack_path, board_dir, solution_dir)
+
+        self.assertEqual(sorted(os.listdir("boards")), sorted(os.listdir(board_dir)))
+        for name in os.listdir("boards"):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    state.load_from_file(os.path.join("boards", name)),
+                    state.load_from_file(os.path.join(board_dir, name)))
+        self.assertEqual(["empty.json"], os.listdir(solution_dir))
+        self.assertEqual(
+            [], moves.load_solution_from_file(os.path.join(solution_dir, "empty.json")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+import hashlib
+import moves
+import os
+import solver
+import sqlite3
+import state
+import threading
+import time
+from typing import List, Optional, Tuple
+
+
+_DATABASE_NAME = "solutions.sqlite3"
+
+
+class SolutionCache:
+    """A persistent cache of solutions, stored in a sqlite database in `directory`.
+
+    Entries are keyed on a digest of the board's canonical form and the solver strategy, so the
+    same puzzle is found however its tubes are ordered. Solutions are stored with tube indices in
+    canonical order and mapped back to the caller's tube order when they are looked up. Boards
+    with no solution are cached too.
+
+    If `max_entries` is set, the least recently used entries are evicted once the cache is full.
+    The cache can be shared between threads.
+    """
+    def __init__(self, directory: str, max_entries: Optional[int] = None):
+        if max_entries is not None and max_entries < 1:
+            raise ValueError(f"Invalid solution cache size {max_entries}: it must be positive.")
+        os.makedirs(directory, exist_ok=True)
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(
+            os.path.join(directory, _DATABASE_NAME), check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS solutions ("
+                "key TEXT PRIMARY KEY, solution TEXT, last_used INTEGER NOT NULL)")
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS solutions_by_last_used ON solutions (last_used)")
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM solutions").fetchone()[0]
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def lookup(
+            self,
+            board: state.TubeBoard,
+            strategy: str = solver.STRATEGY_DFS) -> Tuple[bool, Optional[List[moves.Move]]]:
+        """Look up the solution for a board.
+
+        Returns whether the board was found, and if so its solution (which is None if the board
+        has no solution).
+        """
+        tubes = state.pack(board).tubes
+        key = _digest(tubes, strategy)
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT solution FROM solutions WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return False, None
+            self.hits += 1
+            self._connection.execute(
+                "UPDATE solutions SET last_used = ? WHERE key = ?", (time.time_ns(), key))
+        if row[0] is None:
+            return True, None
+        order = state.get_canonical_order(tubes)
+        return True, [
+            moves.Move(order[move.src], order[move.dest])
+            for move in moves.decode_solution(row[0])]
+
+    def store(
+            self,
+            board: state.TubeBoard,
+            solution: Optional[List[moves.Move]],
+            strategy: str = solver.STRATEGY_DFS):
+        tubes = state.pack(board).tubes
+        encoded = None
+        if solution is not None:
+            canonical_positions = [0] * len(tubes)
+            for position, index in enumerate(state.get_canonical_order(tubes)):
+                canonical_positions[index] = position
+            encoded = moves.encode_solution([
+                moves.Move(canonical_positions[move.src], canonical_positions[move.dest])
+                for move in solution])
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO solutions (key, solution, last_used) VALUES (?, ?, ?)",
+                (_digest(tubes, strategy), encoded, time.time_ns()))
+            if self._max_entries is not None:
+                self._connection.execute(
+                    "DELETE FROM solutions WHERE key IN ("
+                    "SELECT key FROM solutions ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                    (self._max_entries,))
+
+    def solve(
+            self,
+            board: state.TubeBoard,
+            strategy: str = solver.STRATEGY_DFS,
+            **kwargs) -> List[moves.Move]:
+        """Return the cached solution for a board, solving and caching it if it isn't cached.
+
+        Other arguments are passed on to `solver.search`. Solutions from searches that were cut
+        short by a budget are returned but not cached.
+        """
+        found, solution = self.lookup(board, strategy)
+        if found:
+            return solution
+        result = solver.search(board, strategy=strategy, **kwargs)
+        if result.complete:
+            self.store(board, result.solution, strategy)
+        return result.solution
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _digest(tubes: List[bytes], strategy: str) -> str:
+    # The depth is included because tubes of different depths can join into the same bytes.
+    depth = len(tubes[0]) if tubes else 0
+    digest = hashlib.blake2b(f"{strategy}:{depth}:".encode(), digest_size=16)
+    digest.update(state.get_canonical_key(tubes))
+    return digest.hexdigest()
@@ -0,0 +1,90 @@
+import shutil
+import solution_cache
+import solver
+import state
+import tempfile
+import unittest
+from testing_helpers import check_solution, make_board
+
+
+class SolutionCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tempdir = tempfile.mkdtemp()
+        self._cache = solution_cache.SolutionCache(self._tempdir)
+
+    def tearDown(self):
+        self._cache.close()
+        shutil.rmtree(self._tempdir)
+
+    def test_miss(self):
+        self.assertEqual(
+            (False, None), self._cache.lookup(make_board([1, 1, 2, 2], [0, 0, 0, 0], [2, 2, 1, 1])))
+        self.assertEqual(1, self._cache.misses)
+
+    def test_round_trip(self):
+        board = make_board([1, 1, 2, 2], [0, 0, 0, 0], [2, 2, 1, 1])
+        solution = solver.solve(board)
+        self._cache.store(board, solution)
+        self.assertEqual((True, solution), self._cache.lookup(board))
+        self.assertEqual(1, self._cache.hits)
+
+    def test_finds_permuted_board(self):
+        board = make_board([1, 1, 2, 2], [0, 0, 0, 0], [2, 2, 1, 1])
+        self._cache.store(board, solver.solve(board))
+        permuted = make_board([2, 2, 1, 1], [1, 1, 2, 2], [0, 0, 0, 0])
+        found, solution = self._cache.lookup(permuted)
+        self.assertTrue(found)
+        check_solution(self, permuted, solution)
+
+    def test_caches_boards_with_no_solution(self):
+        board = make_board([1, 2, 1, 2], [2, 1, 2, 1])
+        self._cache.store(board, None)
+        self.assertEqual((True, None), self._cache.lookup(board))
+
+    def test_strategies_are_cached_separately(self):
+        board = make_board([1, 1, 2, 2], [0, 0, 0, 0], [2, 2, 1, 1])
+        self._cache.store(board, solver.solve(board))
+        self.assertFalse(self._cache.lookup(board, solver.STRATEGY_BFS)[0])
+
+    def test_persists_between_instances(self):
+        board = make_board([1, 1, 2, 2], [0, 0, 0, 0], [2, 2, 1, 1])
+        solution = solver.solve(board)
+        self._cache.store(board, solution)
+        self._cache.close()
+        self._cache = solution_cache.SolutionCache(self._tempdir)
+        self.assertEqual((True, solution), self._cache.lookup(board))
+
+    def test_evicts_least_recently_used(self):
+        self._cache.close()
+        self._cache = solution_cache.SolutionCache(self._tempdir, max_entries=2)
+        first = make_board([1, 1, 2, 2], [0, 0, 0, 0], [2, 2, 1, 1])
+        second = make_board([0, 0, 1, 1], [0, 0, 1, 1], [2, 2, 2, 2])
+        third = make_board([1, 2, 1, 2], [2, 1, 2, 1])
+        self._cache.store(first, solver.solve(first))
+        self._cache.store(second, solver.solve(second))
+        self._cache.lookup(first)
+        self._cache.store(third, None)
+        self.assertEqual(2, len(self._cache))
+        self.assertTrue(self._cache.lookup(first)[0])
+        self.assertFalse(self._cache.lookup(second)[0])
+
+    def test_solve_uses_cache(self):
+        board = state.load_from_file("boards/level10.json").board
+        solution = self._cache.solve(board)
+        check_solution(self, board, solution)
+        self.assertEqual(solution, self._cache.solve(board))
+        self.assertEqual(0.5, self._cache.hit_rate)
+
+    def test_solve_doesnt_cache_budget_limited_results(self):
+        board = state.load_from_file("boards/level135.json").board
+        self.assertIsNone(self._cache.solve(board, solver.STRATEGY_BFS, node_limit=10))
+        self.assertEqual(0, len(self._cache))
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError) as ve:
+            solution_cache.SolutionCache(self._tempdir, max_entries=0)
+        self.assertIn("it must be positive", str(ve.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import moves
+import solver
+import state
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# Stretches of up to this many moves are re-solved by breadth-first search to look for shortcuts.
+_DEFAULT_WINDOW = 5
+
+
+def _replay(board: state.PackedBoard, solution: Sequence[moves.Move]) -> List[state.PackedBoard]:
+    """Return the boards along a solution, starting with `board` itself."""
+    boards = [board]
+    for move in solution:
+        boards.append(moves.apply_packed_move(boards[-1], move))
+    return boards
+
+def _translate(solution: Sequence[moves.Move], mapping: List[int]) -> List[moves.Move]:
+    return [moves.Move(mapping[move.src], mapping[move.dest]) for move in solution]
+
+def _splice(
+        boards: List[state.PackedBoard],
+        solution: List[moves.Move],
+        start: int,
+        end: int,
+        shortcut: List[moves.Move]) -> List[moves.Move]:
+    """Replace the moves taking `boards[start]` to `boards[end]` with `shortcut`.
+
+    The shortcut only has to reach the same board up to tube order: the moves after it are
+    translated to match.
+    """
+    reached = _replay(boards[start], shortcut)[-1]
+    mapping = state.get_tube_mapping(boards[end].tubes, reached.tubes)
+    return solution[:start] + shortcut + _translate(solution[end:], mapping)
+
+def _remove_loops(board: state.PackedBoard, solution: List[moves.Move]) -> List[moves.Move]:
+    """Cut out the moves between any two visits to the same board (up to tube order)."""
+    boards = [board]
+    seen = {state.get_canonical_key(board.tubes): 0}
+    path = []
+    # Maps tube indices in the moves being read to tube indices in the boards being built.
+    mapping = list(range(len(board.tubes)))
+    for move in solution:
+        move = moves.Move(mapping[move.src], mapping[move.dest])
+        current = moves.apply_packed_move(boards[-1], move)
+        key = state.get_canonical_key(current.tubes)
+        index = seen.get(key)
+        if index is None:
+            seen[key] = len(boards)
+            boards.append(current)
+            path.append(move)
+            continue
+        # Back where it was before, so carry on from the earlier board.
+        step = state.get_tube_mapping(current.tubes, boards[index].tubes)
+        mapping = [step[tube] for tube in mapping]
+        for dropped in boards[index + 1:]:
+            del seen[state.get_canonical_key(dropped.tubes)]
+        del boards[index + 1:]
+        del path[index:]
+    return path
+
+def _merge_pours(board: state.PackedBoard, solution: List[moves.Move]) -> List[moves.Move]:
+    """Replace pairs of moves with a single move that has the same result, such as a pour that
+    goes through an intermediate tube."""
+    boards = _replay(board, solution)
+    index = 0
+    while index + 2 <= len(solution):
+        target = state.get_canonical_key(boards[index + 2].tubes)
+        for move in moves.get_possible_packed_moves(boards[index].tubes):
+            merged = moves.apply_packed_move(boards[index], move)
+            if state.get_canonical_key(merged.tubes) == target:
+                solution = _splice(boards, solution, index, index + 2, [move])
+                boards = _replay(board, solution)
+                break
+        else:
+            index += 1
+    return solution
+
+def _find_shortcut(
+        boards: List[state.PackedBoard],
+        start: int,
+        window: int) -> Optional[Tuple[int, List[moves.Move]]]:
+    """Search breadth-first from `boards[start]` for a shorter way to one of the next `window`
+    boards along the solution.
+
+    Returns the index of the board reached and the moves that reach it, for whichever shortcut
+    saves the most moves, or None if there isn't one.
+    """
+    targets: Dict[bytes, int] = {}
+    for end in range(start + 2, min(start + window, len(boards) - 1) + 1):
+        targets.setdefault(state.get_canonical_key(boards[end].tubes), end)
+    best_saving = 0
+    best = None
+    parents = {state.get_canonical_key(boards[start].tubes): None}
+    layer = [(boards[start], None)]
+    for depth in range(1, window):
+        next_layer = []
+        for current, last_move in layer:
+            key = state.get_canonical_key(current.tubes)
+            for move in moves.get_pruned_packed_moves(current.tubes, last_move):
+                child = moves.apply_packed_move(current, move)
+                child_key = state.get_canonical_key(child.tubes)
+                if child_key in parents:
+                    continue
+                parents[child_key] = (key, move)
+                end = targets.get(child_key)
+                if end is not None and end - start - depth > best_saving:
+                    best_saving = end - start - depth
+                    best = (end, _get_path(parents, child_key))
+                next_layer.append((child, move))
+        layer = next_layer
+    return best
+
+def _get_path(
+        parents: Dict[bytes, Optional[Tuple[bytes, moves.Move]]],
+        key: bytes) -> List[moves.Move]:
+    path = []
+    while parents[key] is not None:
+        key, move = parents[key]
+        path.append(move)
+    path.reverse()
+    return path
+
+def _shortcut_windows(
+        board: state.PackedBoard, solution: List[moves.Move], window: int) -> List[moves.Move]:
+    """Replace stretches of up to `window` moves with shorter ones found by breadth-first
+    search."""
+    boards = _replay(board, solution)
+    start = 0
+    while start + 2 < len(boards):
+        shortcut = _find_shortcut(boards, start, window)
+        if shortcut is None:
+            start += 1
+            continue
+        end, shortcut_moves = shortcut
+        solution = _splice(boards, solution, start, end, shortcut_moves)
+        boards = _replay(board, solution)
+    return solution
+
+def _is_solution(board: state.TubeBoard, solution: List[moves.Move]) -> bool:
+    try:
+        for move in solution:
+            board = moves.apply_move(board, move)
+    except ValueError:
+        return False
+    return solver.is_solved(board)
+
+def optimize(
+        board: state.TubeBoard,
+        solution: List[moves.Move],
+        window: int = _DEFAULT_WINDOW) -> List[moves.Move]:
+    """Shorten a solution for the board, returning one that is no longer.
+
+    Loops back to a board already passed through are cut out, pairs of moves that one move can do
+    are merged, and every stretch of up to `window` moves is re-solved by breadth-first search in
+    case there is a shorter way through it. These repeat until none of them helps. The result is
+    replayed with `moves.apply_move` to check that it solves the board.
+
+    Raises a ValueError if `solution` doesn't solve the board.
+    """
+    if window < 2:
+        raise ValueError(f"Invalid window {window}: it must be at least 2.")
+    if not _is_solution(board, solution):
+        raise ValueError("Could not optimise solution: it doesn't solve the board.")
+    packed = state.pack(board)
+    optimized = list(solution)
+    while True:
+        length = len(optimized)
+        optimized = _remove_loops(packed, optimized)
+        optimized = _merge_pours(packed, optimized)
+        optimized = _shortcut_windows(packed, optimized, window)
+        if len(optimized) == length:
+            break
+    # However it got here, never hand back anything worse than it was given.
+    if len(optimized) > len(solution) or not _is_solution(board, optimized):
+        return list(solution)
+    return optimized
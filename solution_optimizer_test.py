@@ -0,0 +1,58 @@
+import generator
+import moves
+import solution_optimizer
+import solver
+import state
+import unittest
+from testing_helpers import check_solution, make_board
+
+
+class OptimizeTest(unittest.TestCase):
+    def test_removes_loops(self):
+        board = make_board([0, 1, 2], [0, 2, 1], [0, 0, 0], [0, 1, 2])
+        solution = solver.solve(board, strategy=solver.STRATEGY_BFS)
+        # Wander off and come back to the same board with two tubes swapped over.
+        detour = [moves.Move(0, 2), moves.Move(3, 0), moves.Move(2, 3)]
+        optimized = solution_optimizer.optimize(board, detour + solution)
+        check_solution(self, board, optimized)
+        self.assertEqual(len(solution), len(optimized))
+
+    def test_merges_pours(self):
+        board = make_board([0, 1, 1], [0, 0, 0], [0, 0, 0], [0, 0, 1])
+        optimized = solution_optimizer.optimize(board, [moves.Move(0, 1), moves.Move(1, 3)])
+        self.assertEqual([moves.Move(0, 3)], optimized)
+
+    def test_finds_shortcuts(self):
+        board = state.load_from_file("boards/level6.json").board
+        solution = solver.solve(board, prune=False)
+        optimized = solution_optimizer.optimize(board, solution)
+        check_solution(self, board, optimized)
+        self.assertLess(len(optimized), len(solution))
+
+    def test_never_longer(self):
+        for board in generator.generate_boards(10, seed=2, num_tubes=8):
+            with self.subTest(board=board):
+                solution = solver.solve(board)
+                optimized = solution_optimizer.optimize(board, solution, window=3)
+                check_solution(self, board, optimized)
+                self.assertLessEqual(len(optimized), len(solution))
+                shortest = solver.solve(board, strategy=solver.STRATEGY_ASTAR)
+                self.assertGreaterEqual(len(optimized), len(shortest))
+
+    def test_already_solved(self):
+        self.assertEqual([], solution_optimizer.optimize(make_board([1, 1], [0, 0]), []))
+
+    def test_rejects_non_solutions(self):
+        board = make_board([0, 1, 2], [0, 2, 1], [0, 0, 0], [0, 1, 2])
+        with self.assertRaisesRegex(ValueError, "it doesn't solve the board"):
+            solution_optimizer.optimize(board, [moves.Move(0, 2)])
+        with self.assertRaisesRegex(ValueError, "it doesn't solve the board"):
+            solution_optimizer.optimize(board, [moves.Move(2, 0)])
+
+    def test_invalid_window(self):
+        with self.assertRaisesRegex(ValueError, "Invalid window 1"):
+            solution_optimizer.optimize(make_board([1, 1], [0, 0]), [], window=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,6 +1,245 @@
+import cProfile
+import collections
+import concurrent.futures
+import dataclasses
+import frontier
+import heapq
+import heuristics
+import itertools
 import moves
+import multiprocessing
+import os
+import pstats
 import state
-from typing import List
+import struct
+import sys
+import tempfile
+import time
+import transposition_table
+import zobrist
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where memory limits aren't supported.
+    resource = None
+
+
+# Depth-first search. Finds a solution quickly, but it is usually not the shortest one.
+STRATEGY_DFS = "dfs"
+# A* search. Finds a shortest solution, but keeps every state it has seen in memory.
+STRATEGY_ASTAR = "astar"
+# Breadth-first search. Finds a shortest solution, but keeps every state it has seen in memory.
+STRATEGY_BFS = "bfs"
+# Bidirectional breadth-first search from the board and its solved form. Finds a shortest
+# solution, expanding a few fewer states than breadth-first search, but the search back from the
+# solved form branches so widely that it is usually slower.
+STRATEGY_BIDIRECTIONAL = "bidirectional"
+# Iterative deepening A*. Finds a shortest solution with memory bounded by the transposition table.
+STRATEGY_IDASTAR = "idastar"
+# Breadth-first search which keeps the states it has seen on disk. Finds a shortest solution with
+# memory bounded by `external_memory` (see `solve`), however many states there are.
+STRATEGY_EXTERNAL = "external"
+
+STRATEGIES = (
+    STRATEGY_DFS, STRATEGY_BFS, STRATEGY_BIDIRECTIONAL, STRATEGY_ASTAR, STRATEGY_IDASTAR,
+    STRATEGY_EXTERNAL)
+
+# Strategies that run as an anytime search when given a budget, so that they can return the best
+# solution so far if it runs out (see `search`). The others keep to their own algorithm, which
+# matters most for `STRATEGY_EXTERNAL` and its memory bound.
+_ANYTIME_STRATEGIES = (STRATEGY_ASTAR, STRATEGY_IDASTAR)
+
+# How a search ended (see `search`).
+STATUS_OPTIMAL = "optimal"
+STATUS_FEASIBLE = "feasible"
+STATUS_EXHAUSTED = "exhausted"
+STATUS_TIMEOUT = "timeout"
+
+# How many states are expanded between calls to progress callbacks.
+_PROGRESS_INTERVAL = 1000
+
+# How many subtrees to hand out per worker in parallel searches, so that work stays balanced when
+# some subtrees are much smaller than others.
+_SUBTREES_PER_WORKER = 4
+# How many layers to expand at most when splitting a search into subtrees.
+_MAX_SPLIT_DEPTH = 8
+# How many states parallel depth-first workers can claim between them (eight bytes each).
+_SHARED_FILTER_CAPACITY = 1 << 21
+# How often a parallel search checks whether it has been cancelled, in seconds.
+_CANCEL_POLL_INTERVAL = 0.1
+# How many bytes of new states external-memory search holds before sorting them out to disk.
+_DEFAULT_EXTERNAL_MEMORY = 64 << 20
+# Roughly how much memory a Python bytes object takes on top of its contents.
+_BYTES_OVERHEAD = 40
+# External-memory search records follow each state's canonical key with the index of its parent
+# in the previous layer's file and the move from the parent's canonical form.
+_EXTERNAL_PARENT = struct.Struct("<QHH")
+# The most bytes external-memory search reads or writes at a time.
+_EXTERNAL_IO_BUFFER = 1 << 20
+# The most run files external-memory search merges at once, which bounds how many files it has
+# open. More runs than this are merged in several passes.
+_MAX_EXTERNAL_FAN_IN = 64
+# Besides the runs, a merge reads the visited keys and writes the next layer and visited keys.
+_EXTERNAL_MERGE_FILES = 3
+
+
+# The phases that profiled searches break their time down into (see `SolverStats`).
+PHASE_MOVE_GENERATION = "move_generation"
+PHASE_APPLY_MOVE = "apply_move"
+PHASE_CANONICALISATION = "canonicalisation"
+PHASE_HASHING = "hashing"
+PHASE_HEURISTIC = "heuristic"
+
+PHASES = (
+    PHASE_MOVE_GENERATION, PHASE_APPLY_MOVE, PHASE_CANONICALISATION, PHASE_HASHING,
+    PHASE_HEURISTIC)
+
+
+@dataclasses.dataclass
+class SolverStats:
+    """Statistics about a search, filled in by `solve`.
+
+    `nodes_generated` counts the children of expanded states, and `duplicate_hits` counts the
+    children that were skipped because their state had already been reached. `dead_ends` counts
+    the unsolved states reached that no moves can be made from. The branching factor is the
+    number of moves out of an expanded state. `phase_seconds` maps each of `PHASES`
+    to the time spent in it, and is only filled in by profiled searches.
+    """
+    nodes_expanded: int = 0
+    nodes_generated: int = 0
+    duplicate_hits: int = 0
+    dead_ends: int = 0
+    max_depth: int = 0
+    max_branching_factor: int = 0
+    seconds: float = 0.0
+    phase_seconds: Dict[str, float] = dataclasses.field(default_factory=dict)
+
+    @property
+    def mean_branching_factor(self) -> float:
+        return self.nodes_generated / self.nodes_expanded if self.nodes_expanded else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the stats as a JSON-serialisable dict."""
+        result = dataclasses.asdict(self)
+        result["mean_branching_factor"] = self.mean_branching_factor
+        return result
+
+
+@dataclasses.dataclass
+class SearchResult:
+    """The outcome of `search`.
+
+    `complete` is False if a budget ran out before the search finished, in which case a different
+    or shorter solution might have been found with a bigger budget.
+    """
+    solution: Optional[List[moves.Move]]
+    status: str
+    stats: SolverStats
+    complete: bool
+
+
+class SearchCancelled(Exception):
+    """Raised by `solve` when the search is cancelled before it finishes."""
+
+
+class _BudgetExhausted(Exception):
+    """Raised inside a search when it has run out of time, states or memory."""
+
+
+def _memory_usage() -> int:
+    """Return how much memory this process is using, in bytes."""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # Other platforms only report the peak, in kilobytes (or bytes on macOS).
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class _SearchControl:
+    """Counts the states a search expands, reports progress and enforces cancellation and budgets.
+
+    `cancel` can be anything with an `is_set` method, like a `threading.Event`. It, the `deadline`
+    (a `time.monotonic` time) and the `memory_limit` are only checked every `_PROGRESS_INTERVAL`
+    expansions, so that checking them doesn't slow the search down.
+    """
+    def __init__(
+            self,
+            progress: Optional[Callable[[int], None]] = None,
+            cancel=None,
+            deadline: Optional[float] = None,
+            node_limit: Optional[int] = None,
+            memory_limit: Optional[int] = None):
+        self.expanded = 0
+        self.generated = 0
+        self.duplicates = 0
+        self.dead_ends = 0
+        self.max_depth = 0
+        self.max_branching = 0
+        self._progress = progress
+        self._cancel = cancel
+        self._deadline = deadline
+        self._node_limit = node_limit
+        self._memory_limit = memory_limit
+        self._schedule_check()
+
+    def expand(self, depth: int = 0, branches: int = 0):
+        """Record that a state `depth` moves from the start is being expanded into `branches`."""
+        self.expanded += 1
+        self.generated += branches
+        if not branches:
+            self.dead_ends += 1
+        if branches > self.max_branching:
+            self.max_branching = branches
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if self.expanded >= self._next_check:
+            self._check()
+
+    def get_counters(self) -> Tuple[int, int, int, int, int, int]:
+        """Return the counters in a form that can cross a process boundary (see `add_counters`)."""
+        return (self.expanded, self.generated, self.duplicates, self.dead_ends, self.max_depth,
+            self.max_branching)
+
+    def add_counters(self, counters: Tuple[int, int, int, int, int, int], depth: int = 0):
+        """Add in the counters from a search of a subtree `depth` moves from the start."""
+        expanded, generated, duplicates, dead_ends, max_depth, max_branching = counters
+        self.expanded += expanded
+        self.generated += generated
+        self.duplicates += duplicates
+        self.dead_ends += dead_ends
+        self.max_depth = max(self.max_depth, depth + max_depth)
+        self.max_branching = max(self.max_branching, max_branching)
+
+    def fill_in(self, stats: SolverStats):
+        stats.nodes_expanded = self.expanded
+        stats.nodes_generated = self.generated
+        stats.duplicate_hits = self.duplicates
+        stats.dead_ends = self.dead_ends
+        stats.max_depth = self.max_depth
+        stats.max_branching_factor = self.max_branching
+
+    def _schedule_check(self):
+        self._next_check = (self.expanded // _PROGRESS_INTERVAL + 1) * _PROGRESS_INTERVAL
+        if self._node_limit is not None:
+            self._next_check = min(self._next_check, self._node_limit)
+
+    def _check(self):
+        if self._node_limit is not None and self.expanded >= self._node_limit:
+            raise _BudgetExhausted()
+        if self.expanded % _PROGRESS_INTERVAL == 0:
+            if self._progress is not None:
+                self._progress(self.expanded)
+            if self._cancel is not None and self._cancel.is_set():
+                raise SearchCancelled()
+            if self._deadline is not None and time.monotonic() >= self._deadline:
+                raise _BudgetExhausted()
+            if self._memory_limit is not None and _memory_usage() >= self._memory_limit:
+                raise _BudgetExhausted()
+        self._schedule_check()
 
 
 def _is_tube_solved(tube: state.TubeState) -> bool:
@@ -9,51 +248,1150 @@ def _is_tube_solved(tube: state.TubeState) -> bool:
 def is_solved(board: state.TubeBoard) -> bool:
     return all(_is_tube_solved(tube) for tube in board.tubes)
 
+def find_unsolvable_reason(
+        board: state.TubeBoard, num_colours: Optional[int] = None) -> Optional[str]:
+    """Return why the board obviously can't be solved, or None if it might be solvable.
 
-def _solve(
-        board: state.TubeBoard,
-        moves_made: List[moves.Move],
-        seen: frozenset) -> List[moves.Move]:
-    board_canonical = state.get_canonical_sorted_form(board)
-    if board_canonical in seen:
+    This is a quick static check, run before searching, which catches boards that are malformed
+    (tubes of different depths, or colours outside `1..num_colours` if that's given), boards with a
+    colour that can't fill whole tubes (so there would be more colours than tubes to sort them
+    into), and unsolved boards where no move can be made.
+    """
+    if not board.tubes:
         return None
-    
-    new_seen = seen.union(frozenset([board_canonical]))
-
-    if is_solved(board):
-        return moves_made
-    
-    for move in moves.get_possible_moves(board):
-        new_board = moves.apply_move(board, move)
-        result = _solve(new_board, moves_made + [move], new_seen)
-        if result:
-            return result
-    
+    depth = len(board.tubes[0].state)
+    counts = collections.Counter()
+    for index, tube in enumerate(board.tubes):
+        if len(tube.state) != depth:
+            return f"tube {index} holds {len(tube.state)} cells, but tube 0 holds {depth}"
+        counts.update(tube.state)
+    max_colour = 0xff if num_colours is None else num_colours
+    for colour in counts:
+        if not 0 <= colour <= max_colour:
+            return f"colour {colour} is out of range: it must be between 0 and {max_colour}"
+    counts.pop(0, None)
+    for colour, count in sorted(counts.items()):
+        if count % depth:
+            return (f"there are {count} cells of colour {colour}, which doesn't fill tubes " +
+                f"of depth {depth}")
+    packed = state.pack(board)
+    if (not state.is_packed_solved(packed.tubes)
+            and not moves.get_possible_packed_moves(packed.tubes)):
+        return "no moves can be made"
     return None
 
-# TODO: This is unworkably slow. The branch factor is surprisingly high (mainly caused by empty
-# tubes; likely wouldn't be so bad without them), and it takes over a minute to get to depth 8/9.
-# Proposal: maybe most of the inefficiency of the DFS solution is caused by pointlessly moving
-# between empties? Even filtering repeat states, there's still a lot of scope for moving things
-# around, especially in larger puzzles.
-def _solve_bfs(board: state.TubeBoard) -> List[moves.Move]:
-    queue = [(board, [])]
-
-    while len(queue):
-        front_board, moves_made = queue.pop(0)
-
-        if is_solved(front_board):
-            return moves_made
-    
-        possible = moves.get_possible_moves(front_board)
-        print(f"Branch {len(possible)}")
-        for move in possible:
-            print(len(moves_made + [move]))
-            new_board = moves.apply_move(front_board, move)
-            queue.append((new_board, moves_made + [move]))
-    
+class _CanonicalKeys:
+    """Keeps the canonical key of a mutable board up to date as moves are poured and undone.
+
+    Only the changed tubes are re-placed in the sorted tubes (see `state.update_sorted_tubes`).
+    """
+    def __init__(self, tubes: List[bytearray]):
+        self._tubes = tubes
+        self._sorted_tubes = sorted(bytes(tube) for tube in tubes)
+        self.key = b"".join(self._sorted_tubes)
+
+    def pour(self, move: moves.Move) -> int:
+        removed = self._changed_tubes(move)
+        depth = moves.pour_in_place(self._tubes, move)
+        self._update(removed, move)
+        return depth
+
+    def undo(self, move: moves.Move, depth: int):
+        removed = self._changed_tubes(move)
+        moves.undo_pour_in_place(self._tubes, move, depth)
+        self._update(removed, move)
+
+    def _changed_tubes(self, move: moves.Move) -> Tuple[bytes, bytes]:
+        return bytes(self._tubes[move.src]), bytes(self._tubes[move.dest])
+
+    def _update(self, removed: Tuple[bytes, bytes], move: moves.Move):
+        state.update_sorted_tubes(self._sorted_tubes, removed, self._changed_tubes(move))
+        self.key = b"".join(self._sorted_tubes)
+
+class _ZobristKeys:
+    """Keeps an order-independent Zobrist hash of a mutable board up to date.
+
+    Each pour updates the hash in constant time whatever the size of the board, at the cost of a
+    vanishingly small chance of two distinct states colliding.
+    """
+    def __init__(self, tubes: List[bytearray], hasher: zobrist.ZobristHasher):
+        self._tubes = tubes
+        self._hasher = hasher
+        self._tube_hashes = hasher.tube_hashes(tubes)
+        self.key = hasher.hash_unordered(self._tube_hashes)
+
+    def pour(self, move: moves.Move) -> int:
+        depth = moves._packed_top_of_tube_info(self._tubes[move.src])[1]
+        self.key = self._hasher.update_unordered(
+            self.key, self._tube_hashes, self._tubes, move.src, move.dest, depth)
+        return moves.pour_in_place(self._tubes, move)
+
+    def undo(self, move: moves.Move, depth: int):
+        self.key = self._hasher.update_unordered(
+            self.key, self._tube_hashes, self._tubes, move.dest, move.src, depth)
+        moves.undo_pour_in_place(self._tubes, move, depth)
+
+class _MacroKeys:
+    """Wraps `_CanonicalKeys` or `_ZobristKeys` so that each pour is followed by the forced moves
+    it leads to (see `moves.get_forced_packed_move`), collapsing them all into one search step.
+
+    `pour` returns a list of the (move, depth poured) pairs it made, which `undo` takes back.
+    """
+    def __init__(self, tubes: List[bytearray], keys):
+        self._tubes = tubes
+        self._keys = keys
+
+    @property
+    def key(self):
+        return self._keys.key
+
+    def pour(self, move: moves.Move) -> List[Tuple[moves.Move, int]]:
+        return [(move, self._keys.pour(move))] + self.pour_forced()
+
+    def pour_forced(self) -> List[Tuple[moves.Move, int]]:
+        poured = []
+        move = moves.get_forced_packed_move(self._tubes)
+        while move is not None:
+            poured.append((move, self._keys.pour(move)))
+            move = moves.get_forced_packed_move(self._tubes)
+        return poured
+
+    def undo(self, move: moves.Move, poured: List[Tuple[moves.Move, int]]):
+        for poured_move, depth in reversed(poured):
+            self._keys.undo(poured_move, depth)
+
+def _expand_macro_moves(poured: List[List[Tuple[moves.Move, int]]]) -> List[moves.Move]:
+    return [move for macro_move in poured for move, _ in macro_move]
+
+def _next_moves(
+        tubes: Sequence[bytes], last_move: Optional[moves.Move], prune: bool) -> List[moves.Move]:
+    if prune:
+        return moves.get_pruned_packed_moves(tubes, last_move)
+    return moves.get_possible_packed_moves(tubes)
+
+
+def _solve_iterative(
+        board: state.PackedBoard,
+        control: _SearchControl,
+        table: transposition_table.TranspositionTable,
+        prune: bool = True,
+        hasher: Optional[zobrist.ZobristHasher] = None,
+        macro_moves: bool = False) -> List[moves.Move]:
+    """Depth-first search with an explicit stack.
+
+    It keeps a single move path and a single mutable board which moves are applied to and undone
+    from in place, so there is no per-node copying and no risk of hitting the recursion limit.
+    Without pruning, moves are tried in `moves.get_possible_packed_moves` order. The transposition
+    table key
+    is also updated incrementally: it's the canonical key, or a Zobrist hash if `hasher` is given.
+
+    With `macro_moves`, forced moves are made as part of the move before them (see `_MacroKeys`).
+    """
+    tubes = [bytearray(tube) for tube in board.tubes]
+    keys = _CanonicalKeys(tubes) if hasher is None else _ZobristKeys(tubes, hasher)
+    forced = []
+    if macro_moves:
+        keys = _MacroKeys(tubes, keys)
+        forced = keys.pour_forced()
+    key = keys.key
+    if not table.should_visit(key, 0):
+        return None
+    if state.is_packed_solved(tubes):
+        return _expand_macro_moves([forced])
+
+    path: List[moves.Move] = []
+    poured_depths: List[int] = []
+    # States on the current path are checked separately, as a bounded table may have evicted them.
+    on_path = {key}
+    next_moves = _next_moves(tubes, None, prune)
+    control.expand(0, len(next_moves))
+    stack = [(iter(next_moves), key)]
+
+    while stack:
+        remaining_moves, key = stack[-1]
+        for move in remaining_moves:
+            depth = keys.pour(move)
+            child_key = keys.key
+            if child_key not in on_path and table.should_visit(child_key, len(path) + 1):
+                path.append(move)
+                if state.is_packed_solved(tubes):
+                    if macro_moves:
+                        return _expand_macro_moves([forced] + poured_depths + [depth])
+                    return path
+                # A macro move mustn't be followed by reversing the last of its forced moves.
+                last_move = depth[-1][0] if macro_moves else move
+                next_moves = _next_moves(tubes, last_move, prune)
+                if next_moves:
+                    poured_depths.append(depth)
+                    on_path.add(child_key)
+                    control.expand(len(path), len(next_moves))
+                    stack.append((iter(next_moves), child_key))
+                    break
+                # Nothing can be poured out of this state, so there's no point expanding it.
+                path.pop()
+                control.dead_ends += 1
+            else:
+                control.duplicates += 1
+            keys.undo(move, depth)
+        else:
+            # All moves from this state have been explored, so backtrack.
+            stack.pop()
+            on_path.discard(key)
+            if path:
+                keys.undo(path.pop(), poured_depths.pop())
+
+    return None
+
+def _reconstruct_path(
+        parents: Dict[bytes, Tuple[Optional[bytes], Optional[moves.Move]]],
+        key: bytes) -> List[moves.Move]:
+    path = []
+    parent_key, move = parents[key]
+    while parent_key is not None:
+        path.append(move)
+        parent_key, move = parents[parent_key]
+    path.reverse()
+    return path
+
+def _solve_astar(
+        board: state.PackedBoard,
+        control: _SearchControl,
+        prune: bool = True) -> List[moves.Move]:
+    """A* search for a shortest solution, guided by `heuristics.lower_bound`.
+
+    States are keyed on their canonical form. Each key maps to the actual board it was reached
+    with, so moves stay consistent with the tube order of their parent board when the path is
+    rebuilt. The heuristic is consistent, so a state's board and parent never change after it
+    has been expanded.
+    """
+    start_key = state.get_canonical_key(board.tubes)
+    boards = {start_key: board}
+    parents = {start_key: (None, None)}
+    best_depths = {start_key: 0}
+    expanded = set()
+    # The counter breaks ties in insertion order, so boards never need comparing.
+    counter = itertools.count()
+    open_heap = [(heuristics.lower_bound(board.tubes), next(counter), 0, start_key)]
+
+    while open_heap:
+        _, _, depth, key = heapq.heappop(open_heap)
+        if key in expanded or depth > best_depths[key]:
+            continue
+        expanded.add(key)
+
+        current = boards[key]
+        if state.is_packed_solved(current.tubes):
+            return _reconstruct_path(parents, key)
+
+        next_moves = _next_moves(current.tubes, parents[key][1], prune)
+        control.expand(depth, len(next_moves))
+        for move in next_moves:
+            child = moves.apply_packed_move(current, move)
+            child_key = state.get_canonical_key(child.tubes)
+            child_depth = depth + 1
+            if child_key in expanded or child_depth >= best_depths.get(child_key, child_depth + 1):
+                control.duplicates += 1
+                continue
+            best_depths[child_key] = child_depth
+            boards[child_key] = child
+            parents[child_key] = (key, move)
+            heapq.heappush(open_heap, (
+                child_depth + heuristics.lower_bound(child.tubes),
+                next(counter),
+                child_depth,
+                child_key))
+
+    return None
+
+def _bounded_search(
+        tubes: List[bytearray],
+        control: _SearchControl,
+        table: transposition_table.TranspositionTable,
+        prune: bool,
+        bound: int) -> Tuple[Optional[List[moves.Move]], Optional[int]]:
+    """One iteration of IDA*: a depth-first search cut off at `bound` estimated moves.
+
+    Returns a solution if one is found within the bound. Otherwise, returns the smallest estimate
+    that was cut off, which is the bound for the next iteration (or None if nothing was cut off,
+    meaning the whole reachable space has been searched).
+    """
+    table.clear()
+    start_key = state.get_canonical_key(tubes)
+    table.should_visit(start_key, 0)
+    if state.is_packed_solved(tubes):
+        return [], None
+    path: List[moves.Move] = []
+    poured_depths: List[int] = []
+    on_path = {start_key}
+    next_moves = _next_moves(tubes, None, prune)
+    control.expand(0, len(next_moves))
+    stack = [(iter(next_moves), start_key)]
+    next_bound = None
+
+    while stack:
+        remaining_moves, key = stack[-1]
+        for move in remaining_moves:
+            depth = moves.pour_in_place(tubes, move)
+            child_depth = len(path) + 1
+            estimate = child_depth + heuristics.lower_bound(tubes)
+            if estimate > bound:
+                if next_bound is None or estimate < next_bound:
+                    next_bound = estimate
+            else:
+                child_key = state.get_canonical_key(tubes)
+                if child_key not in on_path and table.should_visit(child_key, child_depth):
+                    path.append(move)
+                    if state.is_packed_solved(tubes):
+                        return path, None
+                    next_moves = _next_moves(tubes, move, prune)
+                    if next_moves:
+                        poured_depths.append(depth)
+                        on_path.add(child_key)
+                        control.expand(child_depth, len(next_moves))
+                        stack.append((iter(next_moves), child_key))
+                        break
+                    path.pop()
+                    control.dead_ends += 1
+                else:
+                    control.duplicates += 1
+            moves.undo_pour_in_place(tubes, move, depth)
+        else:
+            stack.pop()
+            on_path.discard(key)
+            if path:
+                moves.undo_pour_in_place(tubes, path.pop(), poured_depths.pop())
+
+    return None, next_bound
+
+def _solve_idastar(
+        board: state.PackedBoard,
+        control: _SearchControl,
+        table: transposition_table.TranspositionTable,
+        prune: bool = True) -> List[moves.Move]:
+    """Iterative deepening A* search for a shortest solution.
+
+    Each iteration is a depth-first search (over a single mutable board, like `_solve_iterative`)
+    that prunes states whose depth plus `heuristics.lower_bound` exceeds the current bound. The
+    transposition table is cleared between iterations, so memory use is bounded by its size.
+    """
+    tubes = [bytearray(tube) for tube in board.tubes]
+    bound = heuristics.lower_bound(tubes)
+    while bound is not None:
+        solution, bound = _bounded_search(tubes, control, table, prune, bound)
+        if solution is not None:
+            return solution
     return None
 
-def solve(board: state.TubeBoard):
-    return _solve(board, [], frozenset())
-    # return _solve_bfs(board)
+def _improving_solutions(
+        board: state.PackedBoard,
+        control: _SearchControl,
+        table: transposition_table.TranspositionTable,
+        prune: bool = True,
+        hasher: Optional[zobrist.ZobristHasher] = None,
+        macro_moves: bool = False) -> Iterator[List[moves.Move]]:
+    """Anytime branch-and-bound search, yielding shorter and shorter solutions.
+
+    Depth-first search quickly finds a first solution. Then each IDA* iteration (see
+    `_bounded_search`) looks for a solution at least one move shorter than the last, until none is
+    found, so the last solution yielded is a shortest one.
+    """
+    solution = _solve_iterative(board, control, table, prune, hasher, macro_moves)
+    while solution is not None:
+        yield solution
+        if not solution:
+            return
+        solution, _ = _bounded_search(
+            [bytearray(tube) for tube in board.tubes], control, table, prune, len(solution) - 1)
+
+def _solve_bfs(
+        board: state.PackedBoard,
+        control: _SearchControl,
+        prune: bool = True) -> List[moves.Move]:
+    """Breadth-first search for a shortest solution.
+
+    States are deduplicated on their canonical form, and each one only stores a pointer to its
+    parent and the move that reached it; the path is rebuilt once a solution is found. If NumPy is
+    installed, whole layers are expanded at once (see `frontier.solve_bfs`).
+    """
+    if frontier.AVAILABLE and board.tubes:
+        parents, key = frontier.solve_bfs(board, control, prune)
+        return None if key is None else _reconstruct_path(parents, key)
+    start_key = state.get_canonical_key(board.tubes)
+    parents = {start_key: (None, None)}
+    queue = collections.deque([(board, start_key, 0)])
+
+    while queue:
+        current, key, depth = queue.popleft()
+        if state.is_packed_solved(current.tubes):
+            return _reconstruct_path(parents, key)
+
+        next_moves = _next_moves(current.tubes, parents[key][1], prune)
+        control.expand(depth, len(next_moves))
+        for move in next_moves:
+            child = moves.apply_packed_move(current, move)
+            child_key = state.get_canonical_key(child.tubes)
+            if child_key in parents:
+                control.duplicates += 1
+                continue
+            parents[child_key] = (key, move)
+            queue.append((child, child_key, depth + 1))
+
+    return None
+
+def _read_records(path: str, record_size: int, buffer_size: int) -> Iterator[bytes]:
+    with open(path, "rb", buffering=buffer_size) as infile:
+        while True:
+            record = infile.read(record_size)
+            if not record:
+                return
+            yield record
+
+def _write_run(path: str, records: List[bytes], key_size: int, buffer_size: int) -> int:
+    """Sort records and write them to a run file, keeping one record per key.
+
+    Returns the number of duplicates dropped.
+    """
+    records.sort()
+    duplicates = 0
+    with open(path, "wb", buffering=buffer_size) as outfile:
+        last_key = None
+        for record in records:
+            key = record[:key_size]
+            if key == last_key:
+                duplicates += 1
+                continue
+            outfile.write(record)
+            last_key = key
+    return duplicates
+
+def _merge_runs(
+        run_paths: List[str],
+        path: str,
+        key_size: int,
+        record_size: int,
+        buffer_size: int) -> int:
+    """Merge sorted runs into a single run, keeping one record per key.
+
+    Returns the number of duplicates dropped.
+    """
+    duplicates = 0
+    last_key = None
+    with open(path, "wb", buffering=buffer_size) as outfile:
+        runs = [_read_records(run_path, record_size, buffer_size) for run_path in run_paths]
+        for record in heapq.merge(*runs):
+            key = record[:key_size]
+            if key == last_key:
+                duplicates += 1
+                continue
+            outfile.write(record)
+            last_key = key
+    return duplicates
+
+def _merge_layer(
+        run_paths: List[str],
+        visited_path: str,
+        layer_path: str,
+        new_visited_path: str,
+        key_size: int,
+        record_size: int,
+        buffer_size: int) -> Tuple[int, int]:
+    """Merge sorted runs of new states into the next layer, dropping those already visited.
+
+    Everything is streamed: the runs are merged with each other and with the sorted file of
+    visited keys, the states that survive are written to `layer_path`, and the visited keys with
+    those states added are written to `new_visited_path`. Returns the number of states in the new
+    layer and the number of duplicates dropped.
+    """
+    visited = _read_records(visited_path, key_size, buffer_size)
+    visited_key = next(visited, None)
+    layer_size = 0
+    duplicates = 0
+    last_key = None
+    with open(layer_path, "wb", buffering=buffer_size) as layer_file, \
+            open(new_visited_path, "wb", buffering=buffer_size) as visited_file:
+        runs = [_read_records(path, record_size, buffer_size) for path in run_paths]
+        for record in heapq.merge(*runs):
+            key = record[:key_size]
+            if key == last_key:
+                duplicates += 1
+                continue
+            last_key = key
+            while visited_key is not None and visited_key < key:
+                visited_file.write(visited_key)
+                visited_key = next(visited, None)
+            if key == visited_key:
+                duplicates += 1
+                continue
+            layer_file.write(record)
+            visited_file.write(key)
+            layer_size += 1
+        while visited_key is not None:
+            visited_file.write(visited_key)
+            visited_key = next(visited, None)
+    return layer_size, duplicates
+
+def _get_external_buffers(external_memory: int, record_size: int) -> Tuple[int, int]:
+    """Return the size of each file buffer and the most runs to merge at once, so that a merge
+    holds about `external_memory` bytes of buffers (or as little as it can, if that's tiny)."""
+    buffer_size = max(record_size, min(
+        _EXTERNAL_IO_BUFFER, external_memory // (_MAX_EXTERNAL_FAN_IN + _EXTERNAL_MERGE_FILES)))
+    fan_in = min(_MAX_EXTERNAL_FAN_IN, external_memory // buffer_size - _EXTERNAL_MERGE_FILES)
+    return buffer_size, max(2, fan_in)
+
+def _reconstruct_external_path(
+        board: state.PackedBoard,
+        layer_paths: List[str],
+        index: int,
+        key_size: int,
+        record_size: int) -> List[moves.Move]:
+    """Follow parent indices back through the layer files from state `index` of the last layer,
+    then translate the moves (which are from canonical forms) to the board's own tube order."""
+    steps = []
+    for layer_path in reversed(layer_paths[1:]):
+        with open(layer_path, "rb") as layer_file:
+            layer_file.seek(index * record_size)
+            record = layer_file.read(record_size)
+        index, src, dest = _EXTERNAL_PARENT.unpack_from(record, key_size)
+        steps.append(moves.Move(src, dest))
+    steps.reverse()
+
+    path = []
+    for step in steps:
+        canonical = state.get_canonical_packed_form(board)
+        mapping = state.get_tube_mapping(canonical.tubes, board.tubes)
+        move = moves.Move(mapping[step.src], mapping[step.dest])
+        board = moves.apply_packed_move(board, move)
+        path.append(move)
+    return path
+
+def _solve_external(
+        board: state.PackedBoard,
+        control: _SearchControl,
+        prune: bool = True,
+        external_memory: int = _DEFAULT_EXTERNAL_MEMORY) -> List[moves.Move]:
+    """Breadth-first search that keeps its states on disk, for spaces too big to fit in memory.
+
+    Each layer is a file of fixed-size records (see `_EXTERNAL_PARENT`) sorted on canonical key,
+    and there is one more file of every key visited so far, also sorted. A layer is expanded by
+    streaming through its file, collecting children until they would take more than
+    `external_memory` bytes, then sorting them out to a run file. The runs are then merged with
+    each other and with the visited keys (see `_merge_layer`) to find the next layer, so duplicates
+    are only detected once per layer, but everything is read and written sequentially. File
+    buffers are sized so that a merge also fits in `external_memory`, and if there are too many
+    runs to merge at once they are first merged into fewer, longer runs. The path is rebuilt at the
+    end by following parent indices back through the layer files.
+
+    The files go in a temporary directory (see `tempfile`), which is removed afterwards.
+    """
+    if not board.tubes:
+        return []
+    start = state.get_canonical_packed_form(board)
+    depth = len(start.tubes[0])
+    key_size = len(start.tubes) * depth
+    record_size = key_size + _EXTERNAL_PARENT.size
+    max_buffered = max(1, external_memory // (record_size + _BYTES_OVERHEAD))
+    buffer_size, fan_in = _get_external_buffers(external_memory, record_size)
+
+    with tempfile.TemporaryDirectory(prefix="tube_solver_") as directory:
+        layer_paths = [os.path.join(directory, "layer0")]
+        visited_path = os.path.join(directory, "visited0")
+        start_key = start.to_bytes()
+        with open(layer_paths[0], "wb") as layer_file:
+            layer_file.write(start_key + _EXTERNAL_PARENT.pack(0, 0, 0))
+        with open(visited_path, "wb") as visited_file:
+            visited_file.write(start_key)
+
+        run_names = (os.path.join(directory, f"run{index}") for index in itertools.count())
+        layer_size = 1
+        while layer_size:
+            run_paths = []
+            buffered = []
+            for index, record in enumerate(
+                    _read_records(layer_paths[-1], record_size, buffer_size)):
+                current = state.PackedBoard.from_bytes(record[:key_size], depth)
+                if state.is_packed_solved(current.tubes):
+                    return _reconstruct_external_path(
+                        board, layer_paths, index, key_size, record_size)
+                next_moves = _next_moves(current.tubes, None, prune)
+                control.expand(len(layer_paths) - 1, len(next_moves))
+                for move in next_moves:
+                    child = moves.apply_packed_move(current, move)
+                    buffered.append(state.get_canonical_key(child.tubes) +
+                        _EXTERNAL_PARENT.pack(index, move.src, move.dest))
+                if len(buffered) >= max_buffered:
+                    run_paths.append(next(run_names))
+                    control.duplicates += _write_run(
+                        run_paths[-1], buffered, key_size, buffer_size)
+                    buffered = []
+            if buffered:
+                run_paths.append(next(run_names))
+                control.duplicates += _write_run(run_paths[-1], buffered, key_size, buffer_size)
+                buffered = []
+
+            # Merge runs in passes until there are few enough to merge with the visited keys.
+            while len(run_paths) > fan_in:
+                merged_paths = []
+                for group in range(0, len(run_paths), fan_in):
+                    merged_paths.append(next(run_names))
+                    group_paths = run_paths[group:group + fan_in]
+                    control.duplicates += _merge_runs(
+                        group_paths, merged_paths[-1], key_size, record_size, buffer_size)
+                    for path in group_paths:
+                        os.remove(path)
+                run_paths = merged_paths
+
+            layer_paths.append(os.path.join(directory, f"layer{len(layer_paths)}"))
+            new_visited_path = os.path.join(directory, f"visited{len(layer_paths)}")
+            layer_size, duplicates = _merge_layer(
+                run_paths, visited_path, layer_paths[-1], new_visited_path, key_size, record_size,
+                buffer_size)
+            control.duplicates += duplicates
+            for path in run_paths + [visited_path]:
+                os.remove(path)
+            visited_path = new_visited_path
+
+    return None
+
+def _get_solved_form(board: state.PackedBoard) -> Optional[state.PackedBoard]:
+    """Return the canonical solved board with the same colours, or None if there isn't one.
+
+    Solved boards only contain full single-colour tubes and empty tubes, so they are all the same
+    up to tube order.
+    """
+    if not board.tubes:
+        return board
+    depth = len(board.tubes[0])
+    counts = collections.Counter(b"".join(board.tubes))
+    counts.pop(0, None)
+    tubes = []
+    for colour in sorted(counts):
+        if counts[colour] % depth:
+            return None
+        tubes.extend([bytes((colour,)) * depth] * (counts[colour] // depth))
+    if len(tubes) > len(board.tubes):
+        return None
+    tubes.extend([bytes(depth)] * (len(board.tubes) - len(tubes)))
+    return state.get_canonical_packed_form(state.PackedBoard(tuple(tubes)))
+
+def _get_suffixes(tubes: Sequence[bytes]) -> Set[bytes]:
+    """Return the bottom parts of the given packed tubes, of every length, without free space."""
+    return {tube[index:] for tube in tubes for index in range(len(tube)) if tube[index]}
+
+def _get_backward_moves(
+        tubes: Sequence[bytes], suffixes: Set[bytes]) -> List[Tuple[moves.Move, int]]:
+    """Find the reverse moves worth following backwards from a board towards a start board.
+
+    Moves only ever pour onto the same colour or into an empty tube, so in any board reachable from
+    the start, each tube is either a single colour or a run of one colour on top of the bottom
+    part of a start tube (see `_get_suffixes`). Reverse moves which pour back onto anything else
+    lead to boards that can't be reached, so they are left out. As in
+    `moves.get_pruned_packed_moves`, only the first empty tube is used, and moves which just swap a
+    single-colour tube with an empty one are left out too.
+    """
+    first_empty = next((index for index, tube in enumerate(tubes) if not tube[-1]), None)
+    backward_moves = []
+    for move, depth in moves.get_possible_reverse_packed_moves(tubes):
+        src_tube = tubes[move.src]
+        if src_tube[-1]:
+            if src_tube.lstrip(b"\0") not in suffixes:
+                continue
+        elif move.src != first_empty or depth == len(tubes[move.dest]) - tubes[move.dest].count(0):
+            continue
+        backward_moves.append((move, depth))
+    return backward_moves
+
+def _solve_bidirectional(
+        board: state.PackedBoard,
+        control: _SearchControl,
+        prune: bool = True) -> List[moves.Move]:
+    """Bidirectional breadth-first search for a shortest solution.
+
+    The search expands whole layers forwards from the board and backwards (with reverse moves)
+    from its solved form, always growing the frontier which should generate fewer states, until
+    the two meet. Backward states that can't be reached from the board are left out (see
+    `_get_backward_moves`). Like `_solve_bfs`, each side only stores parent pointers, along with
+    each state's distance from where that side started.
+
+    Backward states have their own tube order, so once the searches meet, the backward half of the
+    path is rebuilt from the solved board and its moves are mapped onto the forward board's tubes.
+    """
+    goal = _get_solved_form(board)
+    if goal is None:
+        return None
+    start_key = state.get_canonical_key(board.tubes)
+    goal_key = state.get_canonical_key(goal.tubes)
+    if start_key == goal_key:
+        return []
+
+    suffixes = _get_suffixes(board.tubes)
+    # Maps keys to (parent key, move from parent, distance from start).
+    forward = {start_key: (None, None, 0)}
+    # Maps keys to (next key towards the goal, move to it, depth poured, distance from goal).
+    backward = {goal_key: (None, None, 0, 0)}
+    forward_layer = [(board, start_key)]
+    backward_layer = [(goal, goal_key)]
+    # The average number of states generated per state expanded on each side, which estimates how
+    # many states expanding each frontier would generate.
+    forward_branching = backward_branching = 1.0
+    meeting_key = None
+
+    while forward_layer and backward_layer and meeting_key is None:
+        best_length = None
+        next_layer = []
+        generated = 0
+        if len(forward_layer) * forward_branching <= len(backward_layer) * backward_branching:
+            for current, key in forward_layer:
+                distance = forward[key][2] + 1
+                next_moves = _next_moves(current.tubes, forward[key][1], prune)
+                control.expand(distance - 1, len(next_moves))
+                generated += len(next_moves)
+                for move in next_moves:
+                    child = moves.apply_packed_move(current, move)
+                    child_key = state.get_canonical_key(child.tubes)
+                    if child_key in forward:
+                        control.duplicates += 1
+                        continue
+                    forward[child_key] = (key, move, distance)
+                    next_layer.append((child, child_key))
+                    if child_key in backward:
+                        length = distance + backward[child_key][3]
+                        if best_length is None or length < best_length:
+                            best_length, meeting_key = length, child_key
+            forward_branching = generated / len(forward_layer)
+            forward_layer = next_layer
+        else:
+            for current, key in backward_layer:
+                distance = backward[key][3] + 1
+                reverse_moves = _get_backward_moves(current.tubes, suffixes)
+                control.expand(distance - 1, len(reverse_moves))
+                generated += len(reverse_moves)
+                for move, depth in reverse_moves:
+                    child = moves.apply_reverse_packed_move(current, move, depth)
+                    child_key = state.get_canonical_key(child.tubes)
+                    if child_key in backward:
+                        control.duplicates += 1
+                        continue
+                    backward[child_key] = (key, move, depth, distance)
+                    next_layer.append((child, child_key))
+                    if child_key in forward:
+                        length = distance + forward[child_key][2]
+                        if best_length is None or length < best_length:
+                            best_length, meeting_key = length, child_key
+            backward_branching = generated / len(backward_layer)
+            backward_layer = next_layer
+
+    if meeting_key is None:
+        return None
+
+    forward_path = _reconstruct_path(
+        {key: entry[:2] for key, entry in forward.items()}, meeting_key)
+    meeting_board = board
+    for move in forward_path:
+        meeting_board = moves.apply_packed_move(meeting_board, move)
+
+    backward_steps = []
+    key = meeting_key
+    while backward[key][0] is not None:
+        next_key, move, depth, _ = backward[key]
+        backward_steps.append((move, depth))
+        key = next_key
+    backward_board = goal
+    for move, depth in reversed(backward_steps):
+        backward_board = moves.apply_reverse_packed_move(backward_board, move, depth)
+
+    mapping = state.get_tube_mapping(backward_board.tubes, meeting_board.tubes)
+    return forward_path + [
+        moves.Move(mapping[move.src], mapping[move.dest]) for move, _ in backward_steps]
+
+def _run_strategy(
+        board: state.PackedBoard,
+        strategy: str,
+        control: _SearchControl,
+        table: transposition_table.TranspositionTable,
+        prune: bool,
+        hasher: Optional[zobrist.ZobristHasher] = None,
+        macro_moves: bool = False,
+        external_memory: int = _DEFAULT_EXTERNAL_MEMORY) -> List[moves.Move]:
+    if strategy == STRATEGY_BFS:
+        return _solve_bfs(board, control, prune)
+    if strategy == STRATEGY_EXTERNAL:
+        return _solve_external(board, control, prune, external_memory)
+    if strategy == STRATEGY_BIDIRECTIONAL:
+        return _solve_bidirectional(board, control, prune)
+    if strategy == STRATEGY_ASTAR:
+        return _solve_astar(board, control, prune)
+    if strategy == STRATEGY_IDASTAR:
+        return _solve_idastar(board, control, table, prune)
+    return _solve_iterative(board, control, table, prune, hasher, macro_moves)
+
+def _split_frontier(
+        board: state.PackedBoard,
+        target_size: int,
+        prune: bool,
+        control: _SearchControl
+        ) -> Tuple[Optional[List[moves.Move]], List[Tuple[state.PackedBoard, List[moves.Move]]]]:
+    """Expand whole layers breadth-first until there are enough subtrees to hand out.
+
+    Returns a solution if one is found on the way, and otherwise the last layer as (board, path)
+    pairs. Every board in the layer is at the same depth and states are deduplicated on their
+    canonical form, so the shortest solution through the layer is a shortest solution overall.
+    """
+    layer = [(board, [])]
+    seen = {state.get_canonical_key(board.tubes)}
+    for depth in range(_MAX_SPLIT_DEPTH):
+        for current, path in layer:
+            if state.is_packed_solved(current.tubes):
+                return path, []
+        if len(layer) >= target_size:
+            break
+        next_layer = []
+        for current, path in layer:
+            next_moves = _next_moves(current.tubes, path[-1] if path else None, prune)
+            control.expand(depth, len(next_moves))
+            for move in next_moves:
+                child = moves.apply_packed_move(current, move)
+                child_key = state.get_canonical_key(child.tubes)
+                if child_key in seen:
+                    control.duplicates += 1
+                    continue
+                seen.add(child_key)
+                next_layer.append((child, path + [move]))
+        if not next_layer:
+            return None, []
+        layer = next_layer
+    return None, layer
+
+# Set in each worker process by `_init_worker`.
+_worker_claims: Optional[transposition_table.SharedVisitedFilter] = None
+_worker_cancel = None
+
+def _init_worker(claims: transposition_table.SharedVisitedFilter, cancel):
+    global _worker_claims, _worker_cancel
+    _worker_claims = claims
+    _worker_cancel = cancel
+
+def _solve_subtree(
+        packed_board: bytes,
+        depth: int,
+        prune: bool,
+        bound: Optional[int]
+        ) -> Tuple[Optional[List[Tuple[int, int]]], Optional[int], Tuple[int, ...]]:
+    """Search one subtree in a worker process.
+
+    Boards and solutions cross the process boundary as flat bytes and (src, dest) pairs rather
+    than as pickled dataclasses, and the search's counters are returned along with the result
+    (see `_SearchControl.get_counters`).
+
+    Without a `bound`, this is a depth-first search which skips states claimed by other workers.
+    With one, it is a single IDA* iteration (see `_bounded_search`) which skips states other
+    workers have claimed at the same depth or shallower, and the next bound is returned along
+    with any solution.
+    """
+    board = state.PackedBoard.from_bytes(packed_board, depth)
+    control = _SearchControl(cancel=_worker_cancel)
+    try:
+        if bound is None:
+            table = transposition_table.ClaimingTranspositionTable(
+                _worker_claims, depth_aware=False)
+            solution = _solve_iterative(board, control, table, prune)
+            next_bound = None
+        else:
+            table = transposition_table.ClaimingTranspositionTable(_worker_claims)
+            solution, next_bound = _bounded_search(
+                [bytearray(tube) for tube in board.tubes], control, table, prune, bound)
+    except SearchCancelled:
+        return None, None, control.get_counters()
+    if solution is None:
+        return None, next_bound, control.get_counters()
+    return [(move.src, move.dest) for move in solution], None, control.get_counters()
+
+def _solve_parallel(
+        board: state.PackedBoard,
+        strategy: str,
+        workers: int,
+        prune: bool,
+        control: _SearchControl,
+        cancel=None) -> List[moves.Move]:
+    """Split the search into subtrees and search them in a pool of worker processes.
+
+    Depth-first search returns the first solution any worker finds. The shortest-solution
+    strategies all run as parallel IDA*: every subtree is searched with the same bound on the
+    total solution length, raising it until some subtree has a solution, which is then a
+    shortest one. Either way, workers share a `transposition_table.SharedVisitedFilter` so that
+    they don't repeat each other's work, and outstanding work is cancelled as soon as the result
+    is known or `cancel` is set.
+
+    The counters of the search that splits the frontier, and of every subtree search that
+    finishes, are added to `control`. Subtree searches which are still running once the result is
+    known aren't counted.
+    """
+    solution, frontier = _split_frontier(board, workers * _SUBTREES_PER_WORKER, prune, control)
+    if solution is not None or not frontier:
+        return solution
+
+    depth = len(board.tubes[0])
+    prefix_length = len(frontier[0][1])
+    context = multiprocessing.get_context()
+    claims = transposition_table.SharedVisitedFilter(_SHARED_FILTER_CAPACITY, context)
+    stop = context.Event()
+    shortest = strategy != STRATEGY_DFS
+    bound = None
+    if shortest:
+        bound = min(
+            prefix_length + heuristics.lower_bound(subtree.tubes) for subtree, _ in frontier)
+
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(claims, stop)) as executor:
+        while True:
+            claims.clear()
+            futures = {
+                executor.submit(
+                    _solve_subtree,
+                    subtree.to_bytes(),
+                    depth,
+                    prune,
+                    None if bound is None else bound - prefix_length): path
+                for subtree, path in frontier}
+            pending = set(futures)
+            best = None
+            next_bound = None
+            try:
+                while pending and best is None:
+                    if cancel is not None and cancel.is_set():
+                        raise SearchCancelled()
+                    done, pending = concurrent.futures.wait(
+                        pending,
+                        timeout=_CANCEL_POLL_INTERVAL,
+                        return_when=concurrent.futures.FIRST_COMPLETED)
+                    for future in done:
+                        result, subtree_bound, counters = future.result()
+                        control.add_counters(counters, prefix_length)
+                        if result is not None:
+                            if best is None:
+                                best = futures[future] + [
+                                    moves.Move(src, dest) for src, dest in result]
+                            continue
+                        if subtree_bound is not None:
+                            subtree_bound += prefix_length
+                            if next_bound is None or subtree_bound < next_bound:
+                                next_bound = subtree_bound
+            finally:
+                if pending:
+                    stop.set()
+                for future in futures:
+                    future.cancel()
+            if best is not None or next_bound is None:
+                return best
+            bound = next_bound
+
+def _get_phase_seconds(profiler: cProfile.Profile) -> Dict[str, float]:
+    """Add up the time a profiled search spent in each phase.
+
+    Each phase is the cumulative time spent in the functions which implement it, which don't call
+    each other.
+    """
+    phase_functions = {
+        PHASE_MOVE_GENERATION: [
+            moves.get_pruned_packed_moves,
+            moves.get_possible_packed_moves,
+            moves.get_possible_reverse_packed_moves,
+            frontier.get_legal_moves],
+        PHASE_APPLY_MOVE: [
+            moves.pour_in_place,
+            moves.undo_pour_in_place,
+            moves.apply_packed_move,
+            moves.apply_reverse_packed_move,
+            frontier.apply_moves],
+        PHASE_CANONICALISATION: [
+            state.get_canonical_key, _CanonicalKeys._update, frontier.get_canonical_keys],
+        PHASE_HASHING: [
+            zobrist.ZobristHasher.update_unordered,
+            transposition_table.TranspositionTable.should_visit],
+        PHASE_HEURISTIC: [heuristics.lower_bound],
+    }
+    timings = pstats.Stats(profiler).stats
+    phase_seconds = {}
+    for phase, functions in phase_functions.items():
+        phase_seconds[phase] = 0.0
+        for function in functions:
+            code = function.__code__
+            timing = timings.get((code.co_filename, code.co_firstlineno, code.co_name))
+            if timing is not None:
+                # The fourth entry is the cumulative time.
+                phase_seconds[phase] += timing[3]
+    return phase_seconds
+
+def _get_status(solution: Optional[List[moves.Move]], strategy: str) -> str:
+    """Return the status of a search that ran to completion."""
+    if solution is None:
+        return STATUS_EXHAUSTED
+    if strategy == STRATEGY_DFS and solution:
+        return STATUS_FEASIBLE
+    return STATUS_OPTIMAL
+
+def search(
+        board: state.TubeBoard,
+        table: Optional[transposition_table.TranspositionTable] = None,
+        strategy: str = STRATEGY_DFS,
+        progress: Optional[Callable[[int], None]] = None,
+        prune: bool = True,
+        zobrist_hashing: bool = False,
+        workers: int = 1,
+        stats: Optional[SolverStats] = None,
+        cancel=None,
+        time_limit: Optional[float] = None,
+        node_limit: Optional[int] = None,
+        memory_limit: Optional[int] = None,
+        profile: bool = False,
+        macro_moves: bool = False,
+        external_memory: int = _DEFAULT_EXTERNAL_MEMORY) -> SearchResult:
+    """Search for a solution within a budget, and report how the search ended.
+
+    The arguments are as for `solve`. The result's status is one of:
+      * `STATUS_OPTIMAL`: the solution is a shortest one.
+      * `STATUS_FEASIBLE`: the solution isn't known to be a shortest one, either because the
+        strategy is depth-first search or because a budget ran out before it could be improved.
+      * `STATUS_EXHAUSTED`: there is no solution, either because the whole search space was
+        explored or because `find_unsolvable_reason` rejected the board without searching.
+      * `STATUS_TIMEOUT`: a budget ran out before any solution was found.
+
+    When any budget is given, `STRATEGY_ASTAR` and `STRATEGY_IDASTAR` run as an anytime search
+    instead (see `_improving_solutions`), so that a budget which runs out still leaves the best
+    solution so far. The other strategies run as usual and just stop when a budget runs out, with
+    `STATUS_TIMEOUT` unless depth-first search has already found its solution.
+    """
+    if strategy not in STRATEGIES:
+        raise ValueError(f"Unknown solver strategy '{strategy}': it must be one of {STRATEGIES}.")
+    if workers < 1:
+        raise ValueError(f"Invalid number of workers {workers}: it must be positive.")
+    for name, limit in [
+            ("time", time_limit), ("node", node_limit), ("memory", memory_limit),
+            ("external memory", external_memory)]:
+        if limit is not None and limit <= 0:
+            raise ValueError(f"Invalid {name} limit {limit}: it must be positive.")
+    if memory_limit is not None and resource is None:
+        raise ValueError("Memory limits aren't supported on this platform.")
+    if workers > 1:
+        for name, given in [
+                (f"strategy '{STRATEGY_EXTERNAL}'", strategy == STRATEGY_EXTERNAL),
+                ("table", table is not None), ("zobrist_hashing", zobrist_hashing),
+                ("macro_moves", macro_moves), ("profile", profile),
+                ("time_limit", time_limit is not None), ("node_limit", node_limit is not None),
+                ("memory_limit", memory_limit is not None), ("progress", progress is not None)]:
+            if given:
+                raise ValueError(
+                    f"Can't use {name} with {workers} workers: it only applies to " +
+                    "single-process searches.")
+    if table is None:
+        table = transposition_table.TranspositionTable()
+    if stats is None:
+        stats = SolverStats()
+
+    result = SearchResult(solution=None, status=STATUS_TIMEOUT, stats=stats, complete=False)
+    start = time.perf_counter()
+    if find_unsolvable_reason(board) is not None:
+        stats.seconds = time.perf_counter() - start
+        result.status = STATUS_EXHAUSTED
+        result.complete = True
+        return result
+    deadline = None if time_limit is None else time.monotonic() + time_limit
+    packed = state.pack(board)
+    if workers > 1 and packed.tubes:
+        control = _SearchControl(cancel=cancel)
+        try:
+            result.solution = _solve_parallel(packed, strategy, workers, prune, control, cancel)
+        finally:
+            stats.seconds = time.perf_counter() - start
+            control.fill_in(stats)
+        result.status = _get_status(result.solution, strategy)
+        result.complete = True
+        return result
+
+    hasher = None
+    if zobrist_hashing and packed.tubes:
+        hasher = zobrist.ZobristHasher(len(packed.tubes), len(packed.tubes[0]))
+    control = _SearchControl(progress, cancel, deadline, node_limit, memory_limit)
+    budgeted = time_limit is not None or node_limit is not None or memory_limit is not None
+    profiler = cProfile.Profile() if profile else None
+    try:
+        if profiler is not None:
+            profiler.enable()
+        if budgeted and strategy in _ANYTIME_STRATEGIES:
+            for solution in _improving_solutions(
+                    packed, control, table, prune, hasher, macro_moves):
+                result.solution = solution
+                result.status = STATUS_FEASIBLE
+        else:
+            result.solution = _run_strategy(
+                packed, strategy, control, table, prune, hasher, macro_moves, external_memory)
+    except _BudgetExhausted:
+        return result
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            stats.phase_seconds = _get_phase_seconds(profiler)
+        stats.seconds = time.perf_counter() - start
+        control.fill_in(stats)
+    result.status = _get_status(result.solution, strategy)
+    result.complete = True
+    return result
+
+def solve(
+        board: state.TubeBoard,
+        table: Optional[transposition_table.TranspositionTable] = None,
+        strategy: str = STRATEGY_DFS,
+        progress: Optional[Callable[[int], None]] = None,
+        prune: bool = True,
+        zobrist_hashing: bool = False,
+        workers: int = 1,
+        stats: Optional[SolverStats] = None,
+        cancel=None,
+        time_limit: Optional[float] = None,
+        node_limit: Optional[int] = None,
+        memory_limit: Optional[int] = None,
+        profile: bool = False,
+        macro_moves: bool = False,
+        external_memory: int = _DEFAULT_EXTERNAL_MEMORY) -> List[moves.Move]:
+    """Find a solution for the board, or return None if there isn't one.
+
+    `strategy` selects the search algorithm and must be one of `STRATEGIES`. Visited states are
+    recorded in `table` by the depth-first strategies, and callers can pass one in to bound its
+    size or inspect its counters afterwards. A fresh unbounded table is used if none is given.
+    `progress` is called periodically with the number of states expanded so far. Moves that can't
+    help are skipped unless `prune` is False (see `moves.get_pruned_packed_moves`). If
+    `zobrist_hashing` is set, depth-first search keys its transposition table on Zobrist hashes,
+    which are cheaper to maintain on big boards. If `macro_moves` is set, depth-first search makes
+    forced moves (see `moves.get_forced_packed_move`) as part of the move before them, so it
+    expands fewer states; the solution still lists every move. `external_memory` is how many bytes
+    of new states `STRATEGY_EXTERNAL` holds in memory at once before sorting them out to disk.
+
+    If `workers` is more than one, the search is split across that many processes (see
+    `_solve_parallel`). Only `strategy` (other than `STRATEGY_EXTERNAL`), `prune`, `stats` and
+    `cancel` apply to parallel searches: giving any of the other options, or any budget, raises a
+    ValueError.
+
+    If given, `stats` is filled in with statistics about the search. If `profile` is set, the
+    search also records how long it spends in each phase, which slows it down a few times.
+
+    `cancel` can be a `threading.Event` (or anything with an `is_set` method) which another thread
+    sets to stop the search early, in which case `SearchCancelled` is raised.
+
+    The search can be given a budget: a `time_limit` in seconds, a `node_limit` on the number of
+    states expanded, or a `memory_limit` in bytes on the memory used by the whole process. Once
+    one runs out, the best solution found so far is returned, which is None if there isn't one
+    yet (see `search` for which strategies keep improving a solution within a budget, and to tell
+    this apart from there being no solution).
+    """
+    return search(
+        board, table, strategy, progress, prune, zobrist_hashing, workers, stats, cancel,
+        time_limit, node_limit, memory_limit, profile, macro_moves, external_memory).solution
+
+
+if __name__ == '__main__':
+    # The command line interface lives in its own module so that worker processes import this one
+    # by its real name.
+    import batch
+    batch.main()
@@ -1,7 +1,16 @@
+import frontier
+import generator
+import glob
 import moves
+import os
 import solver
 import state
+import tempfile
+import threading
+import transposition_table
 import unittest
+from testing_helpers import check_solution, make_board
+from unittest import mock
 
 
 class TestIsSolved(unittest.TestCase):
@@ -85,10 +94,542 @@ class SolverTest(unittest.TestCase):
             state.TubeState(state=[0, 0, 0, 0]),
             state.TubeState(state=[0, 0, 0, 0])
         ])
-        solution = solver.solve(board)
+        solution = solver.solve(board, prune=False)
         self.assertIsNotNone(solution)
         self.assertEqual(len(solution), 18)  # Previously 23
 
+    def test_pruned_search_expands_fewer_states(self):
+        board = state.load_from_file("boards/level135.json").board
+        pruned_table = transposition_table.TranspositionTable()
+        unpruned_table = transposition_table.TranspositionTable()
+        self.assertIsNotNone(solver.solve(board, table=pruned_table))
+        self.assertIsNotNone(solver.solve(board, table=unpruned_table, prune=False))
+        self.assertLess(
+            pruned_table.hits + pruned_table.misses,
+            unpruned_table.hits + unpruned_table.misses)
+
+    def test_macro_moves(self):
+        boards = [state.load_from_file(f"boards/{name}.json").board for name in
+            ["level6", "level10", "level135"]]
+        boards.extend(generator.generate_boards(5, seed=4, num_tubes=12))
+        for board in boards:
+            with self.subTest(board=board):
+                stats = solver.SolverStats()
+                macro_stats = solver.SolverStats()
+                self.assertIsNotNone(solver.solve(board, stats=stats))
+                solution = solver.solve(board, stats=macro_stats, macro_moves=True)
+                solved = board
+                for move in solution:
+                    solved = moves.apply_move(solved, move)
+                self.assertTrue(solver.is_solved(solved))
+                self.assertLessEqual(macro_stats.nodes_expanded, stats.nodes_expanded)
+
+    def test_macro_moves_keep_shortest_solutions(self):
+        board = state.load_from_file("boards/level10.json").board
+        result = solver.search(
+            board, strategy=solver.STRATEGY_ASTAR, node_limit=10 ** 6, macro_moves=True)
+        self.assertEqual(solver.STATUS_OPTIMAL, result.status)
+        self.assertEqual(len(solver.solve(board, strategy=solver.STRATEGY_BFS)),
+            len(result.solution))
+
+    def test_fills_in_stats(self):
+        stats = solver.SolverStats()
+        solver.solve(state.load_from_file("boards/level6.json").board, stats=stats)
+        self.assertGreater(stats.nodes_expanded, 0)
+
+    def test_stats(self):
+        for strategy in solver.STRATEGIES:
+            with self.subTest(strategy=strategy):
+                stats = solver.SolverStats()
+                solution = solver.solve(
+                    state.load_from_file("boards/level6.json").board,
+                    strategy=strategy,
+                    stats=stats)
+                self.assertGreaterEqual(stats.nodes_generated, stats.nodes_expanded)
+                if strategy != solver.STRATEGY_DFS:
+                    # Depth-first search happens to find its way straight to the solution.
+                    self.assertGreater(stats.duplicate_hits, 0)
+                self.assertGreater(stats.max_depth, len(solution) // 2)
+                self.assertGreater(stats.max_branching_factor, stats.mean_branching_factor)
+                self.assertGreater(stats.seconds, 0)
+                self.assertEqual({}, stats.phase_seconds)
+
+    def test_profiled_stats(self):
+        stats = solver.SolverStats()
+        solver.solve(
+            state.load_from_file("boards/level6.json").board,
+            strategy=solver.STRATEGY_IDASTAR,
+            stats=stats,
+            profile=True)
+        self.assertEqual(set(solver.PHASES), set(stats.phase_seconds))
+        for phase in solver.PHASES:
+            self.assertGreater(stats.phase_seconds[phase], 0)
+        self.assertLess(sum(stats.phase_seconds.values()), stats.seconds)
+
+    def test_profiled_bfs_stats(self):
+        board = state.load_from_file("boards/level10.json").board
+        for vectorised in sorted({False, frontier.AVAILABLE}):
+            with self.subTest(vectorised=vectorised):
+                stats = solver.SolverStats()
+                with mock.patch.object(frontier, "AVAILABLE", vectorised):
+                    solver.solve(board, strategy=solver.STRATEGY_BFS, stats=stats, profile=True)
+                for phase in [
+                        solver.PHASE_MOVE_GENERATION, solver.PHASE_APPLY_MOVE,
+                        solver.PHASE_CANONICALISATION]:
+                    self.assertGreater(stats.phase_seconds[phase], 0)
+
+    def test_stats_to_dict(self):
+        stats = solver.SolverStats(nodes_expanded=4, nodes_generated=10)
+        fields = stats.to_dict()
+        self.assertEqual(4, fields["nodes_expanded"])
+        self.assertEqual(2.5, fields["mean_branching_factor"])
+
+    def test_other_depths(self):
+        for depth in [2, 5, 6]:
+            for board in generator.generate_boards(3, seed=depth, num_tubes=7, depth=depth):
+                with self.subTest(depth=depth, board=board):
+                    for strategy in solver.STRATEGIES:
+                        solution = solver.solve(board, strategy=strategy)
+                        self.assertIsNotNone(solution)
+                        solved = board
+                        for move in solution:
+                            solved = moves.apply_move(solved, move)
+                        self.assertTrue(solver.is_solved(solved))
+
+    def test_zobrist_hashing_finds_same_solution(self):
+        for filepath in glob.glob("boards/*.json"):
+            with self.subTest(filepath=filepath):
+                board = state.load_from_file(filepath).board
+                self.assertEqual(
+                    solver.solve(board), solver.solve(board, zobrist_hashing=True))
+
+    def test_pruning_keeps_shortest_solutions(self):
+        board = state.load_from_file("boards/level6.json").board
+        self.assertEqual(16, len(solver.solve(board, strategy=solver.STRATEGY_BFS, prune=False)))
+        self.assertEqual(16, len(solver.solve(board, strategy=solver.STRATEGY_BFS)))
+
+    def test_uses_given_transposition_table(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 1, 2, 2]),
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[2, 2, 1, 1])
+        ])
+        table = transposition_table.TranspositionTable()
+        solver.solve(board, table=table)
+        self.assertGreater(len(table), 0)
+        self.assertGreater(table.misses, 0)
+
+    def test_small_transposition_table_still_solves(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 1, 2, 3]),
+            state.TubeState(state=[2, 3, 2, 3]),
+            state.TubeState(state=[1, 2, 3, 1]),
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[0, 0, 0, 0])
+        ])
+        table = transposition_table.TranspositionTable(max_entries=4)
+        solution = solver.solve(board, table=table)
+        self.assertIsNotNone(solution)
+        self.assertGreater(table.evictions, 0)
+
+
+class UnsolvableTest(unittest.TestCase):
+    def test_reasons(self):
+        cases = [
+            (make_board([1, 1], [1, 1, 0]), "tube 1 holds 3 cells, but tube 0 holds 2"),
+            (make_board([1, 1, 1], [0, 0, 256]), "colour 256 is out of range"),
+            (make_board([1, 1, 2], [0, 2, 2]), "there are 2 cells of colour 1"),
+            (make_board([1, 2, 1, 2], [2, 1, 2, 1]), "no moves can be made"),
+        ]
+        for board, reason in cases:
+            with self.subTest(board=board):
+                self.assertIn(reason, solver.find_unsolvable_reason(board))
+
+    def test_colours_out_of_range(self):
+        board = make_board([1, 1], [2, 2], [0, 0])
+        self.assertIsNone(solver.find_unsolvable_reason(board))
+        self.assertIsNone(solver.find_unsolvable_reason(board, 2))
+        self.assertIn("it must be between 0 and 1", solver.find_unsolvable_reason(board, 1))
+
+    def test_solvable_boards_pass(self):
+        self.assertIsNone(solver.find_unsolvable_reason(state.TubeBoard(tubes=[])))
+        self.assertIsNone(solver.find_unsolvable_reason(make_board([1, 1], [0, 0])))
+        for board_path in glob.glob("boards/level*.json"):
+            with self.subTest(board=board_path):
+                self.assertIsNone(
+                    solver.find_unsolvable_reason(state.load_from_file(board_path).board))
+
+    def test_rejects_unsolvable_saved_board(self):
+        # Generated before random boards were guaranteed to be solvable.
+        self.assertIn("there are 7 cells of colour 1", solver.find_unsolvable_reason(
+            state.load_from_file("boards/random.json").board))
+
+    def test_search_rejects_without_expanding(self):
+        for strategy in solver.STRATEGIES:
+            with self.subTest(strategy=strategy):
+                result = solver.search(make_board([1, 2, 1, 2], [2, 1, 2, 1]), strategy=strategy)
+                self.assertEqual(solver.STATUS_EXHAUSTED, result.status)
+                self.assertTrue(result.complete)
+                self.assertEqual(0, result.stats.nodes_expanded)
+
+    def test_search_exhausts_boards_that_pass(self):
+        board = make_board([0, 1, 2], [0, 1, 2], [0, 1, 2])
+        self.assertIsNone(solver.find_unsolvable_reason(board))
+        for strategy in solver.STRATEGIES:
+            with self.subTest(strategy=strategy):
+                self.assertEqual(
+                    solver.STATUS_EXHAUSTED, solver.search(board, strategy=strategy).status)
+
+    def test_dead_ends_are_not_expanded(self):
+        for strategy in [solver.STRATEGY_DFS, solver.STRATEGY_IDASTAR]:
+            with self.subTest(strategy=strategy):
+                stats = solver.SolverStats()
+                solution = solver.solve(
+                    state.load_from_file("boards/level10.json").board, strategy=strategy,
+                    stats=stats)
+                self.assertIsNotNone(solution)
+                self.assertGreater(stats.dead_ends, 0)
+
+
+class IterativeSolverTest(unittest.TestCase):
+    def test_solves_saved_boards(self):
+        for filepath in sorted(glob.glob("boards/*.json")):
+            board = state.load_from_file(filepath).board
+            packed = state.pack(board)
+            shortest = solver._solve_bfs(packed, solver._SearchControl())
+            for prune in [True, False]:
+                with self.subTest(filepath=filepath, prune=prune):
+                    solution = solver._solve_iterative(
+                        packed,
+                        solver._SearchControl(),
+                        transposition_table.TranspositionTable(),
+                        prune=prune)
+                    if shortest is None:
+                        self.assertIsNone(solution)
+                        continue
+                    check_solution(self, board, solution)
+                    self.assertGreaterEqual(len(solution), len(shortest))
+
+    def test_already_solved(self):
+        board = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[1, 1, 1, 1])
+        ]))
+        self.assertEqual([], solver._solve_iterative(
+            board, solver._SearchControl(), transposition_table.TranspositionTable()))
+
+
+class ShortestSolutionTest(unittest.TestCase):
+    def test_astar_and_idastar_find_shortest_solution(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 1, 2, 3]),
+            state.TubeState(state=[2, 3, 2, 3]),
+            state.TubeState(state=[1, 2, 3, 1]),
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[0, 0, 0, 0])
+        ])
+        astar_solution = solver.solve(board, strategy=solver.STRATEGY_ASTAR)
+        idastar_solution = solver.solve(board, strategy=solver.STRATEGY_IDASTAR)
+        check_solution(self, board, astar_solution)
+        check_solution(self, board, idastar_solution)
+        self.assertEqual(len(astar_solution), len(idastar_solution))
+        self.assertLessEqual(len(astar_solution), len(solver.solve(board)))
+
+    def test_shorter_than_dfs_on_saved_board(self):
+        board = state.load_from_file("boards/level6.json").board
+        solution = solver.solve(board, strategy=solver.STRATEGY_ASTAR)
+        check_solution(self, board, solution)
+        self.assertEqual(len(solution), 16)  # 18 with depth-first search
+        self.assertEqual(
+            len(solver.solve(board, strategy=solver.STRATEGY_IDASTAR)), 16)
+
+    def test_bfs_finds_shortest_solution(self):
+        board = state.load_from_file("boards/level6.json").board
+        solution = solver.solve(board, strategy=solver.STRATEGY_BFS)
+        check_solution(self, board, solution)
+        self.assertEqual(len(solution), 16)
+
+    def test_bidirectional_finds_shortest_solution(self):
+        for filepath, length in [("boards/level6.json", 16), ("boards/level10.json", 12)]:
+            with self.subTest(filepath=filepath):
+                board = state.load_from_file(filepath).board
+                solution = solver.solve(board, strategy=solver.STRATEGY_BIDIRECTIONAL)
+                check_solution(self, board, solution)
+                self.assertEqual(len(solution), length)
+
+    def test_bidirectional_expands_fewer_states_than_bfs(self):
+        boards = [state.load_from_file("boards/level135.json").board]
+        boards.extend(generator.generate_boards(2, seed=4, num_tubes=9, depth=4))
+        for board in boards:
+            with self.subTest(board=board):
+                bfs = solver.search(board, strategy=solver.STRATEGY_BFS)
+                bidirectional = solver.search(board, strategy=solver.STRATEGY_BIDIRECTIONAL)
+                self.assertEqual(len(bfs.solution), len(bidirectional.solution))
+                self.assertLess(
+                    bidirectional.stats.nodes_expanded, bfs.stats.nodes_expanded)
+
+    def test_backward_moves_only_reach_reachable_boards(self):
+        start = state.pack(make_board([0, 1, 2], [0, 1, 2], [0, 0, 0]))
+        board = state.pack(make_board([0, 0, 2], [0, 0, 1], [0, 1, 2]))
+        # Pouring the 2 back onto the lone 1 would leave a tube ending in a 1, but every start tube
+        # ends in a 2.
+        self.assertIn((moves.Move(1, 0), 1), moves.get_possible_reverse_packed_moves(board.tubes))
+        self.assertEqual(
+            [(moves.Move(2, 0), 1), (moves.Move(0, 1), 1)],
+            solver._get_backward_moves(board.tubes, solver._get_suffixes(start.tubes)))
+
+    def test_bidirectional_already_solved(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[2, 2, 2, 2]),
+            state.TubeState(state=[0, 0, 0, 0]),
+            state.TubeState(state=[1, 1, 1, 1])
+        ])
+        self.assertEqual([], solver.solve(board, strategy=solver.STRATEGY_BIDIRECTIONAL))
+
+    def test_bfs_reports_progress(self):
+        progress = []
+        solver.solve(
+            state.load_from_file("boards/level6.json").board,
+            strategy=solver.STRATEGY_BFS,
+            progress=progress.append)
+        self.assertGreater(len(progress), 0)
+        self.assertEqual(progress, sorted(progress))
+
+    def test_no_solution(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 1, 2]),
+            state.TubeState(state=[2, 1, 2, 1])
+        ])
+        self.assertIsNone(solver.solve(board, strategy=solver.STRATEGY_BFS))
+        self.assertIsNone(solver.solve(board, strategy=solver.STRATEGY_BIDIRECTIONAL))
+        self.assertIsNone(solver.solve(board, strategy=solver.STRATEGY_ASTAR))
+        self.assertIsNone(solver.solve(board, strategy=solver.STRATEGY_IDASTAR))
+
+    def test_cancel(self):
+        cancel = threading.Event()
+        cancel.set()
+        stats = solver.SolverStats()
+        with self.assertRaises(solver.SearchCancelled):
+            solver.solve(
+                state.load_from_file("boards/level135.json").board,
+                strategy=solver.STRATEGY_BFS,
+                stats=stats,
+                cancel=cancel)
+        self.assertEqual(solver._PROGRESS_INTERVAL, stats.nodes_expanded)
+
+    def test_unknown_strategy(self):
+        with self.assertRaises(ValueError) as ve:
+            solver.solve(state.TubeBoard(tubes=[]), strategy="magic")
+        self.assertIn("Unknown solver strategy 'magic'", str(ve.exception))
+
+
+class ExternalSearchTest(unittest.TestCase):
+    def test_finds_shortest_solution(self):
+        for name in ["level6", "level10"]:
+            board = state.load_from_file(f"boards/{name}.json").board
+            with self.subTest(board=name):
+                shortest = solver.solve(board, strategy=solver.STRATEGY_BFS)
+                # Small enough that each layer is sorted out to disk in several runs.
+                solution = solver.solve(
+                    board, strategy=solver.STRATEGY_EXTERNAL, external_memory=1000)
+                self.assertEqual(len(shortest), len(solution))
+                check_solution(self, board, solution)
+
+    def test_merges_runs_in_passes(self):
+        board = state.load_from_file("boards/level10.json").board
+        shortest = solver.solve(board, strategy=solver.STRATEGY_BFS)
+        packed = state.pack(board)
+        record_size = len(packed.tubes) * len(packed.tubes[0]) + solver._EXTERNAL_PARENT.size
+        # Only room for a couple of records at a time, so there are many runs per layer.
+        _, fan_in = solver._get_external_buffers(200, record_size)
+        merged = []
+        merge_layer = solver._merge_layer
+        def check_merge_layer(run_paths, *args):
+            merged.append(len(run_paths))
+            return merge_layer(run_paths, *args)
+        with mock.patch.object(solver, "_merge_layer", check_merge_layer), \
+                mock.patch.object(solver, "_merge_runs", wraps=solver._merge_runs) as merge_runs:
+            solution = solver.solve(board, strategy=solver.STRATEGY_EXTERNAL, external_memory=200)
+        self.assertEqual(len(shortest), len(solution))
+        # Some layers had more runs than could be merged at once, so they were merged in passes.
+        self.assertTrue(merge_runs.called)
+        self.assertLessEqual(max(merged), fan_in)
+
+    def test_buffers_fit_in_memory(self):
+        for external_memory in [1000, 1 << 20, 64 << 20, 1 << 30]:
+            with self.subTest(external_memory=external_memory):
+                buffer_size, fan_in = solver._get_external_buffers(external_memory, 32)
+                self.assertLessEqual(fan_in, solver._MAX_EXTERNAL_FAN_IN)
+                self.assertLessEqual(
+                    (fan_in + solver._EXTERNAL_MERGE_FILES) * buffer_size, external_memory)
+
+    def test_same_states_as_bfs(self):
+        board = state.load_from_file("boards/level10.json").board
+        stats = solver.SolverStats()
+        external_stats = solver.SolverStats()
+        solver.solve(board, strategy=solver.STRATEGY_BFS, stats=stats)
+        solver.solve(board, strategy=solver.STRATEGY_EXTERNAL, stats=external_stats)
+        self.assertEqual(stats.nodes_expanded, external_stats.nodes_expanded)
+
+    def test_no_solution(self):
+        board = make_board([0, 1, 2], [0, 1, 2], [0, 1, 2])
+        result = solver.search(board, strategy=solver.STRATEGY_EXTERNAL, external_memory=100)
+        self.assertEqual(solver.STATUS_EXHAUSTED, result.status)
+
+    def test_removes_its_files(self):
+        pattern = os.path.join(tempfile.gettempdir(), "tube_solver_*")
+        before = set(glob.glob(pattern))
+        solver.solve(
+            state.load_from_file("boards/level6.json").board, strategy=solver.STRATEGY_EXTERNAL)
+        self.assertEqual(before, set(glob.glob(pattern)))
+
+    def test_invalid_memory(self):
+        with self.assertRaises(ValueError) as ve:
+            solver.solve(state.TubeBoard(tubes=[]), external_memory=0)
+        self.assertIn("Invalid external memory limit 0: it must be positive", str(ve.exception))
+
+
+class BudgetTest(unittest.TestCase):
+    def setUp(self):
+        self._board = state.load_from_file("boards/level135.json").board
+
+    def test_statuses_without_budget(self):
+        self.assertEqual(solver.STATUS_FEASIBLE, solver.search(self._board).status)
+        result = solver.search(self._board, strategy=solver.STRATEGY_BFS)
+        self.assertEqual(solver.STATUS_OPTIMAL, result.status)
+        self.assertTrue(result.complete)
+        self.assertEqual(37, len(result.solution))
+        impossible = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 1, 2]),
+            state.TubeState(state=[2, 1, 2, 1])
+        ])
+        self.assertEqual(solver.STATUS_EXHAUSTED, solver.search(impossible).status)
+
+    def test_node_limit_without_solution(self):
+        result = solver.search(self._board, node_limit=50)
+        self.assertEqual(solver.STATUS_TIMEOUT, result.status)
+        self.assertFalse(result.complete)
+        self.assertIsNone(result.solution)
+        self.assertEqual(50, result.stats.nodes_expanded)
+
+    def test_keeps_incumbent_when_budget_runs_out(self):
+        result = solver.search(self._board, strategy=solver.STRATEGY_ASTAR, node_limit=5000)
+        self.assertEqual(solver.STATUS_FEASIBLE, result.status)
+        self.assertFalse(result.complete)
+        self.assertLessEqual(len(result.solution), len(solver.solve(self._board)))
+        board = self._board
+        check_solution(self, board, result.solution)
+
+    def test_anytime_search_finds_shortest_solution(self):
+        result = solver.search(self._board, strategy=solver.STRATEGY_IDASTAR, time_limit=60)
+        self.assertEqual(solver.STATUS_OPTIMAL, result.status)
+        self.assertEqual(37, len(result.solution))
+
+    def test_other_strategies_keep_their_algorithm(self):
+        for strategy in [
+                solver.STRATEGY_BFS, solver.STRATEGY_BIDIRECTIONAL, solver.STRATEGY_EXTERNAL]:
+            with self.subTest(strategy=strategy):
+                with mock.patch.object(solver, "_improving_solutions") as improving:
+                    result = solver.search(self._board, strategy=strategy, node_limit=50)
+                    optimal = solver.search(self._board, strategy=strategy, node_limit=10 ** 6)
+                improving.assert_not_called()
+                self.assertEqual(solver.STATUS_TIMEOUT, result.status)
+                self.assertEqual(50, result.stats.nodes_expanded)
+                self.assertEqual(solver.STATUS_OPTIMAL, optimal.status)
+                self.assertEqual(37, len(optimal.solution))
+
+    def test_external_keeps_its_memory_bound(self):
+        with mock.patch.object(solver, "_solve_external", wraps=solver._solve_external) as external:
+            result = solver.search(
+                self._board, strategy=solver.STRATEGY_EXTERNAL, time_limit=60,
+                external_memory=1 << 16)
+        self.assertEqual(1 << 16, external.call_args.args[3])
+        self.assertEqual(37, len(result.solution))
+
+    def test_time_limit(self):
+        result = solver.search(self._board, strategy=solver.STRATEGY_BFS, time_limit=1e-9)
+        self.assertFalse(result.complete)
+        # The clock is only checked every so often.
+        self.assertEqual(solver._PROGRESS_INTERVAL, result.stats.nodes_expanded)
+
+    def test_memory_limit(self):
+        result = solver.search(self._board, strategy=solver.STRATEGY_BFS, memory_limit=1)
+        self.assertFalse(result.complete)
+
+    def test_invalid_limit(self):
+        with self.assertRaises(ValueError) as ve:
+            solver.search(self._board, node_limit=0)
+        self.assertIn("Invalid node limit 0: it must be positive", str(ve.exception))
+
+
+class ParallelSolverTest(unittest.TestCase):
+    def test_depth_first(self):
+        board = state.load_from_file("boards/level135.json").board
+        check_solution(self, board, solver.solve(board, workers=2))
+
+    def test_shortest(self):
+        board = state.load_from_file("boards/level6.json").board
+        solution = solver.solve(board, strategy=solver.STRATEGY_BFS, workers=2)
+        check_solution(self, board, solution)
+        self.assertEqual(len(solution), 16)
+
+    def test_stats(self):
+        board = state.load_from_file("boards/level6.json").board
+        for strategy in [solver.STRATEGY_DFS, solver.STRATEGY_BFS]:
+            with self.subTest(strategy=strategy):
+                stats = solver.SolverStats()
+                solution = solver.solve(board, strategy=strategy, workers=2, stats=stats)
+                check_solution(self, board, solution)
+                self.assertGreater(stats.nodes_expanded, 0)
+                self.assertGreaterEqual(stats.nodes_generated, stats.nodes_expanded)
+                self.assertGreater(stats.max_depth, 0)
+                self.assertGreater(stats.max_branching_factor, 0)
+
+    def test_no_solution(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 1, 2]),
+            state.TubeState(state=[2, 1, 2, 1])
+        ])
+        self.assertIsNone(solver.solve(board, workers=2))
+
+    def test_cancel(self):
+        cancel = threading.Event()
+        cancel.set()
+        with self.assertRaises(solver.SearchCancelled):
+            solver.solve(
+                state.load_from_file("boards/level135.json").board,
+                strategy=solver.STRATEGY_BFS,
+                workers=2,
+                cancel=cancel)
+
+    def test_invalid_workers(self):
+        with self.assertRaises(ValueError) as ve:
+            solver.solve(state.TubeBoard(tubes=[]), workers=0)
+        self.assertIn("it must be positive", str(ve.exception))
+
+    def test_rejects_budgets(self):
+        board = state.load_from_file("boards/level135.json").board
+        for name, value in [
+                ("time_limit", 10.0), ("node_limit", 10), ("memory_limit", 1 << 30),
+                ("progress", lambda expanded: None)]:
+            with self.subTest(option=name):
+                with self.assertRaises(ValueError) as ve:
+                    solver.search(board, strategy=solver.STRATEGY_BFS, workers=2, **{name: value})
+                self.assertIn(f"Can't use {name} with 2 workers", str(ve.exception))
+
+    def test_rejects_single_process_options(self):
+        board = state.load_from_file("boards/level10.json").board
+        for name, options in [
+                ("strategy 'external'", {"strategy": solver.STRATEGY_EXTERNAL}),
+                ("table", {"table": transposition_table.TranspositionTable()}),
+                ("zobrist_hashing", {"zobrist_hashing": True}),
+                ("macro_moves", {"macro_moves": True}),
+                ("profile", {"profile": True})]:
+            with self.subTest(option=name):
+                with self.assertRaises(ValueError) as ve:
+                    solver.search(board, workers=2, **options)
+                self.assertIn(f"Can't use {name} with 2 workers", str(ve.exception))
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,13 +1,19 @@
+from bisect import bisect_left, insort
+from collections import defaultdict
 import constants
 import dataclasses
 from enum import Enum
 import json
-from typing import List
+import struct
+from typing import BinaryIO, Iterator, List, Sequence, Tuple
 
 _TUBE_STATE_KEY = "TubeState"
 _TUBE_BOARD_KEY = "TubeBoard"
 _COLOURS_KEY = "Colours"
 
+# Binary boards start with their depth and number of tubes, followed by one byte per cell.
+_BINARY_HEADER = struct.Struct("<BH")
+
 @dataclasses.dataclass(eq=True)
 class TubeState:
     """Represents the state of one tube on the board."""
@@ -21,12 +27,58 @@ class TubeState:
 
 @dataclasses.dataclass(eq=True)
 class TubeBoard:
-    """Represents the full game board."""
+    """Represents the full game board.
+
+    All the tubes on a board have the same depth, which can be anything.
+    """
     tubes: List[TubeState]
 
     def __hash__(self):
         return hash(tuple(self.tubes))
 
+    @property
+    def depth(self) -> int:
+        """How many cells each tube holds (zero for a board with no tubes)."""
+        return len(self.tubes[0].state) if self.tubes else 0
+
+
+class PackedBoard:
+    """A compact, immutable board representation used by the solver.
+
+    Each tube is stored as a `bytes` object with one byte per cell (using the same colour indices as
+    `TubeState`), so deriving a new board from a move only rebuilds the two tubes involved. The
+    hash is computed once on construction.
+    """
+    __slots__ = ("tubes", "_hash")
+
+    def __init__(self, tubes: Tuple[bytes, ...]):
+        self.tubes = tubes
+        self._hash = hash(tubes)
+
+    def __eq__(self, other) -> bool:
+        return (isinstance(other, PackedBoard)
+            and self._hash == other._hash
+            and self.tubes == other.tubes)
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __repr__(self) -> str:
+        return f"PackedBoard(tubes={[list(tube) for tube in self.tubes]})"
+
+    def to_bytes(self) -> bytes:
+        """Flatten the board into a single bytes object, one byte per cell."""
+        return b"".join(self.tubes)
+
+    @staticmethod
+    def from_bytes(data: bytes, depth: int) -> "PackedBoard":
+        """Rebuild a board flattened with `to_bytes`, given the depth of its tubes."""
+        if depth <= 0 or len(data) % depth:
+            raise ValueError(f"Could not unflatten board: {len(data)} cells can't be split " +
+                f"into tubes of depth {depth}.")
+        return PackedBoard(tuple(
+            bytes(data[start:start + depth]) for start in range(0, len(data), depth)))
+
 
 @dataclasses.dataclass
 class SavedPuzzle:
@@ -82,16 +134,130 @@ def decode(json_str: str) -> SavedPuzzle:
     return SavedPuzzle(board, colours)
 
 
+def encode_binary(board: TubeBoard) -> bytes:
+    """Encode a board compactly, as a short header followed by one byte per cell.
+
+    Colours aren't included. Raises a ValueError if the board can't be packed (see `pack`).
+    """
+    packed = pack(board)
+    depth = len(packed.tubes[0]) if packed.tubes else 0
+    if depth > 0xff or len(packed.tubes) > 0xffff:
+        raise ValueError(f"Could not encode board with {len(packed.tubes)} tubes of depth " +
+            f"{depth}: boards can have at most 65535 tubes of depth at most 255.")
+    return _BINARY_HEADER.pack(depth, len(packed.tubes)) + packed.to_bytes()
+
+def decode_binary(data: bytes) -> TubeBoard:
+    """Decode a board encoded with `encode_binary`."""
+    if len(data) < _BINARY_HEADER.size:
+        raise ValueError(f"Could not decode binary board: it is only {len(data)} bytes long.")
+    depth, num_tubes = _BINARY_HEADER.unpack_from(data)
+    if len(data) != _BINARY_HEADER.size + depth * num_tubes:
+        raise ValueError(f"Could not decode binary board: {num_tubes} tubes of depth {depth} " +
+            f"don't fit in {len(data) - _BINARY_HEADER.size} bytes.")
+    cells = data[_BINARY_HEADER.size:]
+    return TubeBoard(tubes=[
+        TubeState(state=list(cells[start:start + depth]))
+        for start in range(0, depth * num_tubes, depth)])
+
+def read_binary_boards(infile: BinaryIO) -> Iterator[TubeBoard]:
+    """Lazily read a stream of boards written one after another with `encode_binary`."""
+    while True:
+        header = infile.read(_BINARY_HEADER.size)
+        if not header:
+            return
+        if len(header) < _BINARY_HEADER.size:
+            raise ValueError("Could not read binary board: the stream ends part way through one.")
+        depth, num_tubes = _BINARY_HEADER.unpack(header)
+        cells = infile.read(depth * num_tubes)
+        if len(cells) < depth * num_tubes:
+            raise ValueError("Could not read binary board: the stream ends part way through one.")
+        yield decode_binary(header + cells)
+
 def write_to_file(board: SavedPuzzle, filepath: str):
     with open(filepath, "w") as outfile:
         outfile.write(encode(board))
 
 def load_from_file(filepath: str) -> SavedPuzzle:
     with open(filepath, "r") as infile:
-        content = "".join(infile.readlines())
+        content = infile.read()
         return decode(content)
 
+def pack(board: TubeBoard) -> PackedBoard:
+    """Convert a board to its packed form.
+
+    Raises a ValueError if any colour index can't be stored in a single byte, or if the tubes
+    aren't all the same depth.
+    """
+    try:
+        packed = PackedBoard(tuple(bytes(tube.state) for tube in board.tubes))
+    except ValueError:
+        raise ValueError(f"Could not pack board {board}: colour indices must be in the " +
+            "range 0-255.")
+    depth = board.depth
+    if any(len(tube) != depth for tube in packed.tubes):
+        raise ValueError(f"Could not pack board {board}: its tubes must all be the same depth.")
+    return packed
+
+def unpack(board: PackedBoard) -> TubeBoard:
+    """Convert a packed board back to a `TubeBoard`."""
+    return TubeBoard(tubes=[TubeState(state=list(tube)) for tube in board.tubes])
+
+def is_packed_solved(tubes: Sequence[bytes]) -> bool:
+    """Return whether every packed tube is empty or full of a single colour."""
+    return all(tube.count(tube[0]) == len(tube) for tube in tubes if tube)
+
+def get_canonical_packed_form(board: PackedBoard) -> PackedBoard:
+    """Return the packed board with its tubes sorted, so that tube order doesn't matter."""
+    return PackedBoard(tuple(sorted(board.tubes)))
+
+def get_tube_mapping(from_tubes: Sequence[bytes], to_tubes: Sequence[bytes]) -> List[int]:
+    """Map each tube index in `from_tubes` to the index of an identical tube in `to_tubes`.
+
+    This is used to translate moves between two packed boards that have the same canonical form
+    but different tube orders. Raises a ValueError if the boards aren't permutations of each other.
+    """
+    available = defaultdict(list)
+    for index in reversed(range(len(to_tubes))):
+        available[bytes(to_tubes[index])].append(index)
+    mapping = []
+    for tube in from_tubes:
+        indices = available.get(bytes(tube))
+        if not indices:
+            raise ValueError(f"Could not map tube {list(tube)}: the boards must contain the " +
+                "same tubes.")
+        mapping.append(indices.pop())
+    return mapping
+
 def get_canonical_sorted_form(board: TubeBoard) -> TubeBoard:
-    return TubeBoard(tubes=sorted(
-        board.tubes,
-        key=lambda tube: ''.join(str(elem) for elem in tube.state)))
+    # Sorting on the colour lists themselves (rather than on strings built from them) keeps
+    # colours like 1 and 12 from being confused with 11 and 2.
+    return TubeBoard(tubes=sorted(board.tubes, key=lambda tube: tube.state))
+
+def get_canonical_key(tubes: Sequence[bytes]) -> bytes:
+    """Return a key for packed tubes that is the same for any order of the same tubes.
+
+    The tubes must all have the same length. The key is just the sorted tubes joined together, so
+    distinct boards always get distinct keys, however many colours there are.
+    """
+    return b"".join(sorted(tubes))
+
+def get_canonical_order(tubes: Sequence[bytes]) -> List[int]:
+    """Return the tube indices in the order their tubes appear in the canonical form.
+
+    Boards with the same canonical key have identical tubes at each position of this order, so
+    it can be used to translate moves between them.
+    """
+    return sorted(range(len(tubes)), key=lambda index: bytes(tubes[index]))
+
+def update_sorted_tubes(
+        sorted_tubes: List[bytes], removed: Sequence[bytes], added: Sequence[bytes]):
+    """Update a sorted list of packed tubes in place after a move changes some of them.
+
+    This only re-places the changed tubes, so a canonical key can be maintained across moves
+    without re-sorting the whole board: `b"".join(sorted_tubes)` is the same as
+    `get_canonical_key` for the updated board.
+    """
+    for tube in removed:
+        del sorted_tubes[bisect_left(sorted_tubes, tube)]
+    for tube in added:
+        insort(sorted_tubes, tube)
@@ -1,6 +1,9 @@
 import constants
+import io
 import json
+import itertools
 import os
+import random
 import state
 import unittest
 import utils
@@ -91,6 +94,46 @@ class TestFileReadWrite(unittest.TestCase):
             os.remove(filepath)
 
 
+class TestBoardDepth(unittest.TestCase):
+    def test_depth(self):
+        board = state.TubeBoard(tubes=[state.TubeState([0] * 6), state.TubeState([1] * 6)])
+        self.assertEqual(6, board.depth)
+        self.assertEqual(0, state.TubeBoard(tubes=[]).depth)
+
+    def test_pack_rejects_mixed_depths(self):
+        board = state.TubeBoard(tubes=[state.TubeState([0] * 4), state.TubeState([1] * 5)])
+        with self.assertRaises(ValueError) as ve:
+            state.pack(board)
+        self.assertIn("its tubes must all be the same depth", str(ve.exception))
+
+
+class TestBinaryEncoding(unittest.TestCase):
+    def test_round_trip(self):
+        board = state.load_from_file("boards/level6.json").board
+        encoded = state.encode_binary(board)
+        self.assertEqual(3 + 7 * 4, len(encoded))
+        self.assertEqual(board, state.decode_binary(encoded))
+
+    def test_truncated(self):
+        encoded = state.encode_binary(utils.create_empty_state())
+        with self.assertRaises(ValueError) as ve:
+            state.decode_binary(encoded[:-1])
+        self.assertIn("10 tubes of depth 4 don't fit in 39 bytes", str(ve.exception))
+
+    def test_read_stream(self):
+        boards = [
+            state.load_from_file("boards/level6.json").board,
+            state.load_from_file("boards/level10.json").board]
+        stream = io.BytesIO(b"".join(state.encode_binary(board) for board in boards))
+        self.assertEqual(boards, list(state.read_binary_boards(stream)))
+
+    def test_read_truncated_stream(self):
+        stream = io.BytesIO(state.encode_binary(utils.create_empty_state())[:-1])
+        with self.assertRaises(ValueError) as ve:
+            list(state.read_binary_boards(stream))
+        self.assertIn("the stream ends part way through one", str(ve.exception))
+
+
 class TestCanonicalSortedForm(unittest.TestCase):
     def test_sorted(self):
         board = state.TubeBoard(tubes=[
@@ -106,5 +149,124 @@ class TestCanonicalSortedForm(unittest.TestCase):
 
         self.assertEqual(expected, state.get_canonical_sorted_form(board))
 
+    def test_multi_digit_colours_are_not_confused(self):
+        # Both tubes stringify to "112", so sorting on strings would leave them in their original
+        # order and these boards would get different canonical forms.
+        first = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 12]),
+            state.TubeState(state=[11, 2]),
+        ])
+        second = state.TubeBoard(tubes=[
+            state.TubeState(state=[11, 2]),
+            state.TubeState(state=[1, 12]),
+        ])
+        self.assertEqual(
+            state.get_canonical_sorted_form(first), state.get_canonical_sorted_form(second))
+
+
+class TestCanonicalKey(unittest.TestCase):
+    def test_same_for_any_tube_order(self):
+        tubes = [bytes([0, 1, 12]), bytes([11, 2, 3]), bytes([0, 0, 0])]
+        keys = {state.get_canonical_key(list(order)) for order in itertools.permutations(tubes)}
+        self.assertEqual(1, len(keys))
+
+    def test_no_collisions(self):
+        rng = random.Random(1234)
+        for num_colours in [3, 12, 100, 255]:
+            boards = set()
+            keys = set()
+            for _ in range(2000):
+                tubes = [
+                    bytes(rng.randrange(num_colours + 1) for _ in range(4)) for _ in range(3)]
+                boards.add(tuple(sorted(tubes)))
+                keys.add(state.get_canonical_key(tubes))
+            self.assertEqual(len(boards), len(keys))
+
+    def test_update_sorted_tubes(self):
+        tubes = [bytes([0, 1, 1]), bytes([2, 2, 1]), bytes([0, 0, 0])]
+        sorted_tubes = sorted(tubes)
+        new_tubes = [bytes([0, 0, 1]), bytes([2, 2, 1]), bytes([0, 0, 1])]
+        state.update_sorted_tubes(sorted_tubes, [tubes[0], tubes[2]], [new_tubes[0], new_tubes[2]])
+        self.assertEqual(state.get_canonical_key(new_tubes), b"".join(sorted_tubes))
+
+    def test_canonical_order(self):
+        tubes = [bytes([2, 2, 1]), bytes([0, 0, 0]), bytes([0, 1, 1])]
+        order = state.get_canonical_order(tubes)
+        self.assertEqual([1, 2, 0], order)
+        self.assertEqual(state.get_canonical_key(tubes), b"".join(tubes[i] for i in order))
+
+
+class TestPackedBoard(unittest.TestCase):
+    def test_round_trip(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 3, 4]),
+            state.TubeState(state=[0, 0, 12, 3]),
+            state.TubeState(state=[0, 0, 0, 0]),
+        ])
+        self.assertEqual(board, state.unpack(state.pack(board)))
+
+    def test_equal_boards_hash_equal(self):
+        board = state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 3, 4]),
+            state.TubeState(state=[0, 2, 2, 3]),
+        ])
+        first = state.pack(board)
+        second = state.pack(board)
+        self.assertEqual(first, second)
+        self.assertEqual(hash(first), hash(second))
+
+    def test_flatten_round_trip(self):
+        board = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 3, 4]),
+            state.TubeState(state=[0, 0, 12, 3]),
+        ]))
+        self.assertEqual(board, state.PackedBoard.from_bytes(board.to_bytes(), 4))
+
+    def test_unflatten_bad_depth(self):
+        with self.assertRaises(ValueError) as ve:
+            state.PackedBoard.from_bytes(bytes(6), 4)
+        self.assertIn("6 cells can't be split into tubes of depth 4", str(ve.exception))
+
+    def test_colour_out_of_range(self):
+        board = state.TubeBoard(tubes=[state.TubeState(state=[0, 0, 256, 1])])
+        with self.assertRaises(ValueError) as ve:
+            state.pack(board)
+        self.assertIn("colour indices must be in the range 0-255", str(ve.exception))
+
+    def test_canonical_packed_form(self):
+        board = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 3, 4]),
+            state.TubeState(state=[0, 2, 2, 3]),
+            state.TubeState(state=[0, 1, 2, 3]),
+        ]))
+        expected = state.pack(state.TubeBoard(tubes=[
+            state.TubeState(state=[0, 1, 2, 3]),
+            state.TubeState(state=[0, 2, 2, 3]),
+            state.TubeState(state=[1, 2, 3, 4]),
+        ]))
+        self.assertEqual(expected, state.get_canonical_packed_form(board))
+
+    def test_is_packed_solved(self):
+        self.assertTrue(state.is_packed_solved([b"\x01\x01", b"\x00\x00", b"\x02\x02"]))
+        self.assertTrue(state.is_packed_solved([bytearray(b"\x03\x03"), bytearray(2)]))
+        self.assertFalse(state.is_packed_solved([b"\x00\x01", b"\x00\x01"]))
+        self.assertFalse(state.is_packed_solved([b"\x01\x01", b"\x01\x02"]))
+
+
+class TestTubeMapping(unittest.TestCase):
+    def test_permuted_tubes(self):
+        from_tubes = [bytes([1, 1]), bytes([0, 0]), bytes([2, 1]), bytes([0, 0])]
+        to_tubes = [bytes([0, 0]), bytes([2, 1]), bytes([0, 0]), bytes([1, 1])]
+        mapping = state.get_tube_mapping(from_tubes, to_tubes)
+        self.assertEqual(sorted(mapping), [0, 1, 2, 3])
+        for index, tube in enumerate(from_tubes):
+            self.assertEqual(tube, to_tubes[mapping[index]])
+
+    def test_different_tubes(self):
+        with self.assertRaises(ValueError) as ve:
+            state.get_tube_mapping([bytes([1, 1])], [bytes([2, 2])])
+        self.assertIn("the boards must contain the same tubes", str(ve.exception))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,16 @@
+import moves
+import solver
+import state
+import unittest
+from typing import List, Sequence
+
+
+def make_board(*tubes: Sequence[int]) -> state.TubeBoard:
+    """Build a board from lists of colours, one per tube, from the top of the tube down."""
+    return state.TubeBoard(tubes=[state.TubeState(state=list(tube)) for tube in tubes])
+
+def check_solution(test: unittest.TestCase, board: state.TubeBoard, solution: List[moves.Move]):
+    """Fail `test` unless playing the solution's moves on the board solves it."""
+    for move in solution:
+        board = moves.apply_move(board, move)
+    test.assertTrue(solver.is_solved(board))
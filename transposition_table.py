@@ -0,0 +1,125 @@
+from collections import OrderedDict
+import ctypes
+import hashlib
+import multiprocessing
+from typing import Hashable, Optional
+
+
+# How many slots to probe in a `SharedVisitedFilter` before giving up on a key.
+_MAX_PROBES = 8
+# The deepest depth a `SharedVisitedFilter` can record. Deeper claims are recorded as this depth.
+_MAX_DEPTH = 0xff
+
+
+class TranspositionTable:
+    """Records the shallowest depth at which each board state has been reached during a search.
+
+    A single table is shared across the whole search, so states explored in one subtree are not
+    re-explored from a sibling subtree unless they are reached at a shallower depth.
+
+    If `max_entries` is set, the least recently used entries are evicted once the table is full.
+    """
+    def __init__(self, max_entries: Optional[int] = None):
+        if max_entries is not None and max_entries < 1:
+            raise ValueError(f"Invalid transposition table size {max_entries}: it must be positive.")
+        self._entries = OrderedDict()
+        self._max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def best_depth(self, key: Hashable) -> Optional[int]:
+        return self._entries.get(key)
+
+    def should_visit(self, key: Hashable, depth: int) -> bool:
+        """Return whether a state reached at `depth` needs exploring, recording it if so.
+
+        A state needs exploring if it hasn't been seen before, or if it was only seen deeper.
+        """
+        entries = self._entries
+        best = entries.get(key)
+        if best is not None:
+            entries.move_to_end(key)
+            if best <= depth:
+                self.hits += 1
+                return False
+        self.misses += 1
+        entries[key] = depth
+        if self._max_entries is not None and len(entries) > self._max_entries:
+            entries.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def clear(self):
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+
+class SharedVisitedFilter:
+    """A fixed-size table of claimed states in shared memory.
+
+    This lets searches in different processes claim states, so that only one of them explores
+    each state. Each slot holds a 56-bit digest of a key along with the shallowest depth it was
+    claimed at, in an open-addressed table without locking: if two processes race for the same
+    state both may explore it, which wastes a little work but never loses a state. Once the table
+    fills up, new states can't be claimed and are always explored.
+
+    Filters must be passed to worker processes when they are created (for example through a
+    process pool initializer).
+    """
+    def __init__(self, capacity: int, context=multiprocessing):
+        if capacity < 1:
+            raise ValueError(f"Invalid shared filter size {capacity}: it must be positive.")
+        self._slots = context.RawArray(ctypes.c_uint64, capacity)
+
+    def claim(self, key: bytes, depth: int = 0) -> bool:
+        """Claim a state reached at `depth`.
+
+        Returns False if it has already been claimed at the same depth or shallower.
+        """
+        depth = min(depth, _MAX_DEPTH)
+        # Zero marks an empty slot, so it can't be used as a fingerprint.
+        fingerprint = int.from_bytes(
+            hashlib.blake2b(key, digest_size=7).digest(), "little") or 1
+        slots = self._slots
+        index = fingerprint % len(slots)
+        for _ in range(_MAX_PROBES):
+            current = slots[index]
+            if current == 0 or current >> 8 == fingerprint:
+                if current and current & _MAX_DEPTH <= depth:
+                    return False
+                slots[index] = fingerprint << 8 | depth
+                return True
+            index = (index + 1) % len(slots)
+        return True
+
+    def clear(self):
+        ctypes.memset(self._slots, 0, ctypes.sizeof(self._slots))
+
+
+class ClaimingTranspositionTable(TranspositionTable):
+    """A transposition table which also skips states claimed through a `SharedVisitedFilter`.
+
+    If `depth_aware` is False, states are claimed regardless of depth, so a state is only ever
+    explored by one process.
+    """
+    def __init__(
+            self,
+            claims: SharedVisitedFilter,
+            max_entries: Optional[int] = None,
+            depth_aware: bool = True):
+        super().__init__(max_entries)
+        self._claims = claims
+        self._depth_aware = depth_aware
+
+    def should_visit(self, key: bytes, depth: int) -> bool:
+        return (super().should_visit(key, depth)
+            and self._claims.claim(key, depth if self._depth_aware else _MAX_DEPTH))
@@ -0,0 +1,84 @@
+import transposition_table
+import unittest
+
+
+class TranspositionTableTest(unittest.TestCase):
+    def test_new_state_is_visited(self):
+        table = transposition_table.TranspositionTable()
+        self.assertTrue(table.should_visit("a", 3))
+        self.assertEqual(3, table.best_depth("a"))
+        self.assertEqual(1, table.misses)
+
+    def test_same_or_deeper_state_is_skipped(self):
+        table = transposition_table.TranspositionTable()
+        table.should_visit("a", 3)
+        self.assertFalse(table.should_visit("a", 3))
+        self.assertFalse(table.should_visit("a", 5))
+        self.assertEqual(2, table.hits)
+
+    def test_shallower_state_is_revisited(self):
+        table = transposition_table.TranspositionTable()
+        table.should_visit("a", 3)
+        self.assertTrue(table.should_visit("a", 1))
+        self.assertEqual(1, table.best_depth("a"))
+
+    def test_least_recently_used_is_evicted(self):
+        table = transposition_table.TranspositionTable(max_entries=2)
+        table.should_visit("a", 0)
+        table.should_visit("b", 0)
+        table.should_visit("a", 1)  # Touches 'a' so 'b' is now the oldest.
+        table.should_visit("c", 0)
+        self.assertIn("a", table)
+        self.assertNotIn("b", table)
+        self.assertEqual(2, len(table))
+        self.assertEqual(1, table.evictions)
+
+    def test_invalid_size(self):
+        with self.assertRaises(ValueError) as ve:
+            transposition_table.TranspositionTable(max_entries=0)
+        self.assertIn("it must be positive", str(ve.exception))
+
+
+class SharedVisitedFilterTest(unittest.TestCase):
+    def test_claim_once(self):
+        claims = transposition_table.SharedVisitedFilter(16)
+        self.assertTrue(claims.claim(b"abc"))
+        self.assertFalse(claims.claim(b"abc"))
+        self.assertTrue(claims.claim(b"abd"))
+
+    def test_shallower_claim_succeeds(self):
+        claims = transposition_table.SharedVisitedFilter(16)
+        self.assertTrue(claims.claim(b"abc", 5))
+        self.assertFalse(claims.claim(b"abc", 6))
+        self.assertTrue(claims.claim(b"abc", 3))
+        self.assertFalse(claims.claim(b"abc", 5))
+
+    def test_clear(self):
+        claims = transposition_table.SharedVisitedFilter(16)
+        claims.claim(b"abc")
+        claims.clear()
+        self.assertTrue(claims.claim(b"abc"))
+
+    def test_full_filter_never_rejects_new_states(self):
+        claims = transposition_table.SharedVisitedFilter(1)
+        self.assertTrue(claims.claim(b"abc"))
+        self.assertTrue(claims.claim(b"abd"))
+        self.assertTrue(claims.claim(b"abe"))
+
+    def test_claiming_table(self):
+        claims = transposition_table.SharedVisitedFilter(16)
+        claims.claim(b"taken")
+        table = transposition_table.ClaimingTranspositionTable(claims)
+        self.assertFalse(table.should_visit(b"taken", 0))
+        self.assertTrue(table.should_visit(b"free", 0))
+        self.assertFalse(claims.claim(b"free"))
+
+    def test_claiming_table_ignoring_depth(self):
+        claims = transposition_table.SharedVisitedFilter(16)
+        claims.claim(b"taken", 5)
+        table = transposition_table.ClaimingTranspositionTable(claims, depth_aware=False)
+        self.assertFalse(table.should_visit(b"taken", 1))
+
+
+if __name__ == '__main__':
+    unittest.main()
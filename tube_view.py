@@ -3,7 +3,7 @@ import tkinter as tk
 import constants
 import controller_interface
 from PIL import Image, ImageTk
-from typing import Callable, List
+from typing import Callable, List, Optional
 import ui_model
 
 
@@ -16,7 +16,7 @@ class TubeView(tk.Frame):
             index: int,
             depth: int = constants.TUBE_DEPTH,
             width: int = 100,
-            initial_state: List[int] = [0] * constants.TUBE_DEPTH,
+            initial_state: Optional[List[int]] = None,
             **kwargs):
         super().__init__(parent, width=width, **kwargs)
 
@@ -27,7 +27,7 @@ class TubeView(tk.Frame):
 
         # Note: '0' means empty. Numbers above zero map to defined colours.
         # So '1' maps to the zeroth defined colour etc.
-        self._state = initial_state
+        self._state = initial_state if initial_state is not None else [0] * depth
 
         self._frames_container = tk.Frame(self)
         self._frames = []
@@ -1,24 +1,51 @@
+import copy
+import queue
 import subprocess
-from typing import Callable, List
+import threading
+from typing import Callable, List, Optional
 
 import controller_interface
 import moves
+import solution_cache
 import solution_printer
 import solver
 import state
-from typing import List
 import ui_model
 import view
 
 
+# How often to check on a solver running in the background, in milliseconds.
+_POLL_INTERVAL_MS = 100
+
+# The kinds of update a background solve sends back to the main loop.
+_PROGRESS = "progress"
+_SOLVED = "solved"
+_CANCELLED = "cancelled"
+_FAILED = "failed"
+
+
 class UiController(controller_interface.Controller):
     """The UI controler.
     
-    This exposes methods for updating the model and UI components.
+    This exposes methods for updating the model and UI components. If a solution cache is given,
+    solutions are looked up in it before running the solver.
+
+    The solver runs on a background thread so that the UI stays responsive. It reports back through
+    a queue, which is polled from the Tk main loop with `after()`.
     """
-    def __init__(self, model: ui_model.UiModel, view: view.MainWindow):
+    def __init__(
+            self,
+            model: ui_model.UiModel,
+            view: view.MainWindow,
+            cache: Optional[solution_cache.SolutionCache] = None,
+            strategy: str = solver.STRATEGY_DFS):
         self._model = model
         self._view = view
+        self._cache = cache
+        self._strategy = strategy
+        self._solver_thread: Optional[threading.Thread] = None
+        self._solver_updates: queue.Queue = queue.Queue()
+        self._cancel = threading.Event()
     
     def update_colours(self, colours: List[str]):
         self._model.update_colours(colours)
@@ -46,9 +73,80 @@ class UiController(controller_interface.Controller):
         self._view.reset_to_match_model()
 
     def run_solver(self, error_callback: Callable[[str], None]):
-        puzzle = self._model.get_tube_board()
-        solution = solver.solve(puzzle)
+        """Start solving the current puzzle in the background.
+
+        `error_callback` is called from the main loop if the solver fails or finds no solution, or
+        straight away if the puzzle obviously can't be solved (see `solver.find_unsolvable_reason`).
+        """
+        if self._solver_thread is not None:
+            return
+        # Copied so that editing the puzzle while it is being solved doesn't affect the solver.
+        puzzle = copy.deepcopy(
+            state.SavedPuzzle(self._model.get_tube_board(), self._model.get_colours()))
+        reason = solver.find_unsolvable_reason(puzzle.board, len(puzzle.colours))
+        if reason is not None:
+            error_callback(f"no solution could be found: {reason}")
+            return
+        self._cancel = threading.Event()
+        self._solver_updates = queue.Queue()
+        self._solver_thread = threading.Thread(
+            target=self._solve_in_background,
+            args=(puzzle.board, self._solver_updates, self._cancel),
+            daemon=True)
+        self._view.notify_solver_started()
+        self._solver_thread.start()
+        self._view.after(_POLL_INTERVAL_MS, self._poll_solver, puzzle, error_callback)
 
+    def cancel_solver(self):
+        self._cancel.set()
+
+    def _solve_in_background(
+            self, board: state.TubeBoard, updates: queue.Queue, cancel: threading.Event):
+        def progress(nodes_expanded: int):
+            updates.put((_PROGRESS, nodes_expanded))
+
+        try:
+            if self._cache is not None:
+                solution = self._cache.solve(
+                    board, self._strategy, progress=progress, cancel=cancel)
+            else:
+                solution = solver.solve(
+                    board, strategy=self._strategy, progress=progress, cancel=cancel)
+        except solver.SearchCancelled:
+            updates.put((_CANCELLED, None))
+        except Exception as e:
+            updates.put((_FAILED, str(e)))
+        else:
+            updates.put((_SOLVED, solution))
+
+    def _poll_solver(self, puzzle: state.SavedPuzzle, error_callback: Callable[[str], None]):
+        nodes_expanded = None
+        while True:
+            try:
+                kind, value = self._solver_updates.get_nowait()
+            except queue.Empty:
+                break
+            if kind == _PROGRESS:
+                nodes_expanded = value
+                continue
+            self._solver_thread.join()
+            self._solver_thread = None
+            self._view.notify_solver_finished()
+            if kind == _SOLVED:
+                self._show_solution(puzzle, value, error_callback)
+            elif kind == _FAILED:
+                error_callback(value)
+            return
+
+        if nodes_expanded is not None:
+            self._view.notify_solver_progress(nodes_expanded)
+        self._view.after(_POLL_INTERVAL_MS, self._poll_solver, puzzle, error_callback)
+
+    def _show_solution(
+            self,
+            puzzle: state.SavedPuzzle,
+            solution: Optional[List[moves.Move]],
+            error_callback: Callable[[str], None]):
         print(solution_printer.format_solution(solution))
 
         if solution is None:
@@ -58,8 +156,8 @@ class UiController(controller_interface.Controller):
             error_callback("the puzzle is already solved")
             return
 
-        encoded_state = state.encode(
-            state.SavedPuzzle(self._model.get_tube_board(), self._model.get_colours()))
+        encoded_state = state.encode(puzzle)
         encoded_solution = moves.encode_solution(solution)
 
-        subprocess.call(["python", "draw_board.py", "--board", encoded_state, "--solution", encoded_solution])
+        # Not waited for, so that the editor stays responsive while the solution is shown.
+        subprocess.Popen(["python", "draw_board.py", "--board", encoded_state, "--solution", encoded_solution])
@@ -0,0 +1,102 @@
+import solver
+import state
+import ui_controller
+import ui_model
+import unittest
+
+
+class FakeView:
+    """Records notifications from the controller and runs `after()` callbacks on demand."""
+    def __init__(self):
+        self.events = []
+        self._callbacks = []
+
+    def after(self, delay_ms, callback, *args):
+        self._callbacks.append((callback, args))
+
+    def run_callbacks(self):
+        while self._callbacks:
+            callback, args = self._callbacks.pop(0)
+            callback(*args)
+
+    def notify_solver_started(self):
+        self.events.append("started")
+
+    def notify_solver_progress(self, nodes_expanded):
+        self.events.append("progress")
+
+    def notify_solver_finished(self):
+        self.events.append("finished")
+
+
+class RunSolverTest(unittest.TestCase):
+    def setUp(self):
+        self._view = FakeView()
+        self._errors = []
+
+    def _make_controller(self, board, strategy=solver.STRATEGY_DFS, colours=None):
+        model = ui_model.UiModel(initial_colours=colours or ["red", "green", "blue"])
+        model.update_tube_board(board)
+        return ui_controller.UiController(model, self._view, strategy=strategy)
+
+    def test_reports_result_from_main_loop(self):
+        controller = self._make_controller(state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 1, 1, 1]),
+            state.TubeState(state=[0, 0, 0, 0])
+        ]))
+        controller.run_solver(self._errors.append)
+        self.assertEqual(["started"], self._view.events)
+        self.assertEqual([], self._errors)
+
+        self._view.run_callbacks()
+
+        self.assertEqual("finished", self._view.events[-1])
+        self.assertEqual(["the puzzle is already solved"], self._errors)
+
+    def test_reports_unsolvable_puzzle_immediately(self):
+        controller = self._make_controller(state.TubeBoard(tubes=[
+            state.TubeState(state=[1, 2, 1, 2]),
+            state.TubeState(state=[2, 1, 2, 1])
+        ]))
+        controller.run_solver(self._errors.append)
+
+        self.assertEqual([], self._view.events)
+        self.assertEqual(["no solution could be found: no moves can be made"], self._errors)
+
+    def test_rejects_unknown_colours(self):
+        controller = self._make_controller(state.TubeBoard(tubes=[
+            state.TubeState(state=[4, 4]),
+            state.TubeState(state=[0, 0])
+        ]))
+        controller.run_solver(self._errors.append)
+
+        self.assertIn("colour 4 is out of range", self._errors[0])
+
+    def test_cancel(self):
+        puzzle = state.load_from_file("boards/level135.json")
+        controller = self._make_controller(
+            puzzle.board, strategy=solver.STRATEGY_BFS, colours=puzzle.colours)
+        controller.run_solver(self._errors.append)
+        controller.cancel_solver()
+
+        self._view.run_callbacks()
+
+        self.assertEqual("finished", self._view.events[-1])
+        self.assertEqual([], self._errors)
+
+    def test_ignores_second_run_while_solving(self):
+        puzzle = state.load_from_file("boards/level135.json")
+        controller = self._make_controller(
+            puzzle.board, strategy=solver.STRATEGY_BFS, colours=puzzle.colours)
+        controller.run_solver(self._errors.append)
+        controller.run_solver(self._errors.append)
+        controller.cancel_solver()
+
+        self._view.run_callbacks()
+
+        self.assertEqual(1, self._view.events.count("started"))
+        self.assertEqual(1, self._view.events.count("finished"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -36,6 +36,9 @@ class UiModel:
     
     def update_tube_board(self, new_board: state.TubeBoard):
         self._board = new_board
+        # New tubes should match the ones on the loaded board.
+        if new_board.tubes:
+            self._tube_depth = new_board.depth
 
     def update_tube_state(self, index: int, state: List[int]):
         self._board.tubes[index].state = state
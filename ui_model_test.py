@@ -1,5 +1,6 @@
 import unittest
 
+import state
 import ui_model
 
 
@@ -69,6 +70,14 @@ class BoardStateTest(unittest.TestCase):
             model.get_tube_board().tubes[1].state,
             [0, 1, 2, 3])
 
+    def test_new_tubes_match_loaded_board_depth(self):
+        model = ui_model.UiModel(initial_colours=[])
+        model.update_tube_board(state.TubeBoard(tubes=[state.TubeState([0, 0, 1, 1, 1, 1])]))
+        model.add_tube()
+
+        self.assertEqual(model.get_tube_depth(), 6)
+        self.assertEqual(model.get_tube_board().tubes[1].state, [0] * 6)
+
 
 if __name__ == '__main__':
     unittest.main()
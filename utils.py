@@ -1,5 +1,5 @@
 import constants
-from random import randrange
+import generator
 import state
 
 
@@ -10,10 +10,5 @@ def create_empty_state() -> state.TubeBoard:
     return board
 
 def create_random_state() -> state.TubeBoard:
-    board = state.TubeBoard(tubes = [])
-    for i in range(constants.NUM_TUBES):
-        new_state = state.TubeState(state=[])
-        for i in range(constants.TUBE_DEPTH):
-            new_state.state.append(randrange(1, len(colour_mapping._COLOURS)))
-        board.tubes.append(new_state)
-    return board
+    """Create a random board which can be solved, with two empty tubes."""
+    return generator.generate_board(constants.NUM_TUBES, constants.TUBE_DEPTH)
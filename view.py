@@ -16,12 +16,13 @@ class MainWindow(tk.Frame):
         self.rowconfigure(1, weight=10)
         self.rowconfigure(2, weight=1)
         self.columnconfigure(0, weight=1)
+        self.columnconfigure(1, weight=0)
 
         self._colour_picker = colour_picker.ColourPicker(self, model)
-        self._colour_picker.grid(row=0, column=0, sticky="nsew")
+        self._colour_picker.grid(row=0, column=0, columnspan=2, sticky="nsew")
         
         self._board_view = board_view.TubeBoardView(self, model)
-        self._board_view.grid(row=1, column=0, sticky="nsew")
+        self._board_view.grid(row=1, column=0, columnspan=2, sticky="nsew")
 
         self._controller = None
 
@@ -29,6 +30,14 @@ class MainWindow(tk.Frame):
             self, text="Solve!", background="green",
             command=lambda: self._controller.run_solver(self._handle_solution_error))
         self._solve_button.grid(row=2, column=0, sticky="nsew")
+
+        self._cancel_button = tk.Button(
+            self, text="Cancel", state=tk.DISABLED,
+            command=lambda: self._controller.cancel_solver())
+        self._cancel_button.grid(row=2, column=1, sticky="nsew")
+
+        self._solver_status = tk.Label(self, anchor="w")
+        self._solver_status.grid(row=3, column=0, columnspan=2, sticky="ew")
     
     def _handle_solution_error(self, message: str):
         messagebox.showerror("Solver failed!", f"The solver failed: '{message}'.")
@@ -41,6 +50,19 @@ class MainWindow(tk.Frame):
     def notify_colours_changed(self):
         self._board_view.notify_colours_changed()
     
+    def notify_solver_started(self):
+        self._solve_button.config(state=tk.DISABLED)
+        self._cancel_button.config(state=tk.NORMAL)
+        self._solver_status.config(text="Solving...")
+
+    def notify_solver_progress(self, nodes_expanded: int):
+        self._solver_status.config(text=f"Solving... {nodes_expanded:,} states searched")
+
+    def notify_solver_finished(self):
+        self._solve_button.config(state=tk.NORMAL)
+        self._cancel_button.config(state=tk.DISABLED)
+        self._solver_status.config(text="")
+
     def reset_to_match_model(self):
         self._colour_picker.reset_to_match_model()
         self._board_view.reset_to_match_model()
@@ -0,0 +1,113 @@
+import random
+from typing import List, Sequence, Tuple
+
+
+_MASK = (1 << 64) - 1
+# Packed boards store each cell in a byte, so there are at most this many colours (including 0).
+_NUM_COLOURS = 256
+
+
+class ZobristHasher:
+    """Zobrist hashing for packed boards.
+
+    Every (tube, slot, colour) combination gets a random 64-bit key, and a board's hash is the XOR
+    of the keys for its nonempty cells. A move only changes the cells it pours, so the hash can be
+    updated by XORing in the keys for those cells instead of rehashing the whole board.
+
+    The order-independent variant instead hashes each tube with keys per (slot, colour), and sums
+    the tube hashes, so boards that only differ by tube order (like boards with the same
+    `state.get_canonical_key`) hash the same. Sums are used rather than XOR so that identical tubes
+    don't cancel each other out.
+
+    Distinct boards can collide, but with 64-bit hashes this is vanishingly unlikely.
+    """
+    def __init__(self, num_tubes: int, depth: int, seed: int = 0):
+        rng = random.Random(seed)
+        self._cell_keys = [
+            [[0] + [rng.getrandbits(64) for _ in range(1, _NUM_COLOURS)] for _ in range(depth)]
+            for _ in range(num_tubes)]
+        self._slot_keys = [
+            [0] + [rng.getrandbits(64) for _ in range(1, _NUM_COLOURS)] for _ in range(depth)]
+
+    def hash_board(self, tubes: Sequence[bytes]) -> int:
+        """Hash a board, taking tube order into account."""
+        result = 0
+        for tube, tube_keys in zip(tubes, self._cell_keys):
+            for elem, slot_keys in zip(tube, tube_keys):
+                result ^= slot_keys[elem]
+        return result
+
+    def pour_delta(self, tubes: Sequence[bytes], src: int, dest: int, depth: int) -> int:
+        """Return the value to XOR into `hash_board` when pouring `depth` cells from src to dest.
+
+        This must be called before the pour is applied.
+        """
+        src_tube = tubes[src]
+        dest_tube = tubes[dest]
+        src_space = len(src_tube) - len(src_tube.lstrip(b"\x00"))
+        dest_space = len(dest_tube) - len(dest_tube.lstrip(b"\x00"))
+        colour = src_tube[src_space]
+        src_keys = self._cell_keys[src]
+        dest_keys = self._cell_keys[dest]
+        delta = 0
+        for slot in range(src_space, src_space + depth):
+            delta ^= src_keys[slot][colour]
+        for slot in range(dest_space - depth, dest_space):
+            delta ^= dest_keys[slot][colour]
+        return delta
+
+    def hash_tube(self, tube: bytes) -> int:
+        """Hash a single tube, independently of its position on the board."""
+        result = 0
+        for elem, slot_keys in zip(tube, self._slot_keys):
+            result ^= slot_keys[elem]
+        return result
+
+    def tube_hashes(self, tubes: Sequence[bytes]) -> List[int]:
+        return [self.hash_tube(tube) for tube in tubes]
+
+    def hash_unordered(self, tube_hashes: Sequence[int]) -> int:
+        """Combine tube hashes into a board hash that doesn't depend on tube order."""
+        return sum(tube_hashes) & _MASK
+
+    def tube_pour_deltas(
+            self, tubes: Sequence[bytes], src: int, dest: int, depth: int) -> Tuple[int, int]:
+        """Return the values to XOR into the source and destination tube hashes for a pour.
+
+        This must be called before the pour is applied.
+        """
+        src_tube = tubes[src]
+        dest_tube = tubes[dest]
+        src_space = len(src_tube) - len(src_tube.lstrip(b"\x00"))
+        dest_space = len(dest_tube) - len(dest_tube.lstrip(b"\x00"))
+        colour = src_tube[src_space]
+        slot_keys = self._slot_keys
+        src_delta = 0
+        for slot in range(src_space, src_space + depth):
+            src_delta ^= slot_keys[slot][colour]
+        dest_delta = 0
+        for slot in range(dest_space - depth, dest_space):
+            dest_delta ^= slot_keys[slot][colour]
+        return src_delta, dest_delta
+
+    def update_unordered(
+            self,
+            board_hash: int,
+            tube_hashes: List[int],
+            tubes: Sequence[bytes],
+            src: int,
+            dest: int,
+            depth: int) -> int:
+        """Update an order-independent board hash and its tube hashes for a pour.
+
+        `tube_hashes` is updated in place and the new board hash is returned. This must be called
+        before the pour is applied, and costs the same however big the board is.
+        """
+        src_delta, dest_delta = self.tube_pour_deltas(tubes, src, dest, depth)
+        old_src = tube_hashes[src]
+        old_dest = tube_hashes[dest]
+        new_src = old_src ^ src_delta
+        new_dest = old_dest ^ dest_delta
+        tube_hashes[src] = new_src
+        tube_hashes[dest] = new_dest
+        return (board_hash - old_src - old_dest + new_src + new_dest) & _MASK
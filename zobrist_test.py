@@ -0,0 +1,58 @@
+import itertools
+import moves
+import state
+import unittest
+import zobrist
+
+
+_BOARD = state.pack(state.TubeBoard(tubes=[
+    state.TubeState(state=[1, 2, 3, 4]),
+    state.TubeState(state=[0, 0, 0, 0]),
+    state.TubeState(state=[0, 3, 3, 1]),
+    state.TubeState(state=[0, 0, 1, 4]),
+    state.TubeState(state=[0, 0, 0, 0])
+]))
+
+
+class ZobristHasherTest(unittest.TestCase):
+    def setUp(self):
+        self.hasher = zobrist.ZobristHasher(num_tubes=5, depth=4, seed=42)
+
+    def test_unordered_hash_ignores_tube_order(self):
+        hashes = {
+            self.hasher.hash_unordered(self.hasher.tube_hashes(order))
+            for order in itertools.permutations(_BOARD.tubes)}
+        self.assertEqual(1, len(hashes))
+
+    def test_identical_tubes_do_not_cancel_out(self):
+        full = [bytes([1, 1]), bytes([1, 1])]
+        empty = [bytes([0, 0]), bytes([0, 0])]
+        hasher = zobrist.ZobristHasher(num_tubes=2, depth=2)
+        self.assertNotEqual(
+            hasher.hash_unordered(hasher.tube_hashes(full)),
+            hasher.hash_unordered(hasher.tube_hashes(empty)))
+
+    def test_ordered_hash_depends_on_tube_order(self):
+        swapped = (_BOARD.tubes[2], _BOARD.tubes[1], _BOARD.tubes[0]) + _BOARD.tubes[3:]
+        self.assertNotEqual(self.hasher.hash_board(_BOARD.tubes), self.hasher.hash_board(swapped))
+
+    def test_incremental_updates_match_full_hash(self):
+        for move in moves.get_possible_packed_moves(_BOARD.tubes):
+            depth = moves._packed_top_of_tube_info(_BOARD.tubes[move.src])[1]
+            child = moves.apply_packed_move(_BOARD, move)
+
+            ordered = self.hasher.hash_board(_BOARD.tubes) ^ self.hasher.pour_delta(
+                _BOARD.tubes, move.src, move.dest, depth)
+            self.assertEqual(self.hasher.hash_board(child.tubes), ordered)
+
+            tube_hashes = self.hasher.tube_hashes(_BOARD.tubes)
+            unordered = self.hasher.update_unordered(
+                self.hasher.hash_unordered(tube_hashes), tube_hashes, _BOARD.tubes,
+                move.src, move.dest, depth)
+            self.assertEqual(self.hasher.tube_hashes(child.tubes), tube_hashes)
+            self.assertEqual(
+                self.hasher.hash_unordered(self.hasher.tube_hashes(child.tubes)), unordered)
+
+
+if __name__ == '__main__':
+    unittest.main()